@@ -0,0 +1,65 @@
+"""Compares stepping many copies of a small level with World objects and with a BatchedWorld.
+
+Usage: python benchmarks/batched.py [n_worlds]
+"""
+
+import logging
+import random
+import sys
+import time
+
+from ppe.batched import BatchedWorld
+from ppe.objects import AABox, Ball, ConvexPolygon
+from ppe.validation import polygon_narrow_phase
+from ppe.vector import Vector
+
+N_WORLDS = 1024
+N_STEPS = 20
+DT = 0.01
+GRAVITY = Vector(0, -9.81)
+
+
+def create_level(seed=0):
+    random.seed(seed)
+    return (
+        [
+            AABox(Vector(5, 0), 10, 1, fixed=True, mass=float("inf")),
+            AABox(Vector(0, 5), 1, 10, fixed=True, mass=float("inf")),
+            AABox(Vector(10, 5), 1, 10, fixed=True, mass=float("inf")),
+        ]
+        + [
+            Ball.create_random((Vector(1, 1), Vector(9, 6)), (0.3, 0.5), acc=GRAVITY)
+            for _ in range(6)
+        ]
+        + [
+            ConvexPolygon.create_random(
+                (Vector(1, 2), Vector(9, 6)), (0.3, 0.6), (3, 6), acc=GRAVITY
+            )
+            for _ in range(4)
+        ]
+    )
+
+
+if __name__ == "__main__":
+    logging.disable(logging.WARNING)
+    n_worlds = int(sys.argv[1]) if len(sys.argv) > 1 else N_WORLDS
+    batch = BatchedWorld(create_level(), n_worlds)
+    # the separate worlds are timed on a subset and extrapolated
+    worlds = [batch.export_world(i) for i in range(min(n_worlds, 32))]
+
+    # the batched kernels only implement the separating axis test
+    start = time.perf_counter()
+    with polygon_narrow_phase("sat"):
+        for _ in range(N_STEPS):
+            for world in worlds:
+                world.update(DT)
+    world_time = (time.perf_counter() - start) / len(worlds) * n_worlds / N_STEPS
+
+    start = time.perf_counter()
+    for _ in range(N_STEPS):
+        batch.step(DT)
+    batch_time = (time.perf_counter() - start) / N_STEPS
+
+    print(f"{n_worlds} worlds with {len(batch.template)} objects, time per step:")
+    print(f"separate worlds: {world_time * 1000:.1f} ms")
+    print(f"batched world: {batch_time * 1000:.1f} ms ({world_time / batch_time:.1f}x)")
@@ -0,0 +1,63 @@
+"""Compares SAT and GJK/EPA for polygon pairs of the broad phase by vertex count.
+
+The total number of vertices from which GJK/EPA is faster is the crossover used by the "auto"
+narrow phase (GJK_CROSSOVER), it is also measured with calibrate_gjk_crossover.
+
+Usage: python benchmarks/gjk_crossover.py [n_polygons]
+"""
+
+import logging
+import random
+import sys
+import time
+
+from ppe.collision import (
+    GJK_CROSSOVER,
+    calibrate_gjk_crossover,
+    polygon_polygon_collision,
+)
+from ppe.objects import ConvexPolygon
+from ppe.vector import Vector
+from ppe.world import World
+
+N_POLYGONS = 150
+N_REPEATS = 5
+VERTEX_COUNTS = (3, 4, 5, 6, 8, 12, 16, 24)
+
+
+def create_pairs(n_polygons, n_vertices, seed=0):
+    # candidate pairs of the broad phase of randomly placed polygons
+    random.seed(seed)
+    bounds = (Vector(0, 0), Vector(8, 8))
+    polygons = [
+        ConvexPolygon.create_random(bounds, (0.3, 0.8), (n_vertices, n_vertices))
+        for _ in range(n_polygons)
+    ]
+    return World(polygons)._spatial_hash.candidate_pairs()
+
+
+def time_per_pair(pairs, method):
+    best = float("inf")
+    for _ in range(N_REPEATS):
+        start = time.perf_counter()
+        for polygon1, polygon2 in pairs:
+            polygon_polygon_collision(polygon1, polygon2, method)
+        best = min(best, time.perf_counter() - start)
+    return best / len(pairs)
+
+
+if __name__ == "__main__":
+    logging.disable(logging.WARNING)
+    n_polygons = int(sys.argv[1]) if len(sys.argv) > 1 else N_POLYGONS
+    for n_vertices in VERTEX_COUNTS:
+        pairs = create_pairs(n_polygons, n_vertices)
+        sat_time = time_per_pair(pairs, "sat")
+        gjk_time = time_per_pair(pairs, "gjk")
+        print(
+            f"{2 * n_vertices} vertices: sat {sat_time * 1e6:.1f} us,"
+            f" gjk {gjk_time * 1e6:.1f} us per pair ({sat_time / gjk_time:.1f}x)"
+        )
+    print(
+        f"calibrated crossover: {calibrate_gjk_crossover()} vertices"
+        f" (GJK_CROSSOVER = {GJK_CROSSOVER})"
+    )
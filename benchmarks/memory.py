@@ -0,0 +1,76 @@
+"""Reports the memory used per body and per contact.
+
+Usage: python benchmarks/memory.py [n_bodies]
+"""
+
+import sys
+import gc
+import tracemalloc
+
+from ppe.world import World
+from ppe.objects import Ball, ConvexPolygon
+from ppe.shapes import PolygonShape
+from ppe.collision import Collision
+from ppe.vector import Vector
+from ppe.scene import random_balls
+
+N_BODIES = 1_000_000
+POS_BOUNDS = (Vector(0, 0), Vector(1000, 1000))
+RADIUS_BOUNDS = (0.1, 0.5)
+
+
+def measure(create, n):
+    """Returns the bytes allocated per item by `create(n)` while its result is alive."""
+    gc.collect()
+    tracemalloc.start()
+    items = create(n)
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del items
+    gc.collect()
+    return allocated / n
+
+
+def create_balls(n):
+    return [Ball(Vector(i, 0), 0.5) for i in range(n)]
+
+
+def create_polygons(n):
+    return [ConvexPolygon.create_rectangle(Vector(i, 0), 0.5, 0.5) for i in range(n)]
+
+
+def create_shared_shape_polygons(n):
+    shape = PolygonShape(
+        [Vector(0, 0), Vector(0.5, 0), Vector(0.5, 0.5), Vector(0, 0.5)]
+    )
+    return [ConvexPolygon(shape, pos=Vector(i, 0)) for i in range(n)]
+
+
+def create_world(n):
+    world = World([])
+    world.add_balls(*random_balls(n, POS_BOUNDS, RADIUS_BOUNDS, seed=0))
+    return world
+
+
+def create_contacts(n):
+    ball1 = Ball(Vector(0, 0), 0.5)
+    ball2 = Ball(Vector(0.5, 0), 0.5)
+    # every contact has its own normal and contact point like the contacts from get_collisions
+    return [
+        Collision(ball1, ball2, Vector(1, 0), 0.5, Vector(0.5, 0), None)
+        for _ in range(n)
+    ]
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else N_BODIES
+
+    print(f"bytes per body/contact at n={n}")
+    for name, create in [
+        ("ball", create_balls),
+        ("polygon", create_polygons),
+        ("polygon (shared shape)", create_shared_shape_polygons),
+        ("ball in world (incl. index)", create_world),
+        ("contact", create_contacts),
+    ]:
+        print(f"{name:30s} {measure(create, n):8.1f}")
@@ -0,0 +1,68 @@
+"""Compares the serial and the threaded narrow phase of get_collisions.
+
+The threads only run concurrently on free-threaded builds of Python (e.g. python3.13t), with the
+GIL the threaded narrow phase is about as fast as the serial one or slower.
+
+Usage: python benchmarks/narrow_phase.py [n_objects]
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import os
+import random
+import sys
+import time
+
+from ppe.collision import get_collisions, gil_enabled
+from ppe.objects import Ball, ConvexPolygon
+from ppe.vector import Vector
+from ppe.world import World
+
+N_OBJECTS = 4000
+N_REPEATS = 5
+
+
+def create_objects(n_objects, seed=0):
+    random.seed(seed)
+    size = (n_objects / 2) ** 0.5
+    bounds = (Vector(0, 0), Vector(size, size))
+    return [Ball.create_random(bounds, (0.2, 0.6)) for _ in range(n_objects // 2)] + [
+        ConvexPolygon.create_random(bounds, (0.2, 0.6), (3, 8))
+        for _ in range(n_objects // 2)
+    ]
+
+
+def time_narrow_phase(objects, pairs, executor=None, n_workers=1):
+    start = time.perf_counter()
+    for _ in range(N_REPEATS):
+        collisions = get_collisions(
+            objects, pairs=pairs, executor=executor, n_workers=n_workers
+        )
+    return (time.perf_counter() - start) / N_REPEATS, collisions
+
+
+if __name__ == "__main__":
+    logging.disable(logging.WARNING)
+    n_objects = int(sys.argv[1]) if len(sys.argv) > 1 else N_OBJECTS
+    objects = create_objects(n_objects)
+    pairs = World(objects)._spatial_hash.candidate_pairs()
+    print(
+        f"{n_objects} objects, {len(pairs)} candidate pairs, GIL enabled: {gil_enabled()}"
+    )
+
+    serial_time, expected = time_narrow_phase(objects, pairs)
+    print(f"serial: {serial_time * 1000:.1f} ms")
+    n_workers = 2
+    while n_workers <= max(os.cpu_count() or 1, 2):
+        with ThreadPoolExecutor(n_workers) as executor:
+            threaded_time, collisions = time_narrow_phase(
+                objects, pairs, executor, n_workers
+            )
+        assert [(c.obj1, c.obj2) for c in collisions] == [
+            (c.obj1, c.obj2) for c in expected
+        ]
+        print(
+            f"{n_workers} threads: {threaded_time * 1000:.1f} ms"
+            f" ({serial_time / threaded_time:.1f}x)"
+        )
+        n_workers *= 2
@@ -0,0 +1,68 @@
+"""Compares the sequential and the parallel solver of World.update on a pile of objects.
+
+The parallel solver only uses threads on free-threaded builds of Python (e.g. python3.13t), with
+the GIL it falls back to the sequential resolution and both solvers take about the same time.
+
+Usage: python benchmarks/parallel_solver.py [n_objects]
+"""
+
+import copy
+import logging
+import os
+import random
+import sys
+import time
+
+from ppe.collision import gil_enabled
+from ppe.objects import Ball, ConvexPolygon
+from ppe.vector import Vector
+from ppe.world import World
+
+N_OBJECTS = 4000
+N_STEPS = 10
+DT = 0.01
+GRAVITY = Vector(0, -9.81)
+
+
+def create_pile(n_objects, seed=0):
+    random.seed(seed)
+    size = (n_objects / 4) ** 0.5
+    bounds = (Vector(0, 0), Vector(size, size))
+    return [
+        Ball.create_random(bounds, (0.2, 0.6), acc=GRAVITY) for _ in range(n_objects)
+    ] + [
+        ConvexPolygon.create_rectangle(
+            Vector(size / 2, -0.5), size + 2, 1.2, fixed=True, mass=float("inf")
+        )
+    ]
+
+
+def time_world(objects, **world_kwargs):
+    with World(copy.deepcopy(objects), **world_kwargs) as world:
+        start = time.perf_counter()
+        for _ in range(N_STEPS):
+            world.update(DT)
+        return (time.perf_counter() - start) / N_STEPS, world.contact_stats
+
+
+if __name__ == "__main__":
+    logging.disable(logging.WARNING)
+    n_objects = int(sys.argv[1]) if len(sys.argv) > 1 else N_OBJECTS
+    objects = create_pile(n_objects)
+    print(f"{n_objects} objects, GIL enabled: {gil_enabled()}")
+
+    sequential_time, _ = time_world(objects, solver="sequential")
+    print(f"sequential: {sequential_time * 1000:.1f} ms per step")
+    n_workers = 2
+    while n_workers <= max(os.cpu_count() or 1, 2):
+        parallel_time, stats = time_world(
+            objects, solver="parallel", n_workers=n_workers
+        )
+        islands = (
+            f", largest island {stats.largest_island}" if stats is not None else ""
+        )
+        print(
+            f"parallel, {n_workers} workers: {parallel_time * 1000:.1f} ms per step"
+            f" ({sequential_time / parallel_time:.1f}x{islands})"
+        )
+        n_workers *= 2
@@ -0,0 +1,55 @@
+"""Compares the speed options of the world with the reference pipeline on a seeded scene.
+
+Usage: python benchmarks/validation.py [n_steps]
+"""
+
+import logging
+import random
+import sys
+
+from ppe.objects import Ball, ConvexPolygon
+from ppe.validation import validate
+from ppe.vector import Vector
+
+N_STEPS = 200
+DT = 0.01
+SCENE_BOUNDS = (Vector(0, 0), Vector(10, 10))
+WORLD_BBOX = (Vector(-2, -2), Vector(12, 12))
+GRAVITY = Vector(0, -9.81)
+
+CONFIGURATIONS = {
+    "sequential, sat": dict(narrow_phase="sat"),
+    "sequential, gjk": dict(narrow_phase="gjk"),
+    "small cells": dict(narrow_phase="sat", cell_size=0.3),
+    "batch solver": dict(narrow_phase="sat", solver="batch"),
+    "parallel solver": dict(narrow_phase="sat", solver="parallel"),
+}
+
+
+def create_scene(seed=0):
+    random.seed(seed)
+    return (
+        [Ball.create_random(SCENE_BOUNDS, (0.2, 0.6), acc=GRAVITY) for _ in range(30)]
+        + [
+            ConvexPolygon.create_random(SCENE_BOUNDS, (0.3, 0.8), (3, 7), acc=GRAVITY)
+            for _ in range(30)
+        ]
+        + [
+            ConvexPolygon.create_rectangle(
+                Vector(5, -0.5), 12, 1, fixed=True, mass=float("inf")
+            )
+        ]
+    )
+
+
+if __name__ == "__main__":
+    logging.disable(logging.WARNING)
+    n_steps = int(sys.argv[1]) if len(sys.argv) > 1 else N_STEPS
+    scene = create_scene()
+    for name, options in CONFIGURATIONS.items():
+        report = validate(scene, n_steps, DT, WORLD_BBOX, **options)
+        if report.ok:
+            errors = ", ".join(f"{k} {v:.1e}" for k, v in report.max_errors.items())
+            print(f"{name}: {n_steps} steps match (max errors: {errors})")
+        else:
+            print(f"{name}: {report.divergence}")
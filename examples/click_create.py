@@ -5,6 +5,7 @@ import logging
 import pygame
 
 from ppe.world import World
+from ppe.governor import FrameGovernor
 from ppe.vector import Vector
 from ppe.objects import Ball, ConvexPolygon
 from ppe.visualization import PyGameVisualizer
@@ -21,9 +22,8 @@ BACKGROUND_COLOR = (255, 255, 255)
 OBJECT_COLORS = ["#ffbe0b", "#fb5607", "#ff006e", "#8338ec", "#3a86ff"]
 
 FPS = 60
-STEPS_PER_FRAME = 10
 
-logging.basicConfig(level=logging.WARNING)
+logging.basicConfig(level=logging.INFO)
 
 if __name__ == "__main__":
     floor = ConvexPolygon(
@@ -39,6 +39,8 @@ if __name__ == "__main__":
     )
 
     world = World([floor], world_bbox=(Vector(0, 0), Vector(*SCREEN_DIMENSIONS_WORLD)))
+    # reduces the number of substeps per frame if physics and rendering take longer than a frame
+    governor = FrameGovernor(world, 1 / FPS)
 
     screen = pygame.display.set_mode(
         (SCREEN_DIMENSIONS_WORLD[0] * SCALE, SCREEN_DIMENSIONS_WORLD[1] * SCALE)
@@ -55,7 +57,7 @@ if __name__ == "__main__":
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 x, y = pygame.mouse.get_pos()
                 if event.button == 1:  # left click
-                    world.objects.append(
+                    world.add_object(
                         ConvexPolygon.create_rectangle(
                             pos=visualizer.pixel_2_world_coord(Vector(x, y)),
                             height=random.uniform(*RECTANGLE_SIDE_BOUNDS),
@@ -66,7 +68,7 @@ if __name__ == "__main__":
                         )
                     )
                 elif event.button == 3:  # right click
-                    world.objects.append(
+                    world.add_object(
                         Ball(
                             pos=visualizer.pixel_2_world_coord(Vector(x, y)),
                             radius=random.uniform(*RADIUS_BOUNDS),
@@ -76,22 +78,12 @@ if __name__ == "__main__":
                         )
                     )
 
-        physic_step_start = time.perf_counter()
-        for _ in range(STEPS_PER_FRAME):
-            world.update(1 / (FPS * STEPS_PER_FRAME))
-        physic_step_duration = time.perf_counter() - physic_step_start
+        governor.step(1 / FPS)
 
         render_step_start = time.perf_counter()
         screen.fill(BACKGROUND_COLOR)
         visualizer.draw(world)
         pygame.display.flip()
-        render_step_duration = time.perf_counter() - render_step_start
-
-        logging.info(f"{physic_step_duration:.3f}s, {render_step_duration:.3f}s")
-        if physic_step_duration + render_step_duration > 1 / FPS:
-            logging.warning(
-                f"Warning: frame took {physic_step_duration:.3f} + {render_step_duration:.3f} = {physic_step_duration + render_step_duration:.3f}s, "
-                f"which is longer than 1/{FPS:.0f}s = {1/FPS:.3f}s."
-            )
+        governor.report(time.perf_counter() - render_step_start)
 
         clock.tick(FPS)
@@ -0,0 +1,500 @@
+from typing import Callable, Dict, List, Sequence, Tuple
+import copy
+
+import numpy as np
+
+from ppe.collision import (
+    ball_ball_collision,
+    ball_box_collision,
+    ball_polygon_collision,
+    box_box_collision,
+    collision_test,
+    polygon_polygon_collision,
+    should_collide,
+)
+from ppe.objects import AABox, Ball, ConvexPolygon, GameObject
+from ppe.vector import Vector
+from ppe.world import RECORD_FIELDS, World
+
+# hit (n,), normal (n, 2) from the first to the second object and depth (n,) of n tested pairs
+Contacts = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+class BatchedWorld:
+    """Many copies of a world with the same objects which are stepped together.
+
+    The state of all copies is stored in arrays with the world as leading dimension, e.g.
+    `positions` has shape (n_worlds, n_objects, 2), and every step updates all worlds with a few
+    vectorized operations per pair of objects instead of one Python loop per world. The objects
+    of the template only define the structure: the types, shapes, masses, accelerations and
+    collision filters are shared by all worlds, only the positions, velocities, angles and
+    angular velocities differ.
+
+    Each step is equivalent to `World.update` with the sequential solver and the SAT narrow
+    phase for polygons: all objects are moved, all pairs are tested and the collisions are
+    resolved in the order of the object indices. Collision callbacks are not called and objects
+    are never removed. The actions of a step are extra accelerations of the `controlled` objects.
+    Batched worlds can be pickled, so they can be combined with multiple processes by giving each
+    process its own batch.
+    """
+
+    def __init__(
+        self,
+        template: List[GameObject],
+        n_worlds: int,
+        controlled: Sequence[int] = (),
+        observation_fields: Tuple[str, ...] = ("positions", "velocities"),
+    ):
+        if n_worlds < 1:
+            raise ValueError("At least one world is required")
+        for field in observation_fields:
+            if field not in RECORD_FIELDS:
+                raise ValueError(
+                    f"Unknown observation field {field}, expected one of {RECORD_FIELDS}"
+                )
+
+        self._template = copy.deepcopy(list(template))
+        self.n_worlds = n_worlds
+        self.controlled = np.asarray(controlled, dtype=np.intp)
+        self.observation_fields = tuple(observation_fields)
+        objects = self._template
+        n = len(objects)
+
+        self._initial_state = (
+            np.array([obj.pos.to_tuple() for obj in objects], np.float64).reshape(n, 2),
+            np.array([obj.vel.to_tuple() for obj in objects], np.float64).reshape(n, 2),
+            np.array([obj.angle for obj in objects], dtype=np.float64),
+            np.array([obj.angular_vel for obj in objects], dtype=np.float64),
+        )
+        self.positions = np.empty((n_worlds, n, 2))
+        self.velocities = np.empty((n_worlds, n, 2))
+        self.angles = np.empty((n_worlds, n))
+        self.angular_velocities = np.empty((n_worlds, n))
+        self._contact_counts = np.zeros((n_worlds, n), dtype=np.intp)
+        self.reset()
+
+        self._acc = np.array(
+            [obj.acc.to_tuple() for obj in objects], np.float64
+        ).reshape(n, 2)
+        self._angular_acc = np.array([obj.angular_acc for obj in objects], np.float64)
+        self._mass = np.array([obj.mass for obj in objects], dtype=np.float64)
+        self._fixed = np.array([obj.fixed for obj in objects], dtype=bool)
+        self._bounciness = np.array([obj.bounciness for obj in objects], np.float64)
+        self._radius = np.array(
+            [obj.radius if isinstance(obj, Ball) else 0 for obj in objects], np.float64
+        )
+        self._half_extends = np.array(
+            [
+                (obj.half_width, obj.half_height) if isinstance(obj, AABox) else (0, 0)
+                for obj in objects
+            ],
+            dtype=np.float64,
+        ).reshape(n, 2)
+
+        # local vertices and normals of the polygons, padded to the largest vertex count with
+        # the first vertex
+        self._n_vertices = np.array(
+            [
+                len(obj.shape.vertices) if isinstance(obj, ConvexPolygon) else 0
+                for obj in objects
+            ],
+            dtype=np.intp,
+        )
+        max_vertices = max(self._n_vertices.max(initial=0), 1)
+        self._local_vertices = np.zeros((n, max_vertices, 2))
+        self._local_normals = np.zeros((n, max_vertices, 2))
+        for i, obj in enumerate(objects):
+            if isinstance(obj, ConvexPolygon):
+                shape = obj.shape
+                self._local_vertices[i] = shape.vertices[0].to_tuple()
+                self._local_vertices[i, : len(shape.vertices)] = [
+                    v.to_tuple() for v in shape.vertices
+                ]
+                self._local_normals[i, : len(shape.vertices)] = [
+                    normal.to_tuple() for normal in shape.transformed_normals(0)
+                ]
+
+        self._pairs, self._groups = self._group_pairs()
+
+    def _group_pairs(self):
+        # pairs in the order of World.update without a broad phase and the groups of pairs which
+        # are tested with the same kernel, as (kernel, swapped, first objects, second objects,
+        # indices of the pairs)
+        objects = self._template
+        pairs = []
+        groups: Dict[Tuple[Callable, bool, int, int], List[int]] = {}
+        for i, obj1 in enumerate(objects):
+            for j in range(i + 1, len(objects)):
+                obj2 = objects[j]
+                if not should_collide(obj1, obj2):
+                    continue
+                kernel, swapped = _kernel(type(obj1), type(obj2))
+                first, second = (j, i) if swapped else (i, j)
+                key = (
+                    kernel,
+                    swapped,
+                    self._n_vertices[first],
+                    self._n_vertices[second],
+                )
+                groups.setdefault(key, []).append(len(pairs))
+                pairs.append((i, j))
+
+        pairs = np.array(pairs, dtype=np.intp).reshape(-1, 2)
+        grouped = []
+        for (kernel, swapped, _, _), indices in groups.items():
+            indices = np.array(indices, dtype=np.intp)
+            first, second = pairs[indices, 0], pairs[indices, 1]
+            if swapped:
+                first, second = second, first
+            grouped.append((kernel, swapped, first, second, indices))
+        return pairs, grouped
+
+    @property
+    def template(self) -> List[GameObject]:
+        return self._template
+
+    @property
+    def contact_counts(self) -> np.ndarray:
+        """Number of collisions of every object in the last step, (n_worlds, n_objects)."""
+        return self._contact_counts
+
+    def reset(self, worlds: np.ndarray = None):
+        """Restores the state of the template in the given worlds (indices or a boolean mask).
+
+        All worlds are reset by default. The state arrays can be changed afterwards, e.g. to
+        randomize the start positions.
+        """
+        if worlds is None:
+            worlds = slice(None)
+        positions, velocities, angles, angular_velocities = self._initial_state
+        self.positions[worlds] = positions
+        self.velocities[worlds] = velocities
+        self.angles[worlds] = angles
+        self.angular_velocities[worlds] = angular_velocities
+        self._contact_counts[worlds] = 0
+
+    def observe(self, fields: Tuple[str, ...] = None) -> Dict[str, np.ndarray]:
+        """Copies of the state arrays, by default of the observation fields."""
+        arrays = {
+            "positions": self.positions,
+            "velocities": self.velocities,
+            "angles": self.angles,
+            "contact_counts": self._contact_counts,
+        }
+        return {
+            field: arrays[field].copy() for field in fields or self.observation_fields
+        }
+
+    def export_world(self, index: int) -> World:
+        """Creates a regular world with the current state of one of the worlds."""
+        objects = copy.deepcopy(self._template)
+        for i, obj in enumerate(objects):
+            obj.pos = Vector(*self.positions[index, i].tolist())
+            obj.vel = Vector(*self.velocities[index, i].tolist())
+            obj.angle = float(self.angles[index, i])
+            obj.angular_vel = float(self.angular_velocities[index, i])
+        return World(objects)
+
+    def step(self, dt: float, actions: np.ndarray = None) -> Dict[str, np.ndarray]:
+        """Advances all worlds by dt and returns the observations.
+
+        `actions` are accelerations of the controlled objects for this step with shape
+        (n_worlds, n_controlled, 2).
+        """
+        acc = np.broadcast_to(self._acc, self.positions.shape)
+        if actions is not None:
+            actions = np.asarray(actions, dtype=np.float64)
+            expected = (self.n_worlds, len(self.controlled), 2)
+            if actions.shape != expected:
+                raise ValueError(f"Expected actions of shape {expected}")
+            acc = acc.copy()
+            acc[:, self.controlled] += actions
+
+        # same integration as GameObject.update
+        angle_delta = self.angular_velocities * dt + 0.5 * self._angular_acc * dt**2
+        self.angular_velocities += self._angular_acc * dt
+        self.angles += angle_delta
+        pos_delta = self.velocities * dt + 0.5 * acc * dt**2
+        self.velocities += acc * dt
+        self.positions += pos_delta
+
+        worlds, pairs, normals, depths = self._collisions()
+        self._resolve(worlds, pairs, normals, depths)
+
+        n_objects = self.positions.shape[1]
+        involved = np.concatenate(
+            (
+                worlds * n_objects + self._pairs[pairs, 0],
+                worlds * n_objects + self._pairs[pairs, 1],
+            )
+        )
+        self._contact_counts[:] = np.bincount(
+            involved, minlength=self._contact_counts.size
+        ).reshape(self._contact_counts.shape)
+        return self.observe()
+
+    def _bounding_boxes(self) -> Tuple[np.ndarray, ...]:
+        # x and y of the minimum and maximum of the bounding boxes of all objects in all worlds,
+        # computed like GameObject.bbox
+        cos = np.cos(self.angles)[..., None]
+        sin = np.sin(self.angles)[..., None]
+        local_x, local_y = self._local_vertices[..., 0], self._local_vertices[..., 1]
+        xs = local_x * cos - local_y * sin
+        ys = local_x * sin + local_y * cos
+        min_x, max_x, min_y, max_y = xs[..., 0], xs[..., 0], ys[..., 0], ys[..., 0]
+        for k in range(1, xs.shape[-1]):
+            min_x, max_x = np.minimum(min_x, xs[..., k]), np.maximum(max_x, xs[..., k])
+            min_y, max_y = np.minimum(min_y, ys[..., k]), np.maximum(max_y, ys[..., k])
+
+        pos_x, pos_y = self.positions[..., 0], self.positions[..., 1]
+        balls = self._n_vertices == 0
+        radius = np.where(balls, self._radius, 0)
+        return (
+            np.where(balls, pos_x - radius, min_x + pos_x),
+            np.where(balls, pos_y - radius, min_y + pos_y),
+            np.where(balls, pos_x + radius, max_x + pos_x),
+            np.where(balls, pos_y + radius, max_y + pos_y),
+        )
+
+    def _polygons(
+        self, worlds: np.ndarray, objects: np.ndarray, n_vertices: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        # vertices and normals of polygons with the same number of vertices in some worlds
+        # (n, n_vertices, 2), computed like PolygonShape.transformed_vertices
+        angles = self.angles[worlds, objects][:, None]
+        cos, sin = np.cos(angles), np.sin(angles)
+        local = self._local_vertices[objects, :n_vertices]
+        pos = self.positions[worlds, objects]
+        vertices = np.stack(
+            (
+                local[..., 0] * cos - local[..., 1] * sin + pos[:, 0:1],
+                local[..., 0] * sin + local[..., 1] * cos + pos[:, 1:2],
+            ),
+            axis=-1,
+        )
+        local = self._local_normals[objects, :n_vertices]
+        normals = np.stack(
+            (
+                local[..., 0] * cos - local[..., 1] * sin,
+                local[..., 0] * sin + local[..., 1] * cos,
+            ),
+            axis=-1,
+        )
+        return vertices, normals
+
+    def _collisions(self) -> Contacts:
+        # the pairs whose bounding boxes overlap are tested with the kernel of their group, the
+        # collisions are returned ordered by pair and world
+        worlds, pairs, normals, depths = [], [], [], []
+        if len(self._pairs):
+            min_x, min_y, max_x, max_y = self._bounding_boxes()
+            first, second = self._pairs[:, 0], self._pairs[:, 1]
+            overlap = (
+                (min_x[:, first] < max_x[:, second])
+                & (max_x[:, first] > min_x[:, second])
+                & (min_y[:, first] < max_y[:, second])
+                & (max_y[:, first] > min_y[:, second])
+            )
+            for kernel, swapped, first, second, indices in self._groups:
+                candidate_worlds, k = np.nonzero(overlap[:, indices])
+                if not len(k):
+                    continue
+                hit, normal, depth = kernel(self, candidate_worlds, first[k], second[k])
+                worlds.append(candidate_worlds[hit])
+                pairs.append(indices[k[hit]])
+                normals.append(-normal[hit] if swapped else normal[hit])
+                depths.append(depth[hit])
+
+        worlds = np.concatenate(worlds or [np.empty(0, np.intp)])
+        pairs = np.concatenate(pairs or [np.empty(0, np.intp)])
+        order = np.lexsort((worlds, pairs))
+        return (
+            worlds[order],
+            pairs[order],
+            np.concatenate(normals or [np.empty((0, 2))])[order],
+            np.concatenate(depths or [np.empty(0)])[order],
+        )
+
+    def _ball_ball(self, worlds, first, second) -> Contacts:
+        delta = self.positions[worlds, second] - self.positions[worlds, first]
+        dist = np.sqrt(delta[:, 0] ** 2 + delta[:, 1] ** 2)
+        reach = self._radius[first] + self._radius[second]
+        hit = dist < reach
+        with np.errstate(divide="ignore", invalid="ignore"):
+            normal = delta * (1 / dist)[:, None]
+        return hit, normal, reach - dist
+
+    def _ball_box(self, worlds, first, second) -> Contacts:
+        # same cases as ball_box_collision
+        radius = self._radius[first]
+        half = self._half_extends[second]
+        offset = self.positions[worlds, first] - self.positions[worlds, second]
+        closest = np.clip(offset, -half, half)
+        outside = np.any(closest != offset, axis=-1)
+
+        delta = closest - offset
+        dist = np.sqrt(delta[:, 0] ** 2 + delta[:, 1] ** 2)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            outside_normal = delta / dist[:, None]
+
+        to_side = half - np.abs(offset)
+        along_x = to_side[:, 0] <= to_side[:, 1]
+        sign = np.where(offset >= 0, -1.0, 1.0)
+        inside_normal = np.where(
+            along_x[:, None],
+            np.stack((sign[:, 0], np.zeros_like(dist)), axis=-1),
+            np.stack((np.zeros_like(dist), sign[:, 1]), axis=-1),
+        )
+        inside_depth = radius + np.where(along_x, to_side[:, 0], to_side[:, 1])
+
+        hit = ~outside | (dist <= radius)
+        normal = np.where(outside[:, None], outside_normal, inside_normal)
+        depth = np.where(outside, radius - dist, inside_depth)
+        return hit, normal, depth
+
+    def _box_box(self, worlds, first, second) -> Contacts:
+        # same overlaps, tie-break towards x and normal signs as box_box_collision
+        half1 = self._half_extends[first]
+        half2 = self._half_extends[second]
+        delta = self.positions[worlds, second] - self.positions[worlds, first]
+        overlap = np.minimum(half1, delta + half2) - np.maximum(-half1, delta - half2)
+        hit = np.all(overlap >= 0, axis=-1)
+        along_x = overlap[:, 0] <= overlap[:, 1]
+        sign = np.where(delta >= 0, 1.0, -1.0)
+        zeros = np.zeros(len(worlds))
+        normal = np.where(
+            along_x[:, None],
+            np.stack((sign[:, 0], zeros), axis=-1),
+            np.stack((zeros, sign[:, 1]), axis=-1),
+        )
+        return hit, normal, np.where(along_x, overlap[:, 0], overlap[:, 1])
+
+    def _ball_polygon(self, worlds, first, second) -> Contacts:
+        # same axes as ball_polygon_collision: the polygon normals and the direction from the
+        # ball to the closest vertex
+        n_vertices = self._n_vertices[second[0]]
+        polygon, polygon_normals = self._polygons(worlds, second, n_vertices)
+        center = self.positions[worlds, first]
+        to_vertex = polygon - center[:, None]
+        distances = np.sqrt(to_vertex[..., 0] ** 2 + to_vertex[..., 1] ** 2)
+        closest = np.argmin(distances, axis=-1)[:, None]
+        ball_axis = (
+            np.take_along_axis(to_vertex, closest[..., None], axis=1)
+            * (1 / np.take_along_axis(distances, closest, axis=1))[..., None]
+        )
+        axes = np.concatenate((polygon_normals, ball_axis), axis=1)
+
+        lengths = np.sqrt(axes[..., 0] ** 2 + axes[..., 1] ** 2)
+        projected = (
+            center[:, None, 0] * axes[..., 0] + center[:, None, 1] * axes[..., 1]
+        ) / lengths
+        radius = self._radius[first][:, None]
+        min1, max1 = projected - radius, projected + radius
+        min2, max2 = _project(polygon, axes, lengths)
+        direction = self.positions[worlds, second] - center
+        return _sat(min1, max1, min2, max2, axes, direction)
+
+    def _polygon_polygon(self, worlds, first, second) -> Contacts:
+        # separating axis test with the normals of both polygons like
+        # polygon_polygon_collision_sat
+        n_vertices1 = self._n_vertices[first[0]]
+        n_vertices2 = self._n_vertices[second[0]]
+        polygon1, normals1 = self._polygons(worlds, first, n_vertices1)
+        polygon2, normals2 = self._polygons(worlds, second, n_vertices2)
+        axes = np.concatenate((normals1, normals2), axis=1)
+        lengths = np.sqrt(axes[..., 0] ** 2 + axes[..., 1] ** 2)
+        min1, max1 = _project(polygon1, axes, lengths)
+        min2, max2 = _project(polygon2, axes, lengths)
+        direction = self.positions[worlds, second] - self.positions[worlds, first]
+        return _sat(min1, max1, min2, max2, axes, direction)
+
+    def _resolve(
+        self,
+        worlds: np.ndarray,
+        pairs: np.ndarray,
+        normals: np.ndarray,
+        depths: np.ndarray,
+    ):
+        # resolve_collision for one pair at a time in all worlds in which it collides
+        pos, vel = self.positions, self.velocities
+        starts = np.flatnonzero(np.diff(pairs, prepend=-1)).tolist()
+        for start, end in zip(starts, starts[1:] + [len(pairs)]):
+            i, j = self._pairs[pairs[start]].tolist()
+            fixed_i, fixed_j = self._fixed[i], self._fixed[j]
+            if fixed_i and fixed_j:
+                continue
+            rows = worlds[start:end]
+            normal = normals[start:end]
+            depth = depths[start:end, None]
+
+            if not fixed_i and not fixed_j:
+                pos[rows, i] -= normal * (depth / 2)
+                pos[rows, j] += normal * (depth / 2)
+            elif fixed_i:
+                pos[rows, j] += normal * depth
+            else:
+                pos[rows, i] -= normal * depth
+
+            e = (self._bounciness[i] + self._bounciness[j]) / 2
+            rel_vel = vel[rows, i] - vel[rows, j]
+            impulse = (
+                -(1 + e)
+                * (rel_vel[:, 0] * normal[:, 0] + rel_vel[:, 1] * normal[:, 1])
+                / ((1 / self._mass[i]) + (1 / self._mass[j]))
+            )[:, None]
+            if not fixed_i:
+                vel[rows, i] += impulse / self._mass[i] * normal
+            if not fixed_j:
+                vel[rows, j] -= impulse / self._mass[j] * normal
+
+
+def _project(
+    vertices: np.ndarray, axes: np.ndarray, lengths: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    # extends of the (n, vertices, 2) polygons along the (n, axes, 2) axes, like
+    # ConvexPolygon.projected_extends
+    projected = (
+        vertices[:, None, :, 0] * axes[:, :, None, 0]
+        + vertices[:, None, :, 1] * axes[:, :, None, 1]
+    ) / lengths[..., None]
+    return projected.min(axis=-1), projected.max(axis=-1)
+
+
+def _sat(
+    min1: np.ndarray,
+    max1: np.ndarray,
+    min2: np.ndarray,
+    max2: np.ndarray,
+    axes: np.ndarray,
+    direction: np.ndarray,
+) -> Contacts:
+    # vectorized version of collision._sat for the projections on all axes
+    hit = ~np.any((max1 < min2) | (max2 < min1), axis=-1)
+    overlaps = np.minimum(max1, max2) - np.maximum(min1, min2)
+    best = np.argmin(overlaps, axis=-1)[:, None]
+    depth = np.take_along_axis(overlaps, best, axis=1)[:, 0]
+    normal = np.take_along_axis(axes, best[..., None], axis=1)[:, 0]
+    towards = direction[:, 0] * normal[:, 0] + direction[:, 1] * normal[:, 1]
+    normal = np.where((towards < 0)[:, None], -normal, normal)
+    return hit, normal, depth
+
+
+# vectorized versions of the narrow phase functions registered for the object types
+_KERNELS = {
+    ball_ball_collision: BatchedWorld._ball_ball,
+    ball_box_collision: BatchedWorld._ball_box,
+    ball_polygon_collision: BatchedWorld._ball_polygon,
+    box_box_collision: BatchedWorld._box_box,
+    polygon_polygon_collision: BatchedWorld._polygon_polygon,
+}
+
+
+def _kernel(type1: type, type2: type) -> Tuple[Callable, bool]:
+    # the kernel of the registered test for the pair and whether it takes the objects swapped
+    kernel = _KERNELS.get(collision_test(type1, type2))
+    if kernel is not None:
+        return kernel, False
+    kernel = _KERNELS.get(collision_test(type2, type1))
+    if kernel is not None:
+        return kernel, True
+    raise ValueError(f"Objects of types {type1} and {type2} can not be batched")
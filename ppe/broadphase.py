@@ -0,0 +1,335 @@
+from typing import Dict, Iterable, List, Set, Tuple
+import math
+from contextlib import contextmanager
+
+import numpy as np
+
+from ppe.vector import Vector
+
+CellRange = Tuple[
+    int, int, int, int
+]  # (min x, min y, max x, max y) cell indices, inclusive
+
+
+class SpatialHash:
+    """Uniform grid which stores every object in all cells overlapped by its bounding box.
+
+    Objects which are inserted notify the grid whenever their bounding box changes (see
+    `GameObject._bbox_changed`) so that the grid is always up to date without rebuilding it.
+    An object can only be part of a single grid at a time.
+    """
+
+    def __init__(self, cell_size: float = 1):
+        if cell_size <= 0:
+            raise ValueError("Cell size must be positive")
+
+        self.cell_size = cell_size
+        self._cells: Dict[Tuple[int, int], Set["GameObject"]] = {}
+        self._ranges: Dict["GameObject", CellRange] = {}
+        # insertion order of the objects, used to return query results in a deterministic order
+        self._serials: Dict["GameObject", int] = {}
+        self._next_serial = 0
+        # cells which lie completely inside the watched region and the objects which are not
+        # completely covered by these cells, see watch_region
+        self._interior: CellRange = None
+        self._outside_interior: Set["GameObject"] = set()
+        # objects whose update is postponed, see deferred_updates
+        self._deferred: Set["GameObject"] = None
+        # objects which were inserted or changed their cells, see track_moves
+        self._moved: Set["GameObject"] = None
+
+    def __len__(self) -> int:
+        return len(self._ranges)
+
+    def __contains__(self, obj: "GameObject") -> bool:
+        return obj in self._ranges
+
+    def __iter__(self):
+        return iter(self._ranges)
+
+    def cell_range(self, bbox: Tuple[Vector, Vector]) -> CellRange:
+        bbox_min, bbox_max = bbox
+        return (
+            math.floor(bbox_min.x / self.cell_size),
+            math.floor(bbox_min.y / self.cell_size),
+            math.floor(bbox_max.x / self.cell_size),
+            math.floor(bbox_max.y / self.cell_size),
+        )
+
+    def _is_interior(self, cell_range: CellRange) -> bool:
+        x0, y0, x1, y1 = cell_range
+        ix0, iy0, ix1, iy1 = self._interior
+        return ix0 <= x0 and iy0 <= y0 and x1 <= ix1 and y1 <= iy1
+
+    def _track_interior(self, obj: "GameObject", cell_range: CellRange):
+        if self._interior is None:
+            return
+        if self._is_interior(cell_range):
+            self._outside_interior.discard(obj)
+        else:
+            self._outside_interior.add(obj)
+
+    def watch_region(self, box: Tuple[Vector, Vector]):
+        """Starts tracking which objects are possibly not completely inside the given box.
+
+        Objects whose cells all lie completely inside the box can not leave it without changing
+        their cells, so only the objects in `boundary_objects` need to be checked against the box.
+        Pass None to stop tracking.
+        """
+        self._outside_interior = set()
+        if box is None:
+            self._interior = None
+            return
+
+        box_min, box_max = box
+        self._interior = (
+            math.ceil(box_min.x / self.cell_size),
+            math.ceil(box_min.y / self.cell_size),
+            math.floor(box_max.x / self.cell_size) - 1,
+            math.floor(box_max.y / self.cell_size) - 1,
+        )
+        for obj, cell_range in self._ranges.items():
+            self._track_interior(obj, cell_range)
+
+    @property
+    def boundary_objects(self) -> Set["GameObject"]:
+        return self._outside_interior
+
+    def track_moves(self):
+        """Starts recording the objects which are inserted or change their cells.
+
+        An object can only leave a region without changing its cells if its cells cross the
+        border of the region, so the objects returned by `pop_moved` are the only other ones
+        which need to be checked.
+        """
+        self._moved = set(self._ranges)
+
+    def pop_moved(self) -> Set["GameObject"]:
+        """Returns the objects which were inserted or changed their cells since the last call."""
+        moved, self._moved = self._moved, set()
+        return moved
+
+    def _add_to_cells(self, obj: "GameObject", cell_range: CellRange):
+        x0, y0, x1, y1 = cell_range
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                cell = self._cells.get((x, y))
+                if cell is None:
+                    cell = self._cells[(x, y)] = set()
+                cell.add(obj)
+
+    def _remove_from_cells(self, obj: "GameObject", cell_range: CellRange):
+        x0, y0, x1, y1 = cell_range
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                cell = self._cells[(x, y)]
+                cell.discard(obj)
+                if not cell:
+                    del self._cells[(x, y)]
+
+    def insert(self, obj: "GameObject"):
+        if obj in self._ranges:
+            return
+
+        cell_range = self.cell_range(obj.bbox)
+        self._add_to_cells(obj, cell_range)
+        self._ranges[obj] = cell_range
+        self._track_interior(obj, cell_range)
+        self._serials[obj] = self._next_serial
+        self._next_serial += 1
+        obj._spatial_hash = self
+        if self._moved is not None:
+            self._moved.add(obj)
+
+    def insert_many(
+        self, objects: List["GameObject"], bbox_min: np.ndarray, bbox_max: np.ndarray
+    ):
+        """Inserts new objects whose bounding boxes are given as (n, 2) arrays."""
+        cell_min = np.floor(bbox_min / self.cell_size).astype(np.int64).tolist()
+        cell_max = np.floor(bbox_max / self.cell_size).astype(np.int64).tolist()
+        cells = self._cells
+        moved = self._moved
+        for obj, (x0, y0), (x1, y1) in zip(objects, cell_min, cell_max):
+            if obj in self._ranges:
+                continue
+
+            cell_range = (x0, y0, x1, y1)
+            if x0 == x1 and y0 == y1:
+                # most objects are smaller than a cell
+                cell = cells.get((x0, y0))
+                if cell is None:
+                    cell = cells[(x0, y0)] = set()
+                cell.add(obj)
+            else:
+                self._add_to_cells(obj, cell_range)
+            self._ranges[obj] = cell_range
+            self._track_interior(obj, cell_range)
+            self._serials[obj] = self._next_serial
+            self._next_serial += 1
+            obj._spatial_hash = self
+            if moved is not None:
+                moved.add(obj)
+
+    def remove(self, obj: "GameObject"):
+        cell_range = self._ranges.pop(obj)
+        del self._serials[obj]
+        self._outside_interior.discard(obj)
+        if self._moved is not None:
+            self._moved.discard(obj)
+        self._remove_from_cells(obj, cell_range)
+        if obj._spatial_hash is self:
+            obj._spatial_hash = None
+
+    def update(self, obj: "GameObject"):
+        if self._deferred is not None:
+            self._deferred.add(obj)
+            return
+
+        old_range = self._ranges[obj]
+        new_range = self.cell_range(obj.bbox)
+        # most updates are small movements which do not leave the current cells
+        if new_range == old_range:
+            return
+
+        self._remove_from_cells(obj, old_range)
+        self._add_to_cells(obj, new_range)
+        self._ranges[obj] = new_range
+        self._track_interior(obj, new_range)
+        if self._moved is not None:
+            self._moved.add(obj)
+
+    @contextmanager
+    def deferred_updates(self):
+        """Postpones the updates of moved objects until the end of the context.
+
+        Objects can then be moved from several threads as only the objects themselves are
+        modified, the grid is updated once afterwards.
+        """
+        self._deferred = set()
+        try:
+            yield
+        finally:
+            deferred, self._deferred = self._deferred, None
+            for obj in self.sort(obj for obj in deferred if obj in self._ranges):
+                self.update(obj)
+
+    def clear(self):
+        for obj in self._ranges:
+            if obj._spatial_hash is self:
+                obj._spatial_hash = None
+        self._cells.clear()
+        self._ranges.clear()
+        self._serials.clear()
+        self._next_serial = 0
+        self._outside_interior.clear()
+        if self._moved is not None:
+            self._moved.clear()
+
+    def serial(self, obj: "GameObject") -> int:
+        return self._serials[obj]
+
+    def sort(self, objects: Iterable["GameObject"]) -> List["GameObject"]:
+        """Sorts the given objects by their insertion order."""
+        return sorted(objects, key=self._serials.__getitem__)
+
+    def candidate_pairs(self) -> List[Tuple["GameObject", "GameObject"]]:
+        """Returns all pairs of objects sharing at least one cell.
+
+        The pairs are ordered like the pairs of a nested loop over the objects in insertion order.
+        """
+        serials = self._serials
+        pairs = set()
+        for cell in self._cells.values():
+            if len(cell) < 2:
+                continue
+            ordered = sorted(cell, key=serials.__getitem__)
+            for i, obj1 in enumerate(ordered):
+                for obj2 in ordered[i + 1 :]:
+                    pairs.add((obj1, obj2))
+
+        return sorted(pairs, key=lambda pair: (serials[pair[0]], serials[pair[1]]))
+
+    def query_cells(self, cell_range: CellRange) -> Set["GameObject"]:
+        x0, y0, x1, y1 = cell_range
+        # for huge query areas it is cheaper to look at all objects than at all cells
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(self._cells):
+            return {
+                obj
+                for obj, (ox0, oy0, ox1, oy1) in self._ranges.items()
+                if ox0 <= x1 and ox1 >= x0 and oy0 <= y1 and oy1 >= y0
+            }
+
+        candidates = set()
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                cell = self._cells.get((x, y))
+                if cell is not None:
+                    candidates.update(cell)
+        return candidates
+
+    def query_aabb(self, bbox: Tuple[Vector, Vector]) -> Set["GameObject"]:
+        """Returns all objects whose bounding box overlaps the given box."""
+        bbox_min, bbox_max = bbox
+        if all(
+            math.isfinite(v) for v in (bbox_min.x, bbox_min.y, bbox_max.x, bbox_max.y)
+        ):
+            candidates = self.query_cells(self.cell_range(bbox))
+        else:
+            # an unbounded box covers more cells than there are
+            candidates = self._ranges
+        return {
+            obj
+            for obj in candidates
+            if obj.bbox[0].x <= bbox_max.x
+            and obj.bbox[1].x >= bbox_min.x
+            and obj.bbox[0].y <= bbox_max.y
+            and obj.bbox[1].y >= bbox_min.y
+        }
+
+    def query_rings(self, point: Vector) -> Iterable[Tuple[float, Set["GameObject"]]]:
+        """Yields the objects in square rings of cells of increasing size around the given point.
+
+        Together with every ring the radius around the point which is completely covered by the
+        rings visited so far is yielded, i.e. all unvisited objects are at least that far away.
+        """
+        cx = math.floor(point.x / self.cell_size)
+        cy = math.floor(point.y / self.cell_size)
+
+        seen = set()
+        ring = 0
+        while len(seen) < len(self._ranges):
+            # once the rings are larger than the number of occupied cells it is cheaper to
+            # return all remaining objects at once
+            if (2 * ring + 1) ** 2 > len(self._cells):
+                yield float("inf"), set(self._ranges) - seen
+                return
+
+            new = set()
+            for x, y in self._ring_cells(cx, cy, ring):
+                cell = self._cells.get((x, y))
+                if cell is not None:
+                    new.update(cell)
+            new -= seen
+            seen |= new
+
+            covered_radius = min(
+                point.x - (cx - ring) * self.cell_size,
+                (cx + ring + 1) * self.cell_size - point.x,
+                point.y - (cy - ring) * self.cell_size,
+                (cy + ring + 1) * self.cell_size - point.y,
+            )
+            yield covered_radius, new
+            ring += 1
+
+    @staticmethod
+    def _ring_cells(cx: int, cy: int, ring: int) -> Iterable[Tuple[int, int]]:
+        if ring == 0:
+            yield cx, cy
+            return
+
+        for x in range(cx - ring, cx + ring + 1):
+            yield x, cy - ring
+            yield x, cy + ring
+        for y in range(cy - ring + 1, cy + ring):
+            yield cx - ring, y
+            yield cx + ring, y
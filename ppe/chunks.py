@@ -0,0 +1,339 @@
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, List, Set, Tuple, Union
+import math
+import os
+import pickle
+import weakref
+
+from ppe.broadphase import CellRange
+from ppe.objects import ConvexPolygon, GameObject
+from ppe.shapes import PolygonShape
+from ppe.vector import Vector
+from ppe.world import World
+
+Tile = Tuple[int, int]  # (x, y) index of a tile
+
+
+class TileStore:
+    """Directory with one file per non-empty tile which contains the pickled objects of the tile."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, tile: Tile) -> str:
+        return os.path.join(self.directory, f"tile_{tile[0]}_{tile[1]}.pkl")
+
+    def tiles(self) -> Set[Tile]:
+        tiles = set()
+        for filename in os.listdir(self.directory):
+            if filename.startswith("tile_") and filename.endswith(".pkl"):
+                x, y = filename[len("tile_") : -len(".pkl")].split("_")
+                tiles.add((int(x), int(y)))
+        return tiles
+
+    def read(self, tile: Tile) -> bytes:
+        """Returns the serialized objects of the tile or None if the tile is empty."""
+        try:
+            with open(self._path(tile), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def write(self, tile: Tile, data: bytes):
+        # written to a temporary file first so that an interrupted write does not corrupt the tile
+        path = self._path(tile)
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+
+    def delete(self, tile: Tile):
+        try:
+            os.remove(self._path(tile))
+        except FileNotFoundError:
+            pass
+
+
+class ChunkedWorld:
+    """World whose objects are partitioned into square tiles of which only some are simulated.
+
+    All tiles within `load_radius` tiles of a focus point (e.g. a player or a camera) are active.
+    Their objects are part of a regular `World` which is updated every step. The objects of
+    inactive tiles are frozen and kept serialized, the most recently deactivated tiles are kept in
+    memory as long as they fit into `memory_budget` bytes and the least recently used tiles are
+    written to the tile store on disk otherwise.
+
+    An object belongs to the tile containing its position. Deactivated objects are serialized, so
+    references to them become stale and their collision callbacks must be picklable. Polygons
+    which shared a shape share it again after they are loaded.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        tile_size: float = 16,
+        load_radius: int = 1,
+        memory_budget: int = 64 * 2**20,
+        cell_size: float = 1,
+    ):
+        if tile_size <= 0:
+            raise ValueError("Tile size must be positive")
+        if load_radius < 0:
+            raise ValueError("Load radius must not be negative")
+
+        self.tile_size = tile_size
+        self.load_radius = load_radius
+        self.memory_budget = memory_budget
+        self._store = TileStore(directory)
+        self._world = World([], cell_size=cell_size)
+        self._world._spatial_hash.track_moves()
+        self._focus_points: Dict[Hashable, Union[Vector, GameObject]] = {}
+        self._active_tiles: Set[Tile] = set()
+        # tile of every simulated object, only updated for objects which changed their cells or
+        # whose cells cross a tile border (see _spans_tiles)
+        self._object_tiles: Dict[GameObject, Tile] = {}
+        self._spanning: Set[GameObject] = set()
+        # serialized objects of inactive tiles which have not been written to disk yet, least
+        # recently used first. Objects moving into a tile are appended as a separate chunk, the
+        # chunks are merged with the stored objects when the tile is loaded, evicted or flushed.
+        self._cache: "OrderedDict[Tile, List[bytes]]" = OrderedDict()
+        self._cache_bytes = 0
+        # cached tiles whose chunks replace the stored objects instead of adding to them
+        self._replaced_tiles: Set[Tile] = set()
+        # shapes of the loaded polygons by their geometry
+        self._shapes: "weakref.WeakValueDictionary[tuple, PolygonShape]" = (
+            weakref.WeakValueDictionary()
+        )
+
+    @property
+    def world(self) -> World:
+        """The world containing the objects of the active tiles."""
+        return self._world
+
+    @property
+    def objects(self) -> List[GameObject]:
+        return self._world.objects
+
+    @property
+    def collisions(self):
+        return self._world.collisions
+
+    @property
+    def active_tiles(self) -> Set[Tile]:
+        return set(self._active_tiles)
+
+    @property
+    def cached_tiles(self) -> List[Tile]:
+        """Inactive tiles kept in memory, least recently used first."""
+        return list(self._cache)
+
+    @property
+    def cache_bytes(self) -> int:
+        return self._cache_bytes
+
+    @property
+    def focus_points(self) -> Dict[Hashable, Union[Vector, GameObject]]:
+        return dict(self._focus_points)
+
+    def set_focus(self, key: Hashable, target: Union[Vector, GameObject]):
+        """Registers or moves a focus point, objects are followed as they move."""
+        self._focus_points[key] = target
+
+    def remove_focus(self, key: Hashable):
+        del self._focus_points[key]
+
+    def tile_of(self, point: Vector) -> Tile:
+        return (
+            math.floor(point.x / self.tile_size),
+            math.floor(point.y / self.tile_size),
+        )
+
+    def add_object(self, obj: GameObject):
+        self.add_objects([obj])
+
+    def add_objects(self, objects: Iterable[GameObject]):
+        """Adds objects to their tiles, objects of inactive tiles are stored right away."""
+        active = []
+        inactive: Dict[Tile, List[GameObject]] = {}
+        for obj in objects:
+            tile = self.tile_of(obj.pos)
+            if tile in self._active_tiles:
+                active.append(obj)
+            else:
+                inactive.setdefault(tile, []).append(obj)
+
+        self._world.add_objects(active)
+        for tile, tile_objects in inactive.items():
+            self._stash(tile, tile_objects)
+        self._enforce_budget()
+
+    def _required_tiles(self) -> Set[Tile]:
+        required = set()
+        r = self.load_radius
+        for target in self._focus_points.values():
+            point = target.pos if isinstance(target, GameObject) else target
+            tx, ty = self.tile_of(point)
+            for x in range(tx - r, tx + r + 1):
+                for y in range(ty - r, ty + r + 1):
+                    required.add((x, y))
+        return required
+
+    def _spans_tiles(self, cell_range: CellRange) -> bool:
+        # objects whose cells lie in a single tile can not change their tile without changing
+        # their cells
+        cell_size = self._world._spatial_hash.cell_size
+        x0, y0, x1, y1 = cell_range
+        return (
+            math.floor(x0 * cell_size / self.tile_size)
+            != math.ceil((x1 + 1) * cell_size / self.tile_size) - 1
+            or math.floor(y0 * cell_size / self.tile_size)
+            != math.ceil((y1 + 1) * cell_size / self.tile_size) - 1
+        )
+
+    def _reassign_tiles(self) -> Set[GameObject]:
+        # updates the tiles of the objects which might have changed their tile
+        self._world._sync_spatial_hash()
+        spatial_hash = self._world._spatial_hash
+        tiles = self._object_tiles
+        checked = spatial_hash.pop_moved() | self._spanning
+        for obj in checked:
+            if obj not in spatial_hash:
+                continue
+            tiles[obj] = self.tile_of(obj.pos)
+            if self._spans_tiles(spatial_hash.cell_range(obj.bbox)):
+                self._spanning.add(obj)
+            else:
+                self._spanning.discard(obj)
+
+        # objects which were removed from the world directly
+        if len(tiles) > len(spatial_hash):
+            self._object_tiles = {
+                obj: tile for obj, tile in tiles.items() if obj in spatial_hash
+            }
+            self._spanning &= self._object_tiles.keys()
+        return checked
+
+    def update_tiles(self):
+        """Activates the tiles around the focus points and deactivates all other tiles.
+
+        Objects which moved out of the active tiles are stored in the tile they moved to.
+        This is done at the beginning of every update.
+        """
+        required = self._required_tiles()
+
+        checked = self._reassign_tiles()
+        tiles = self._object_tiles
+        # all objects have to be checked only if the active tiles change
+        candidates = tiles if required != self._active_tiles else checked
+        outside: Dict[Tile, List[GameObject]] = {}
+        for obj in self._world._spatial_hash.sort(
+            obj for obj in candidates if obj in tiles and tiles[obj] not in required
+        ):
+            outside.setdefault(tiles[obj], []).append(obj)
+        removed = [obj for tile_objects in outside.values() for obj in tile_objects]
+        self._world.remove_objects(removed)
+        for obj in removed:
+            del tiles[obj]
+            self._spanning.discard(obj)
+        # the objects of deactivated tiles replace the outdated stored content of the tiles
+        for tile in self._active_tiles - required:
+            self._stash(tile, outside.pop(tile, []), replace=True)
+        for tile, tile_objects in outside.items():
+            self._stash(tile, tile_objects)
+
+        # sorted to add the objects in a deterministic order
+        for tile in sorted(required - self._active_tiles):
+            self._world.add_objects(self._load(tile))
+        self._active_tiles = required
+
+        self._enforce_budget()
+
+    def update(self, dt: float):
+        self.update_tiles()
+        self._world.update(dt)
+
+    def flush(self):
+        """Writes all tiles including the active ones to disk, e.g. to save the world."""
+        # afterwards all simulated objects are part of an active tile
+        self.update_tiles()
+
+        while self._cache:
+            tile, chunks = self._cache.popitem(last=False)
+            self._write(tile, chunks)
+        self._cache_bytes = 0
+
+        active: Dict[Tile, List[GameObject]] = {tile: [] for tile in self._active_tiles}
+        for obj in self._world.objects:
+            active[self.tile_of(obj.pos)].append(obj)
+        for tile, tile_objects in active.items():
+            if tile_objects:
+                self._store.write(tile, self._serialize(tile_objects))
+            else:
+                self._store.delete(tile)
+
+    @staticmethod
+    def _serialize(objects: List[GameObject]) -> bytes:
+        return pickle.dumps(objects, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _intern_shapes(self, objects: List[GameObject]):
+        # every unpickled chunk has its own copies of the shapes
+        for obj in objects:
+            if isinstance(obj, ConvexPolygon):
+                shape = obj.shape
+                key = (shape.vertices, shape.centroid)
+                obj._shape = self._shapes.setdefault(key, shape)
+
+    def _take(self, tile: Tile) -> Tuple[List[bytes], bool]:
+        # removes the chunks of the tile from the cache, the flag is set if they replace the store
+        chunks = self._cache.pop(tile, [])
+        self._cache_bytes -= sum(len(data) for data in chunks)
+        replaced = tile in self._replaced_tiles
+        self._replaced_tiles.discard(tile)
+        return chunks, replaced
+
+    def _load(self, tile: Tile) -> List[GameObject]:
+        # takes the objects of an inactive tile out of the cache and the store
+        chunks, replaced = self._take(tile)
+        if not replaced:
+            data = self._store.read(tile)
+            if data is not None:
+                chunks.insert(0, data)
+        objects = [obj for data in chunks for obj in pickle.loads(data)]
+        self._intern_shapes(objects)
+        return objects
+
+    def _write(self, tile: Tile, chunks: List[bytes]):
+        # writes the chunks of an evicted tile, they are merged if there is more than one
+        if tile in self._replaced_tiles:
+            self._replaced_tiles.discard(tile)
+        else:
+            data = self._store.read(tile)
+            if data is not None:
+                chunks = [data] + chunks
+        if len(chunks) > 1:
+            objects = [obj for data in chunks for obj in pickle.loads(data)]
+            self._intern_shapes(objects)
+            chunks = [self._serialize(objects)]
+        self._store.write(tile, chunks[0])
+
+    def _stash(self, tile: Tile, objects: List[GameObject], replace: bool = False):
+        # adds the objects to the inactive tile which becomes the most recently used one,
+        # the disk copy of the tile is outdated until the tile is evicted from the cache
+        if replace:
+            self._take(tile)
+            if not objects:
+                self._store.delete(tile)
+                return
+            self._replaced_tiles.add(tile)
+        elif not objects:
+            return
+        data = self._serialize(objects)
+        self._cache.setdefault(tile, []).append(data)
+        self._cache.move_to_end(tile)
+        self._cache_bytes += len(data)
+
+    def _enforce_budget(self):
+        while self._cache_bytes > self.memory_budget:
+            tile, chunks = self._cache.popitem(last=False)
+            self._cache_bytes -= sum(len(data) for data in chunks)
+            self._write(tile, chunks)
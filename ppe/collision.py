@@ -1,21 +1,114 @@
+from concurrent.futures import Executor
 from itertools import chain
-from typing import List, Tuple, Iterable
+import math
+import random
+import sys
+import time
+from typing import Callable, Collection, Dict, List, Tuple, Iterable
 from dataclasses import dataclass
 
 from ppe.vector import Vector
+from ppe.gjk import minkowski_support, gjk, epa
 
 
 import dataclasses
 
+DEFAULT_CATEGORY = 1
+ALL_CATEGORIES = 0xFFFFFFFF
 
-@dataclasses.dataclass
+# narrow phase for pairs of polygons, "sat", "gjk" or "auto"
+POLYGON_NARROW_PHASE = "auto"
+# total number of vertices from which the "auto" narrow phase uses GJK/EPA, measured with
+# benchmarks/gjk_crossover.py (calibrate_gjk_crossover), None uses SAT for all pairs
+GJK_CROSSOVER = 6
+# minimum number of candidate pairs per worker for which get_collisions uses the executor,
+# smaller shards are slower than testing the pairs in the calling thread
+MIN_PAIRS_PER_SHARD = 64
+
+
+@dataclasses.dataclass(slots=True, init=False)
 class Collision:
     obj1: "GameObject"
     obj2: "GameObject"
     normal: Vector  # normal points outwards from obj1 and is normalized
     depth: float
-    contact_point_1: Vector
-    contact_point_2: Vector
+    # the contact points are computed on first access if they are not given, see contact_points
+    _contact_point_1: Vector
+    _contact_point_2: Vector
+    _contact_points: Tuple[Vector, ...] = dataclasses.field(repr=False, compare=False)
+    # positions and angles of the objects when the collision was detected, the collision
+    # resolution and the next integration move the objects before the points are usually read
+    # (trade-off: 32 bytes per contact as the vectors and floats are shared with the objects)
+    _pos1: Vector = dataclasses.field(repr=False, compare=False)
+    _pos2: Vector = dataclasses.field(repr=False, compare=False)
+    _angle1: float = dataclasses.field(repr=False, compare=False)
+    _angle2: float = dataclasses.field(repr=False, compare=False)
+
+    def __init__(
+        self,
+        obj1: "GameObject",
+        obj2: "GameObject",
+        normal: Vector,
+        depth: float,
+        contact_point_1: Vector = None,
+        contact_point_2: Vector = None,
+    ):
+        self.obj1 = obj1
+        self.obj2 = obj2
+        self.normal = normal
+        self.depth = depth
+        self._contact_point_1 = contact_point_1
+        self._contact_point_2 = contact_point_2
+        self._contact_points = None
+        self._pos1 = obj1.pos
+        self._pos2 = obj2.pos
+        self._angle1 = obj1.angle
+        self._angle2 = obj2.angle
+
+    @property
+    def contact_points(self) -> Tuple[Vector, ...]:
+        """The contact manifold, one or two points on the surface of obj1, the deepest first.
+
+        The points are computed by clipping the features of both objects which are furthest in
+        the direction of the normal the first time they are accessed, at the positions of the
+        objects when the collision was detected.
+        """
+        if self._contact_points is None:
+            self._contact_points = contact_manifold(self)
+        return self._contact_points
+
+    @property
+    def contact_point_1(self) -> Vector:
+        # deepest point of obj1 in obj2
+        if self._contact_point_1 is None:
+            self._contact_point_1 = self.contact_points[0]
+        return self._contact_point_1
+
+    @contact_point_1.setter
+    def contact_point_1(self, value: Vector):
+        self._contact_point_1 = value
+
+    @property
+    def contact_point_2(self) -> Vector:
+        # deepest point of obj2 in obj1
+        if self._contact_point_2 is None:
+            self._contact_point_2 = self.contact_point_1 - self.normal * self.depth
+        return self._contact_point_2
+
+    @contact_point_2.setter
+    def contact_point_2(self, value: Vector):
+        self._contact_point_2 = value
+
+
+def should_collide(obj1: "GameObject", obj2: "GameObject") -> bool:
+    # cheap filter which is applied to every candidate pair before any geometric test
+    group = obj1.collision_group
+    if group != 0 and group == obj2.collision_group:
+        return group > 0
+
+    return bool(obj1.collision_category & obj2.collision_mask) and bool(
+        obj2.collision_category & obj1.collision_mask
+    )
 
 
 def bounding_box_collision(obj1: "GameObject", obj2: "GameObject") -> bool:
@@ -29,9 +122,30 @@ def bounding_box_collision(obj1: "GameObject", obj2: "GameObject") -> bool:
     )
 
 
+def bounding_box_contact(obj1: "GameObject", obj2: "GameObject") -> Collision:
+    # coarse contact which treats both objects as their bounding boxes, the normal is the axis of
+    # the smaller overlap
+    bbox1_min, bbox1_max = obj1.bbox
+    bbox2_min, bbox2_max = obj2.bbox
+    low_x, high_x = max(bbox1_min.x, bbox2_min.x), min(bbox1_max.x, bbox2_max.x)
+    low_y, high_y = max(bbox1_min.y, bbox2_min.y), min(bbox1_max.y, bbox2_max.y)
+    if high_x <= low_x or high_y <= low_y:
+        return None
+
+    delta = (bbox2_min + bbox2_max) - (bbox1_min + bbox1_max)
+    if high_x - low_x < high_y - low_y:
+        normal = Vector(1 if delta.x >= 0 else -1, 0)
+        depth = high_x - low_x
+    else:
+        normal = Vector(0, 1 if delta.y >= 0 else -1)
+        depth = high_y - low_y
+    point = Vector((low_x + high_x) / 2, (low_y + high_y) / 2)
+    return Collision(obj1, obj2, normal, depth, point, point)
+
+
 def _sat(obj1: "GameObject", obj2: "GameObject", axes: Iterable[Vector]) -> Collision:
     min_depth = float("inf")
-    min_depth_collision = None
+    min_depth_axis = None
 
     for axis in axes:
         min1, max1 = obj1.projected_extends(axis)
@@ -43,15 +157,16 @@ def _sat(obj1: "GameObject", obj2: "GameObject", axes: Iterable[Vector]) -> Coll
         depth = min(max1, max2) - max(min1, min2)
         if depth < min_depth:
             min_depth = depth
-            min_depth_collision = Collision(obj1, obj2, axis, depth, None, None)
+            min_depth_axis = axis
 
     # in case we have multiple normals lying on the same line (e.g. rectangle) we need to make sure that the normal
     # points to the second object so that the objects can be separated correctly
-    direction = min_depth_collision.obj2.pos - min_depth_collision.obj1.pos
-    if direction.dot(min_depth_collision.normal) < 0:
-        min_depth_collision.normal *= -1
+    direction = obj2.pos - obj1.pos
+    if direction.dot(min_depth_axis) < 0:
+        min_depth_axis = -min_depth_axis
 
-    return min_depth_collision
+    # the collision is only created once the separating axis test has passed
+    return Collision(obj1, obj2, min_depth_axis, min_depth)
 
 
 def ball_polygon_collision(ball: "Ball", polygon: "ConvexPolygon") -> Collision:
@@ -65,24 +180,52 @@ def ball_polygon_collision(ball: "Ball", polygon: "ConvexPolygon") -> Collision:
 
     axes = chain(polygon.get_normals(), [ball_axis])
 
-    collision = _sat(ball, polygon, axes)
-    # !!! contact points are not calculated in _sat
     # the collision returned by _sat has a normal which always points from obj1 to obj2
     # obj1 is the ball and obj2 is the polygon
-    if collision is not None:
-        collision.contact_point_1 = ball.pos + collision.normal * (
-            ball.radius - collision.depth
-        )
-
-    return collision
+    return _sat(ball, polygon, axes)
 
 
 def polygon_polygon_collision(
+    polygon1: "ConvexPolygon", polygon2: "ConvexPolygon", method: str = None
+) -> Collision:
+    # the method defaults to POLYGON_NARROW_PHASE, "auto" uses GJK/EPA for pairs with at least
+    # GJK_CROSSOVER vertices in total as SAT needs O((n + m)^2) operations
+    method = method or POLYGON_NARROW_PHASE
+    if method == "auto":
+        n_vertices = len(polygon1.shape.vertices) + len(polygon2.shape.vertices)
+        use_gjk = GJK_CROSSOVER is not None and n_vertices >= GJK_CROSSOVER
+        method = "gjk" if use_gjk else "sat"
+
+    if method == "gjk":
+        return polygon_polygon_collision_gjk(polygon1, polygon2)
+    elif method == "sat":
+        return polygon_polygon_collision_sat(polygon1, polygon2)
+    else:
+        raise ValueError(f"Unknown narrow phase method {method}")
+
+
+def polygon_polygon_collision_sat(
     polygon1: "ConvexPolygon", polygon2: "ConvexPolygon"
 ) -> Collision:
     axes = chain(polygon1.get_normals(), polygon2.get_normals())
     return _sat(polygon1, polygon2, axes)
-    # !!! contact points are not calculated in _sat
+
+
+def polygon_polygon_collision_gjk(
+    polygon1: "ConvexPolygon", polygon2: "ConvexPolygon"
+) -> Collision:
+    support = minkowski_support(polygon1.vertices, polygon2.vertices)
+    try:
+        simplex = gjk(support)
+    except ValueError:
+        # touching polygons and degenerate cases are left to SAT
+        return polygon_polygon_collision_sat(polygon1, polygon2)
+    if simplex is None:
+        return None
+
+    # like in _sat the normal points from polygon1 to polygon2
+    normal, depth = epa(support, simplex)
+    return Collision(polygon1, polygon2, normal, depth)
 
 
 def ball_ball_collision(ball1: "Ball", ball2: "Ball") -> Collision:
@@ -90,66 +233,446 @@ def ball_ball_collision(ball1: "Ball", ball2: "Ball") -> Collision:
     dist = delta.magnitude()
     if dist < ball1.radius + ball2.radius:
         normal = delta.normalize()
-        return Collision(
-            ball1,
-            ball2,
-            normal,
-            ball1.radius + ball2.radius - dist,
-            ball1.pos + normal * ball1.radius,
-            None,
-        )
+        return Collision(ball1, ball2, normal, ball1.radius + ball2.radius - dist)
 
     return None
 
 
+def box_box_collision(box1: "AABox", box2: "AABox") -> Collision:
+    # closed form of _sat for two axis aligned boxes, the normal is the axis of the smaller
+    # overlap and points from box1 to box2
+    delta = box2.pos - box1.pos
+    overlap_x = min(box1.half_width, delta.x + box2.half_width) - max(
+        -box1.half_width, delta.x - box2.half_width
+    )
+    overlap_y = min(box1.half_height, delta.y + box2.half_height) - max(
+        -box1.half_height, delta.y - box2.half_height
+    )
+    if overlap_x < 0 or overlap_y < 0:
+        return None
+    if overlap_x <= overlap_y:
+        return Collision(box1, box2, Vector(1 if delta.x >= 0 else -1, 0), overlap_x)
+    return Collision(box1, box2, Vector(0, 1 if delta.y >= 0 else -1), overlap_y)
+
+
+def ball_box_collision(ball: "Ball", box: "AABox") -> Collision:
+    # closed form test of a ball and an axis aligned box using the closest point of the box
+    offset = ball.pos - box.pos
+    closest = Vector(
+        min(max(offset.x, -box.half_width), box.half_width),
+        min(max(offset.y, -box.half_height), box.half_height),
+    )
+    if closest.x != offset.x or closest.y != offset.y:
+        # the center is outside of the box
+        delta = closest - offset
+        dist = delta.magnitude()
+        if dist > ball.radius:
+            return None
+        normal = delta / dist
+        depth = ball.radius - dist
+    else:
+        # the center is inside of the box, the ball is pushed out through the closest side
+        to_x = box.half_width - abs(offset.x)
+        to_y = box.half_height - abs(offset.y)
+        if to_x <= to_y:
+            normal = Vector(-1 if offset.x >= 0 else 1, 0)
+            depth = ball.radius + to_x
+        else:
+            normal = Vector(0, -1 if offset.y >= 0 else 1)
+            depth = ball.radius + to_y
+
+    return Collision(ball, box, normal, depth)
+
+
+def closest_point_on_segment(point: Vector, start: Vector, end: Vector) -> Vector:
+    segment = end - start
+    length2 = segment.dot(segment)
+    if length2 == 0:
+        return start
+    t = min(max((point - start).dot(segment) / length2, 0), 1)
+    return start + segment * t
+
+
+def _closest_points_of_segments(
+    p1: Vector, q1: Vector, p2: Vector, q2: Vector
+) -> Tuple[Vector, Vector]:
+    # closest points of two segments which do not intersect, the closest points of two segments
+    # always include an endpoint of one of them
+    candidates = [(p, closest_point_on_segment(p, p2, q2)) for p in (p1, q1)] + [
+        (closest_point_on_segment(p, p1, q1), p) for p in (p2, q2)
+    ]
+    return min(candidates, key=lambda c: (c[1] - c[0]).magnitude())
+
+
+def _segments_intersect(p1: Vector, q1: Vector, p2: Vector, q2: Vector) -> bool:
+    d1, d2 = q1 - p1, q2 - p2
+    return (d1.cross(p2 - p1) * d1.cross(q2 - p1) < 0) and (
+        d2.cross(p1 - p2) * d2.cross(q1 - p2) < 0
+    )
+
+
+def capsule_ball_collision(capsule: "Capsule", ball: "Ball") -> Collision:
+    # the ball collides with the ball of the capsule radius around the closest point of the axis
+    start, end = capsule.ends
+    closest = closest_point_on_segment(ball.pos, start, end)
+    return _round_collision(capsule, ball, closest, ball.pos, ball.radius)
+
+
+def capsule_capsule_collision(capsule1: "Capsule", capsule2: "Capsule") -> Collision:
+    start1, end1 = capsule1.ends
+    start2, end2 = capsule2.ends
+    if _segments_intersect(start1, end1, start2, end2):
+        # the closest points are not unique for crossing axes
+        return _sat(capsule1, capsule2, [capsule1.axis_normal, capsule2.axis_normal])
+    point1, point2 = _closest_points_of_segments(start1, end1, start2, end2)
+    return _round_collision(capsule1, capsule2, point1, point2, capsule2.radius)
+
+
+def _round_collision(
+    capsule: "Capsule",
+    other: "GameObject",
+    point1: Vector,
+    point2: Vector,
+    radius2: float,
+) -> Collision:
+    # collision of a ball around point1 with the capsule radius and a ball around point2
+    delta = point2 - point1
+    dist = delta.magnitude()
+    if dist >= capsule.radius + radius2:
+        return None
+    # coinciding points are separated perpendicular to the capsule axis
+    normal = delta / dist if dist > 0 else capsule.axis_normal
+    return Collision(capsule, other, normal, capsule.radius + radius2 - dist)
+
+
+def capsule_polygon_collision(
+    capsule: "Capsule", polygon: "ConvexPolygon"
+) -> Collision:
+    # separating axis test with the normals of the polygon, the normal of the capsule axis and
+    # the directions from the ends of the capsule to their closest polygon vertices
+    axes = list(polygon.get_normals())
+    axes.append(capsule.axis_normal)
+    for end in capsule.ends:
+        vertex = min(polygon.vertices, key=lambda v: (v - end).magnitude())
+        if vertex != end:
+            axes.append((vertex - end).normalize())
+    return _sat(capsule, polygon, axes)
+
+
+def contact_manifold(collision: Collision) -> Tuple[Vector, ...]:
+    """Contact points of a collision on the surface of obj1, the deepest first.
+
+    Both objects provide the feature (a point or an edge) which is furthest in the direction of
+    the normal, respectively against it. If one of them is a point, it is the only contact
+    point. Otherwise the edge which is more perpendicular to the normal is the reference edge,
+    the other edge is clipped to its side planes and the clipped points behind the reference
+    edge are the contact points.
+    """
+    normal = collision.normal
+    # the features are computed at the poses of the objects when the collision was detected
+    feature1 = _detected_feature(
+        collision.obj1, collision._pos1, collision._angle1, normal
+    )
+    feature2 = _detected_feature(
+        collision.obj2, collision._pos2, collision._angle2, -normal
+    )
+
+    if len(feature1) == 1:
+        return (feature1[0],)
+    if len(feature2) == 1:
+        return (feature2[0] + normal * collision.depth,)
+
+    edge1, edge2 = feature1[1] - feature1[0], feature2[1] - feature2[0]
+    if (
+        abs(edge1.dot(normal)) / edge1.magnitude()
+        <= abs(edge2.dot(normal)) / edge2.magnitude()
+    ):
+        reference, incident, reference_normal = feature1, feature2, normal
+    else:
+        reference, incident, reference_normal = feature2, feature1, -normal
+
+    direction = (reference[1] - reference[0]).normalize()
+    clipped = _clip(incident, direction, direction.dot(reference[0]))
+    clipped = _clip(clipped, -direction, -direction.dot(reference[1]))
+    if not clipped:
+        # numerically degenerate, e.g. for edges touching only at a corner
+        clipped = incident
+
+    face = reference_normal.dot(reference[0])
+    points = sorted(
+        ((face - reference_normal.dot(p), p) for p in clipped),
+        key=lambda point: -point[0],
+    )
+    contacts = [(depth, p) for depth, p in points if depth >= 0] or points[:1]
+    if reference_normal is normal:
+        # the incident points are on the surface of obj2
+        return tuple(p + normal * depth for depth, p in contacts)
+    return tuple(p for _, p in contacts)
+
+
+def _detected_feature(
+    obj: "GameObject", pos: Vector, angle: float, direction: Vector
+) -> List[Vector]:
+    # support feature of the object if it was at the given position and angle
+    rotation = angle - obj.angle
+    if rotation == 0:
+        offset = pos - obj.pos
+        return [p + offset for p in obj.support_feature(direction)]
+    feature = obj.support_feature(direction.rotate(-rotation))
+    return [pos + (p - obj.pos).rotate(rotation) for p in feature]
+
+
+def _clip(points: List[Vector], direction: Vector, offset: float) -> List[Vector]:
+    # part of a segment (or a single point) with direction.dot(p) >= offset
+    if len(points) < 2:
+        return [p for p in points if direction.dot(p) >= offset]
+    p1, p2 = points
+    d1, d2 = direction.dot(p1) - offset, direction.dot(p2) - offset
+    clipped = [p for p, d in ((p1, d1), (p2, d2)) if d >= 0]
+    if d1 * d2 < 0:
+        clipped.append(p1 + (p2 - p1) * (d1 / (d1 - d2)))
+    return clipped
+
+
+def _all_pairs(
+    objects: List["GameObject"],
+) -> Iterable[Tuple["GameObject", "GameObject"]]:
+    for i, obj1 in enumerate(objects):
+        for obj2 in objects[i + 1 :]:
+            yield obj1, obj2
+
+
+# collision tests per pair of object types, the test for (type1, type2) is called with an object
+# of type1 as first argument, see register_collision_test
+_COLLISION_TESTS: Dict[Tuple[type, type], Callable] = {}
+# pairs whose test is a registered test with swapped arguments
+_SWAPPED_TESTS = set()
+# tests found for pairs of concrete types, including the ones inherited from base classes
+_RESOLVED_TESTS: Dict[Tuple[type, type], Callable] = {}
+
+
+def register_collision_test(
+    type1: type, type2: type, test: Callable[["GameObject", "GameObject"], Collision]
+):
+    """Registers the narrow phase for objects of type1 and type2 (and their subclasses).
+
+    The test is also used for the swapped pair with the arguments swapped back, so the returned
+    collision can have the objects in a different order than the objects passed to `collide`.
+    A test registered for subclasses takes precedence over the tests of their base classes.
+    """
+    _COLLISION_TESTS[(type1, type2)] = test
+    _SWAPPED_TESTS.discard((type1, type2))
+    swapped = (type2, type1)
+    if swapped != (type1, type2) and (
+        swapped not in _COLLISION_TESTS or swapped in _SWAPPED_TESTS
+    ):
+        _COLLISION_TESTS[swapped] = lambda obj2, obj1: test(obj1, obj2)
+        _SWAPPED_TESTS.add(swapped)
+    _RESOLVED_TESTS.clear()
+
+
+def collision_test(type1: type, type2: type) -> Callable:
+    """Returns the most specific registered test for the pair of types."""
+    test = _RESOLVED_TESTS.get((type1, type2))
+    if test is None:
+        for base1 in type1.__mro__:
+            for base2 in type2.__mro__:
+                test = _COLLISION_TESTS.get((base1, base2))
+                if test is not None:
+                    break
+            if test is not None:
+                break
+        else:
+            raise ValueError(f"Unknown object types {type1} and {type2}")
+        _RESOLVED_TESTS[(type1, type2)] = test
+    return test
+
+
+def collide(obj1: "GameObject", obj2: "GameObject") -> Collision:
+    return collision_test(type(obj1), type(obj2))(obj1, obj2)
+
+
 def get_collisions(
-    objects: List["GameObject"], ingore_fixed_object_collisions: bool = False
+    objects: List["GameObject"],
+    ingore_fixed_object_collisions: bool = False,
+    pairs: Iterable[Tuple["GameObject", "GameObject"]] = None,
+    executor: Executor = None,
+    n_workers: int = 1,
+) -> List[Collision]:
+    # the candidate pairs usually come from a broad phase (see SpatialHash.candidate_pairs),
+    # without them all pairs of objects are tested
+    if pairs is None:
+        pairs = _all_pairs(objects)
+    if executor is None or n_workers <= 1:
+        return _test_pairs(pairs, ingore_fixed_object_collisions)
+
+    # the pairs are split into consecutive shards which are tested concurrently, the collisions
+    # are concatenated in the order of the shards and therefore in the order of the pairs
+    pairs = list(pairs)
+    n_shards = min(n_workers, len(pairs) // MIN_PAIRS_PER_SHARD)
+    if n_shards <= 1:
+        return _test_pairs(pairs, ingore_fixed_object_collisions)
+    _prepare_concurrent_tests(pairs)
+    size = -(-len(pairs) // n_shards)
+    shards = [pairs[i : i + size] for i in range(0, len(pairs), size)]
+    results = executor.map(
+        _test_pairs, shards, [ingore_fixed_object_collisions] * len(shards)
+    )
+    return list(chain.from_iterable(results))
+
+
+def _test_pairs(
+    pairs: Iterable[Tuple["GameObject", "GameObject"]],
+    ingore_fixed_object_collisions: bool,
 ) -> List[Collision]:
     collisions = []
-    for i, obj1 in enumerate(objects):
-        for obj2 in objects[i + 1 :]:
-            if ingore_fixed_object_collisions and obj1.fixed and obj2.fixed:
-                continue
-            coll = obj1.collides_with(obj2)
-            if coll is not None:
-                collisions.append(coll)
+    for obj1, obj2 in pairs:
+        if ingore_fixed_object_collisions and obj1.fixed and obj2.fixed:
+            continue
+        if not should_collide(obj1, obj2):
+            continue
+        coll = obj1.collides_with(obj2)
+        if coll is not None:
+            collisions.append(coll)
 
     return collisions
 
 
-def handle_collision(collision: Collision):
-    if collision.obj1.fixed and collision.obj2.fixed:
+def _prepare_concurrent_tests(pairs: List[Tuple["GameObject", "GameObject"]]):
+    # fills the caches which are written by the collision tests, afterwards the tests only read
+    # the objects and the test registry and can run in several threads without locks
+    objects = set(chain.from_iterable(pairs))
+    for obj in objects:
+        obj.cache_geometry()
+    for type1, type2 in {(type(obj1), type(obj2)) for obj1, obj2 in pairs}:
+        collision_test(type1, type2)
+
+
+def gil_enabled() -> bool:
+    """Returns False on free-threaded builds of Python which currently run without the GIL."""
+    return getattr(sys, "_is_gil_enabled", lambda: True)()
+
+
+def handle_collision(collision: Collision, immovable: Collection["GameObject"] = ()):
+    if is_immovable(collision.obj1, immovable) and is_immovable(
+        collision.obj2, immovable
+    ):
+        return
+
+    resolve_collision(collision, immovable)
+
+    collision.obj1.on_collision(collision)
+    collision.obj2.on_collision(collision)
+
+
+def call_collision_callbacks(
+    collisions: List[Collision], immovable: Collection["GameObject"] = ()
+):
+    # for collisions which were resolved without handle_collision
+    for collision in collisions:
+        if is_immovable(collision.obj1, immovable) and is_immovable(
+            collision.obj2, immovable
+        ):
+            continue
+        collision.obj1.on_collision(collision)
+        collision.obj2.on_collision(collision)
+
+
+def is_immovable(obj: "GameObject", immovable: Collection["GameObject"]) -> bool:
+    """Returns whether the object is fixed or one of the given immovable objects."""
+    return obj.fixed or obj in immovable
+
+
+def resolve_collision(collision: Collision, immovable: Collection["GameObject"] = ()):
+    # separates the objects and changes their velocities without calling the collision callbacks,
+    # the immovable objects (e.g. the frozen objects of a world) are treated like fixed objects
+    # at rest
+    obj1, obj2 = collision.obj1, collision.obj2
+    fixed1, fixed2 = is_immovable(obj1, immovable), is_immovable(obj2, immovable)
+    if fixed1 and fixed2:
         return
 
     # move objects so that they don't overlap anymore
-    if not collision.obj1.fixed and not collision.obj2.fixed:
-        collision.obj1.pos -= collision.normal * (collision.depth / 2)
-        collision.obj2.pos += collision.normal * (collision.depth / 2)
-    elif collision.obj1.fixed:
-        collision.obj2.pos += collision.normal * collision.depth
+    if not fixed1 and not fixed2:
+        obj1.pos -= collision.normal * (collision.depth / 2)
+        obj2.pos += collision.normal * (collision.depth / 2)
+    elif fixed1:
+        obj2.pos += collision.normal * collision.depth
     else:
-        collision.obj1.pos -= collision.normal * collision.depth
+        obj1.pos -= collision.normal * collision.depth
+
+    mass1, vel1 = obj1.mass, obj1.vel
+    mass2, vel2 = obj2.mass, obj2.vel
+    if fixed1 and not obj1.fixed:
+        mass1, vel1 = math.inf, Vector(0, 0)
+    if fixed2 and not obj2.fixed:
+        mass2, vel2 = math.inf, Vector(0, 0)
 
     # change velocities
     # https://en.wikipedia.org/wiki/Collision_response
     # https://www.chrishecker.com/images/e/e7/Gdmphys3.pdf
     # not sure if min or average of bouncieness models reality better
-    e = (collision.obj1.bounciness + collision.obj2.bounciness) / 2
+    e = (obj1.bounciness + obj2.bounciness) / 2
     impulse = (
-        -(1 + e)
-        * (collision.obj1.vel - collision.obj2.vel).dot(collision.normal)
-        / ((1 / collision.obj1.mass) + (1 / collision.obj2.mass))
+        -(1 + e) * (vel1 - vel2).dot(collision.normal) / ((1 / mass1) + (1 / mass2))
     )
 
     # avoid that fixed objects get a velocity value after a collision
-    if not collision.obj1.fixed:
-        collision.obj1.vel += impulse / collision.obj1.mass * collision.normal
-    if not collision.obj2.fixed:
-        collision.obj2.vel -= impulse / collision.obj2.mass * collision.normal
-
-    collision.obj1.on_collision(collision)
-    collision.obj2.on_collision(collision)
+    if not fixed1:
+        obj1.vel += impulse / mass1 * collision.normal
+    if not fixed2:
+        obj2.vel -= impulse / mass2 * collision.normal
 
 
 def point_in_box(point: Vector, box: Tuple[Vector, Vector]) -> bool:
     return box[0].x <= point.x <= box[1].x and box[0].y <= point.y <= box[1].y
+
+
+def calibrate_gjk_crossover(
+    max_vertices: int = 32, n_pairs: int = 200, seed: int = 0
+) -> int:
+    """Measures from which total number of vertices GJK/EPA is faster than SAT.
+
+    The result can be assigned to GJK_CROSSOVER to be used by the "auto" narrow phase.
+    The pairs are placed such that their bounding boxes overlap like the pairs reaching the
+    narrow phase, some of them are separated and some are penetrating.
+    """
+    # imported here as ppe.objects depends on this module
+    from ppe.objects import ConvexPolygon
+
+    rng = random.Random(seed)
+
+    def create_polygon(n_vertices, pos):
+        # regular polygon with a random rotation
+        offset = rng.uniform(0, 2 * math.pi)
+        return ConvexPolygon(
+            [
+                pos + Vector(math.cos(offset + angle), math.sin(offset + angle))
+                for angle in (2 * math.pi * i / n_vertices for i in range(n_vertices))
+            ]
+        )
+
+    def measure(method, pairs):
+        start = time.perf_counter()
+        for polygon1, polygon2 in pairs:
+            polygon_polygon_collision(polygon1, polygon2, method)
+        return time.perf_counter() - start
+
+    for n_vertices in range(3, max_vertices + 1):
+        pairs = []
+        for _ in range(n_pairs):
+            direction = Vector(1, 0).rotate(rng.uniform(0, 2 * math.pi))
+            pos = direction * rng.uniform(1, 2.2)
+            pairs.append(
+                (
+                    create_polygon(n_vertices, Vector(0, 0)),
+                    create_polygon(n_vertices, pos),
+                )
+            )
+        # best of a few repetitions to reduce the influence of other processes
+        sat_time = min(measure("sat", pairs) for _ in range(3))
+        gjk_time = min(measure("gjk", pairs) for _ in range(3))
+        if gjk_time < sat_time:
+            return 2 * n_vertices
+
+    return 2 * max_vertices + 1
@@ -0,0 +1,297 @@
+from typing import Dict, List, Set, Tuple, Union
+import heapq
+import math
+
+from ppe.collision import Collision
+from ppe.objects import Ball
+from ppe.vector import Vector
+
+# the walls of the bounding box, used as the second index of wall events
+WALLS = {-1: "left", -2: "right", -3: "bottom", -4: "top"}
+# axis and direction in which a ball moves to the next grid cell, used as the second index of
+# cell crossing events (the wall index minus 4)
+CELL_CROSSINGS = {-5: (0, -1), -6: (0, 1), -7: (1, -1), -8: (1, 1)}
+
+
+class EventDrivenWorld:
+    """Event driven simulation of balls moving with constant velocities between collisions.
+
+    Instead of stepping with a fixed time step, the exact time of the next event of every ball is
+    kept in a priority queue and the simulation jumps from one event to the next. Events are
+    collisions with other balls or walls and crossings into another cell of a grid whose cells are
+    as large as the largest ball, so only the balls in the neighbouring cells have to be checked.
+    The events are predicted with scalar math since a ball only has a few neighbours. Only the
+    balls taking part in an event are moved and their next event is predicted again. The
+    queued events with these balls become invalid, which is detected by comparing the collision
+    counts of the balls when an event is taken from the queue, and the other ball of an invalid
+    event predicts its next event again. The cost therefore depends on the number of events and
+    the density of the balls but neither on the number of time steps nor on the number of balls.
+
+    The collisions are resolved like in `handle_collision` (the bounciness of two objects is
+    averaged, fixed balls have an infinite mass) but at the exact moment of contact, so the balls
+    never overlap. The walls are given by an optional bounding box with its own bounciness.
+    Balls must not accelerate. The state of the balls is read at construction and written back
+    after every `update`, call `reset` after changing balls from outside.
+    """
+
+    def __init__(
+        self,
+        balls: List[Ball],
+        world_bbox: Tuple[Vector, Vector] = None,
+        wall_bounciness: float = 1,
+    ):
+        self._balls = list(balls)
+        self.world_bbox = world_bbox
+        self.wall_bounciness = wall_bounciness
+        self._time = 0
+        self._n_events = 0
+        self._events = tuple()
+        self.reset()
+
+    @property
+    def objects(self) -> List[Ball]:
+        return self._balls
+
+    @property
+    def time(self) -> float:
+        return self._time
+
+    @property
+    def n_events(self) -> int:
+        """Total number of collisions which have been resolved."""
+        return self._n_events
+
+    @property
+    def events(self) -> Tuple[Tuple[float, Ball, Union[Ball, str]], ...]:
+        """The collisions of the last update as (time, ball, other ball or wall name)."""
+        return self._events
+
+    def reset(self):
+        """Reads the state of the balls and predicts all events from scratch."""
+        for ball in self._balls:
+            if not isinstance(ball, Ball):
+                raise ValueError(f"Only balls are supported, got {type(ball)}")
+            if ball.acc.x != 0 or ball.acc.y != 0:
+                raise ValueError("Balls must not accelerate")
+
+        balls = self._balls
+        n = len(balls)
+        self._pos = [list(b.pos.to_tuple()) for b in balls]
+        self._vel = [list(b.vel.to_tuple()) for b in balls]
+        # time at which the position of each ball was last updated
+        self._last_time = [float(self._time)] * n
+        self._radius = [b.radius for b in balls]
+        self._inv_mass = [1 / b.mass for b in balls]
+        self._bounciness = [b.bounciness for b in balls]
+        self._category = [b.collision_category for b in balls]
+        self._mask = [b.collision_mask for b in balls]
+        self._group = [b.collision_group for b in balls]
+        # number of collisions of each ball, queued events of a ball are only valid as long as
+        # its count did not change
+        self._counts = [0] * n
+
+        self._cell_size = max(2 * max(self._radius, default=0), 1e-9)
+        self._cell_of: List[Tuple[int, int]] = [
+            (math.floor(x / self._cell_size), math.floor(y / self._cell_size))
+            for x, y in self._pos
+        ]
+        self._cells: Dict[Tuple[int, int], Set[int]] = {}
+        for i, cell in enumerate(self._cell_of):
+            self._cells.setdefault(cell, set()).add(i)
+
+        # (time, sequence number, ball, other ball, wall or crossing, count of ball, count of
+        # other ball), every ball has exactly one event in the queue which is valid for it
+        self._queue = []
+        self._sequence = 0
+        for i in range(n):
+            self._predict(i, self._time)
+
+    def _position_at(self, i: int, time: float) -> Tuple[float, float]:
+        (x, y), (vx, vy) = self._pos[i], self._vel[i]
+        dt = time - self._last_time[i]
+        return x + vx * dt, y + vy * dt
+
+    def _push(self, time: float, i: int, j: int):
+        count_j = self._counts[j] if j >= 0 else 0
+        heapq.heappush(
+            self._queue, (float(time), self._sequence, i, j, self._counts[i], count_j)
+        )
+        self._sequence += 1
+
+    def _neighbors(self, i: int) -> List[int]:
+        # the balls in the 3x3 cells around the cell of ball i, any ball which can touch ball i
+        # before it leaves its cell is in one of them
+        cx, cy = self._cell_of[i]
+        neighbors = []
+        for x in (cx - 1, cx, cx + 1):
+            for y in (cy - 1, cy, cy + 1):
+                neighbors.extend(self._cells.get((x, y), ()))
+        neighbors.remove(i)
+        neighbors.sort()
+        return neighbors
+
+    def _predict(self, i: int, time: float):
+        # queues the next event of ball i, assuming that all balls move on straight lines
+        x, y = self._position_at(i, time)
+        vx, vy = self._vel[i]
+        radius = self._radius[i]
+        first_time, first_event = math.inf, None
+
+        for j in self._neighbors(i):
+            if not self._should_collide(i, j):
+                continue
+            other_x, other_y = self._position_at(j, time)
+            dx, dy = other_x - x, other_y - y
+            rel_vx, rel_vy = self._vel[j][0] - vx, self._vel[j][1] - vy
+            # |delta + rel_vel * t| = reach, the balls approach each other if delta . rel_vel < 0
+            b = dx * rel_vx + dy * rel_vy
+            if b >= 0:
+                continue
+            reach = radius + self._radius[j]
+            a = rel_vx * rel_vx + rel_vy * rel_vy
+            c = dx * dx + dy * dy - reach * reach
+            disc = b * b - a * c
+            if disc < 0:
+                continue
+            # balls which already overlap and approach each other collide immediately
+            dt = 0 if c <= 0 else c / (-b + math.sqrt(disc))
+            if time + dt < first_time:
+                first_time, first_event = time + dt, j
+
+        for event_time, event in self._boundary_events(i, time, (x, y)):
+            if event_time < first_time:
+                first_time, first_event = event_time, event
+
+        if first_event is not None:
+            self._push(first_time, i, first_event)
+
+    def _should_collide(self, i: int, j: int) -> bool:
+        # should_collide for the balls i and j, fixed balls do not collide with each other
+        if self._inv_mass[i] == 0 and self._inv_mass[j] == 0:
+            return False
+        group = self._group[i]
+        if group != 0 and self._group[j] == group:
+            return group > 0
+        return (self._category[i] & self._mask[j]) != 0 and (
+            self._category[j] & self._mask[i]
+        ) != 0
+
+    def _boundary_events(self, i: int, time: float, pos: Tuple[float, float]):
+        # the times at which ball i leaves its cell and hits a wall along each axis
+        r = self._radius[i]
+        cell = self._cell_of[i]
+        walls = None
+        if self.world_bbox is not None and self._inv_mass[i] != 0:
+            bbox_min, bbox_max = self.world_bbox
+            walls = ((bbox_min.x, bbox_max.x), (bbox_min.y, bbox_max.y))
+        for axis, low_wall, high_wall in ((0, -1, -2), (1, -3, -4)):
+            v = self._vel[i][axis]
+            if v == 0:
+                continue
+            if v < 0:
+                wall, border = low_wall, cell[axis] * self._cell_size
+            else:
+                wall, border = high_wall, (cell[axis] + 1) * self._cell_size
+            yield time + max((border - pos[axis]) / v, 0), wall - 4
+            if walls is not None:
+                low, high = walls[axis]
+                limit = low + r if v < 0 else high - r
+                yield time + max((limit - pos[axis]) / v, 0), wall
+
+    def _cross_cell(self, i: int, crossing: int, time: float):
+        # the ball keeps its velocity, so the events of the other balls with it stay valid
+        axis, step = CELL_CROSSINGS[crossing]
+        cell = list(self._cell_of[i])
+        cell[axis] += step
+        cell = tuple(cell)
+        old_cell = self._cells[self._cell_of[i]]
+        old_cell.discard(i)
+        if not old_cell:
+            del self._cells[self._cell_of[i]]
+        self._cells.setdefault(cell, set()).add(i)
+        self._cell_of[i] = cell
+        self._predict(i, time)
+
+    def _move(self, i: int, time: float):
+        self._pos[i] = list(self._position_at(i, time))
+        self._last_time[i] = time
+
+    def update(self, dt: float):
+        """Advances the simulation by dt and resolves all collisions happening in between."""
+        end_time = self._time + dt
+        events = []
+        while self._queue and self._queue[0][0] <= end_time:
+            time, _, i, j, count_i, count_j = heapq.heappop(self._queue)
+            if self._counts[i] != count_i:
+                # ball i already queued its next event when its count changed
+                continue
+            if j >= 0 and self._counts[j] != count_j:
+                # the other ball changed its direction, this was the only event of ball i
+                self._predict(i, time)
+                continue
+            if j in CELL_CROSSINGS:
+                self._cross_cell(i, j, time)
+                continue
+            if 0 <= j < i:
+                # collisions are reported with the ball which comes first in the objects first
+                i, j = j, i
+
+            self._move(i, time)
+            if j >= 0:
+                self._move(j, time)
+                self._resolve_balls(i, j, time)
+                events.append((time, self._balls[i], self._balls[j]))
+            else:
+                self._resolve_wall(i, j)
+                events.append((time, self._balls[i], WALLS[j]))
+            self._n_events += 1
+
+            self._counts[i] += 1
+            self._predict(i, time)
+            if j >= 0:
+                self._counts[j] += 1
+                self._predict(j, time)
+
+        self._time = end_time
+        self._write_back(range(len(self._balls)), end_time)
+        self._events = tuple(events)
+
+    def _resolve_balls(self, i: int, j: int, time: float):
+        (x_i, y_i), (x_j, y_j) = self._pos[i], self._pos[j]
+        distance = math.hypot(x_j - x_i, y_j - y_i)
+        normal_x, normal_y = (x_j - x_i) / distance, (y_j - y_i) / distance
+        vel_i, vel_j = self._vel[i], self._vel[j]
+        inv_mass_i, inv_mass_j = self._inv_mass[i], self._inv_mass[j]
+        # https://en.wikipedia.org/wiki/Collision_response
+        e = (self._bounciness[i] + self._bounciness[j]) / 2
+        impulse = (
+            -(1 + e)
+            * ((vel_i[0] - vel_j[0]) * normal_x + (vel_i[1] - vel_j[1]) * normal_y)
+            / (inv_mass_i + inv_mass_j)
+        )
+        vel_i[0] += impulse * inv_mass_i * normal_x
+        vel_i[1] += impulse * inv_mass_i * normal_y
+        vel_j[0] -= impulse * inv_mass_j * normal_x
+        vel_j[1] -= impulse * inv_mass_j * normal_y
+
+        # the callbacks get the state at the moment of the collision
+        if self._balls[i].collision_callbacks or self._balls[j].collision_callbacks:
+            self._write_back((i, j), time)
+            ball_i, ball_j = self._balls[i], self._balls[j]
+            normal = Vector(normal_x, normal_y)
+            collision = Collision(
+                ball_i, ball_j, normal, 0, ball_i.pos + normal * ball_i.radius, None
+            )
+            ball_i.on_collision(collision)
+            ball_j.on_collision(collision)
+
+    def _resolve_wall(self, i: int, wall: int):
+        axis = 0 if wall in (-1, -2) else 1
+        e = (self._bounciness[i] + self.wall_bounciness) / 2
+        self._vel[i][axis] *= -e
+
+    def _write_back(self, indices, time: float):
+        for i in indices:
+            ball = self._balls[i]
+            ball.pos = Vector(*self._position_at(i, time))
+            ball.vel = Vector(*self._vel[i])
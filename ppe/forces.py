@@ -0,0 +1,213 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from ppe.vector import Vector
+
+# offsets of the centers of the four children of a quadtree node, indexed by quadrant
+_QUADRANT_OFFSETS = np.array([(-1, -1), (1, -1), (-1, 1), (1, 1)], dtype=np.float64)
+
+
+class ForceField(ABC):
+    """Acceleration acting on the objects of a world, see `World.force_fields`."""
+
+    @abstractmethod
+    def accelerations(self, pos: np.ndarray, mass: np.ndarray) -> np.ndarray:
+        """Returns the (n, 2) accelerations of the objects with the (n, 2) positions and masses."""
+        raise NotImplementedError()
+
+
+class UniformField(ForceField):
+    """Same acceleration for all objects, like setting `acc` of every object."""
+
+    def __init__(self, acc: Vector):
+        self.acc = acc
+
+    def accelerations(self, pos: np.ndarray, mass: np.ndarray) -> np.ndarray:
+        return np.broadcast_to(self.acc.to_tuple(), pos.shape)
+
+
+class RadialField(ForceField):
+    """Acceleration strength / distance**exponent towards a center, e.g. of a planet."""
+
+    def __init__(
+        self,
+        center: Vector,
+        strength: float,
+        exponent: float = 2,
+        softening: float = 1e-3,
+    ):
+        self.center = center
+        # negative strengths push the objects away
+        self.strength = strength
+        self.exponent = exponent
+        # avoids infinite accelerations at the center
+        self.softening = softening
+
+    def accelerations(self, pos: np.ndarray, mass: np.ndarray) -> np.ndarray:
+        delta = np.array(self.center.to_tuple()) - pos
+        distance = np.sqrt(np.einsum("nd,nd->n", delta, delta) + self.softening**2)
+        return delta * (self.strength / distance ** (self.exponent + 1))[:, None]
+
+
+class MutualGravity(ForceField):
+    """Newtonian gravity between all objects, approximated with a `BarnesHutTree`."""
+
+    def __init__(
+        self,
+        gravitational_constant: float = 1,
+        opening_angle: float = 0.5,
+        softening: float = 1e-3,
+    ):
+        self.gravitational_constant = gravitational_constant
+        # trades accuracy for speed, 0 computes all pairs exactly
+        self.opening_angle = opening_angle
+        self.softening = softening
+
+    def accelerations(self, pos: np.ndarray, mass: np.ndarray) -> np.ndarray:
+        if len(pos) < 2:
+            return np.zeros_like(pos)
+        tree = BarnesHutTree(pos, mass)
+        return tree.accelerations(
+            self.gravitational_constant, self.opening_angle, self.softening
+        )
+
+
+class BarnesHutTree:
+    """Quadtree over point masses, every node stores the mass and center of mass below it."""
+
+    # https://en.wikipedia.org/wiki/Barnes%E2%80%93Hut_simulation
+    # built level by level for all points at once, nodes are split until they contain a single
+    # point or max_depth is reached
+
+    def __init__(self, pos: np.ndarray, mass: np.ndarray, max_depth: int = 32):
+        self.pos = np.asarray(pos, dtype=np.float64)
+        self.mass = np.asarray(mass, dtype=np.float64)
+        n = len(self.pos)
+
+        low, high = self.pos.min(axis=0), self.pos.max(axis=0)
+        centers = (low + high)[None] / 2
+        self.half = np.array([max((high - low).max() / 2, 1e-12)])
+        self.depth = np.zeros(1, dtype=np.intp)
+        self.children = np.full((1, 4), -1, dtype=np.intp)
+
+        # node of every point per depth, below its leaf a point keeps the index of its leaf
+        node_of = np.zeros(n, dtype=np.intp)
+        paths = [node_of.copy()]
+        # the points and their nodes per depth, used to sum up the masses of the nodes
+        levels = [(np.arange(n), node_of.copy())]
+        for depth in range(max_depth):
+            points, nodes = levels[-1]
+            counts = np.bincount(nodes, minlength=len(self.half))
+            split = points[counts[nodes] > 1]
+            if not split.size:
+                break
+
+            parent = node_of[split]
+            quadrant = (self.pos[split, 0] >= centers[parent, 0]) + 2 * (
+                self.pos[split, 1] >= centers[parent, 1]
+            )
+            keys, inverse = np.unique(parent * 4 + quadrant, return_inverse=True)
+            parents, quadrants = keys // 4, keys % 4
+            ids = len(self.half) + np.arange(len(keys))
+            half = self.half[parents] / 2
+            centers = np.concatenate(
+                (
+                    centers,
+                    centers[parents] + _QUADRANT_OFFSETS[quadrants] * half[:, None],
+                )
+            )
+            self.half = np.concatenate((self.half, half))
+            self.depth = np.concatenate(
+                (self.depth, np.full(len(keys), depth + 1, dtype=np.intp))
+            )
+            self.children = np.concatenate(
+                (self.children, np.full((len(keys), 4), -1, dtype=np.intp))
+            )
+            self.children[parents, quadrants] = ids
+
+            node_of[split] = ids[inverse.reshape(-1)]
+            paths.append(node_of.copy())
+            levels.append((split, node_of[split]))
+        self.paths = np.stack(paths)  # (n_levels, n_points)
+
+        n_nodes = len(self.half)
+        self.node_mass = np.zeros(n_nodes)
+        weighted = np.zeros((n_nodes, 2))
+        for points, nodes in levels:
+            self.node_mass += np.bincount(
+                nodes, weights=self.mass[points], minlength=n_nodes
+            )
+            for axis in range(2):
+                weighted[:, axis] += np.bincount(
+                    nodes,
+                    weights=self.mass[points] * self.pos[points, axis],
+                    minlength=n_nodes,
+                )
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.center_of_mass = weighted / self.node_mass[:, None]
+        # nodes without mass have no effect, their center is irrelevant
+        self.center_of_mass[self.node_mass == 0] = centers[self.node_mass == 0]
+
+    def accelerations(
+        self,
+        gravitational_constant: float = 1,
+        opening_angle: float = 0.5,
+        softening: float = 1e-3,
+    ) -> np.ndarray:
+        """Gravitational accelerations of all points caused by all other points."""
+        # a node acts as a single point mass if its size / distance is below the opening angle
+        n = len(self.pos)
+        leaf = self.children.max(axis=1) < 0
+        acc = np.zeros((n, 2))
+        points = np.arange(n)
+        nodes = np.zeros(n, dtype=np.intp)
+        while points.size:
+            mass = self.node_mass[nodes]
+            com = self.center_of_mass[nodes]
+            delta = com - self.pos[points]
+            distance2 = np.einsum("nd,nd->n", delta, delta)
+            contains = self.paths[self.depth[nodes], points] == nodes
+            far = ~contains & (
+                (2 * self.half[nodes]) ** 2 < opening_angle**2 * distance2
+            )
+
+            # the point itself is removed from the leaf containing it
+            own = leaf[nodes] & contains
+            if own.any():
+                point_mass = self.mass[points[own]]
+                other_mass = mass[own] - point_mass
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    other_com = (
+                        mass[own, None] * com[own]
+                        - point_mass[:, None] * self.pos[points[own]]
+                    ) / other_mass[:, None]
+                mass[own] = other_mass
+                delta[own] = np.where(
+                    other_mass[:, None] > 0, other_com - self.pos[points[own]], 0
+                )
+                distance2[own] = np.einsum("nd,nd->n", delta[own], delta[own])
+
+            used = far | leaf[nodes]
+            # coincident points without softening do not pull each other in any direction
+            denominator = (distance2[used] + softening**2) ** 1.5
+            factor = np.divide(
+                gravitational_constant * mass[used],
+                denominator,
+                out=np.zeros_like(denominator),
+                where=denominator > 0,
+            )
+            contribution = delta[used] * factor[:, None]
+            for axis in range(2):
+                acc[:, axis] += np.bincount(
+                    points[used], weights=contribution[:, axis], minlength=n
+                )
+
+            # all other nodes are opened
+            opened = ~used
+            child_nodes = self.children[nodes[opened]].reshape(-1)
+            child_points = np.repeat(points[opened], 4)
+            valid = child_nodes >= 0
+            points, nodes = child_points[valid], child_nodes[valid]
+
+        return acc
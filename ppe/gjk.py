@@ -0,0 +1,147 @@
+from typing import Callable, List, Optional, Tuple
+
+from ppe.vector import Vector
+
+Point = Tuple[float, float]
+
+MAX_ITERATIONS = 64
+EPA_TOLERANCE = 1e-9
+
+
+def support_index(vertices: List[Vector], dx: float, dy: float, start: int = 0) -> int:
+    """Index of the vertex of a convex polygon which is furthest in the direction (dx, dy).
+
+    The projections of the ordered vertices of a convex polygon increase monotonically from the
+    minimum to the maximum in one direction around the polygon, so the maximum is found by
+    walking from the start vertex towards the larger neighbor. Starting from the result for a
+    similar direction only takes a few steps.
+    """
+    n = len(vertices)
+    i = start
+    v = vertices[i]
+    best = v.x * dx + v.y * dy
+
+    v = vertices[(i + 1) % n]
+    value = v.x * dx + v.y * dy
+    if value > best:
+        step = 1
+        i, best = (i + 1) % n, value
+    else:
+        step = -1
+
+    while True:
+        j = (i + step) % n
+        v = vertices[j]
+        value = v.x * dx + v.y * dy
+        if value <= best:
+            return i
+        i, best = j, value
+
+
+def minkowski_support(
+    vertices1: List[Vector], vertices2: List[Vector]
+) -> Callable[[float, float], Point]:
+    # support function of the minkowski difference of the two polygons, the walks of both
+    # polygons start from their previous result
+    start = [0, 0]
+
+    def support(dx: float, dy: float) -> Point:
+        i = start[0] = support_index(vertices1, dx, dy, start[0])
+        j = start[1] = support_index(vertices2, -dx, -dy, start[1])
+        v1, v2 = vertices1[i], vertices2[j]
+        return v1.x - v2.x, v1.y - v2.y
+
+    return support
+
+
+def _perpendicular_towards(ax: float, ay: float, px: float, py: float) -> Point:
+    # perpendicular of the direction a which points to the side of p
+    nx, ny = -ay, ax
+    if nx * px + ny * py < 0:
+        return ay, -ax
+    return nx, ny
+
+
+def gjk(support: Callable[[float, float], Point]) -> Optional[List[Point]]:
+    """Returns a triangle of the minkowski difference containing the origin or None if the
+    shapes are separated.
+
+    https://en.wikipedia.org/wiki/Gilbert%E2%80%93Johnson%E2%80%93Keerthi_distance_algorithm
+    A ValueError is raised if the origin lies on the boundary of the simplex, i.e. the shapes are
+    only touching or the result is numerically degenerate.
+    """
+    a = support(1.0, 0.0)
+    simplex = [a]
+    dx, dy = -a[0], -a[1]
+
+    for _ in range(MAX_ITERATIONS):
+        if dx == 0 and dy == 0:
+            raise ValueError("Degenerate simplex")
+
+        a = support(dx, dy)
+        if a[0] * dx + a[1] * dy < 0:
+            # the origin is not reachable in the search direction
+            return None
+        simplex.append(a)
+        ox, oy = -a[0], -a[1]
+
+        if len(simplex) == 2:
+            b = simplex[0]
+            abx, aby = b[0] - a[0], b[1] - a[1]
+            if abx * oy - aby * ox == 0:
+                raise ValueError("Degenerate simplex")
+            dx, dy = _perpendicular_towards(abx, aby, ox, oy)
+            continue
+
+        c, b = simplex[0], simplex[1]
+        abx, aby = b[0] - a[0], b[1] - a[1]
+        acx, acy = c[0] - a[0], c[1] - a[1]
+        # normals of the edges through a which point away from the third vertex
+        ab_nx, ab_ny = _perpendicular_towards(abx, aby, -acx, -acy)
+        ac_nx, ac_ny = _perpendicular_towards(acx, acy, -abx, -aby)
+        if ab_nx * ox + ab_ny * oy > 0:
+            simplex = [b, a]
+            dx, dy = ab_nx, ab_ny
+        elif ac_nx * ox + ac_ny * oy > 0:
+            simplex = [c, a]
+            dx, dy = ac_nx, ac_ny
+        else:
+            return simplex
+
+    raise ValueError("GJK did not converge")
+
+
+def epa(
+    support: Callable[[float, float], Point], simplex: List[Point]
+) -> Tuple[Vector, float]:
+    """Expands the simplex returned by `gjk` to the edge of the minkowski difference closest to
+    the origin and returns its outward normal and its distance from the origin.
+
+    The normal is the direction in which the first shape overlaps the second one the least and
+    the distance is the penetration depth.
+    """
+    polytope = list(simplex)
+    (ax, ay), (bx, by), (cx, cy) = polytope
+    # the polytope is kept anticlockwise so that (edge.y, -edge.x) points outwards
+    if (bx - ax) * (cy - ay) - (by - ay) * (cx - ax) < 0:
+        polytope.reverse()
+
+    for _ in range(MAX_ITERATIONS):
+        min_distance = float("inf")
+        for i, (px, py) in enumerate(polytope):
+            qx, qy = polytope[(i + 1) % len(polytope)]
+            ex, ey = qx - px, qy - py
+            length = (ex * ex + ey * ey) ** 0.5
+            if length == 0:
+                continue
+            nx, ny = ey / length, -ex / length
+            distance = nx * px + ny * py
+            if distance < min_distance:
+                min_distance, min_index, normal = distance, i, (nx, ny)
+
+        sx, sy = support(*normal)
+        if sx * normal[0] + sy * normal[1] - min_distance <= EPA_TOLERANCE:
+            break
+        polytope.insert(min_index + 1, (sx, sy))
+
+    return Vector(*normal), min_distance
@@ -0,0 +1,203 @@
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Dict, Hashable, List, Optional, Sequence, Set, Union
+import logging
+import math
+import time
+
+from ppe.lod import LodController
+from ppe.objects import GameObject
+from ppe.vector import Vector
+from ppe.world import SOLVERS, World
+
+
+@dataclass(frozen=True)
+class QualityLevel:
+    substeps: int  # number of world updates per frame
+    solver_iterations: int  # Jacobi iterations of the batch solver
+    query_interval: (
+        int  # queries and sensors run every n-th frame, see FrameGovernor.queries_due
+    )
+    # objects further away from all focus points are only stepped every coarse_interval world
+    # updates (see LodController), None simulates all objects
+    full_fidelity_radius: Optional[float] = None
+    coarse_interval: int = 4
+    # solver of the world at this level, None keeps the solver of the world
+    solver: Optional[str] = None
+
+
+# from the highest to the lowest quality, the lower levels switch to the vectorized batch solver
+# with fewer iterations, restricting the simulated objects depends on the scale of the world and
+# therefore has to be configured
+DEFAULT_LEVELS = (
+    QualityLevel(
+        substeps=10, solver_iterations=10, query_interval=1, solver="sequential"
+    ),
+    QualityLevel(
+        substeps=8, solver_iterations=10, query_interval=1, solver="sequential"
+    ),
+    QualityLevel(substeps=6, solver_iterations=6, query_interval=2, solver="batch"),
+    QualityLevel(substeps=4, solver_iterations=4, query_interval=3, solver="batch"),
+    QualityLevel(substeps=2, solver_iterations=2, query_interval=4, solver="batch"),
+)
+
+
+@dataclass
+class GovernorDecision:
+    frame: int  # index of the first frame using the new level
+    previous_level: int
+    level: int
+    frame_time: float  # average time of the measured frames
+    frame_budget: float
+
+    @property
+    def degraded(self) -> bool:
+        return self.level > self.previous_level
+
+
+class FrameGovernor:
+    """Runs the world updates of a frame and adjusts the quality to stay within a time budget.
+
+    Every change of the quality level is logged and recorded in `decisions`.
+    """
+
+    def __init__(
+        self,
+        world: World,
+        frame_budget: float,
+        levels: Sequence[QualityLevel] = DEFAULT_LEVELS,
+        window: int = 10,
+        degrade_threshold: float = 1,
+        recover_threshold: float = 0.6,
+        clock: Callable[[], float] = time.perf_counter,
+    ):
+        if not levels:
+            raise ValueError("At least one quality level is required")
+        for level in levels:
+            if level.solver is not None and level.solver not in SOLVERS:
+                raise ValueError(
+                    f"Unknown solver {level.solver}, expected one of {SOLVERS}"
+                )
+            if level.coarse_interval < 1:
+                raise ValueError("Coarse interval must be at least 1")
+        if recover_threshold >= degrade_threshold:
+            raise ValueError(
+                "The recover threshold must be below the degrade threshold"
+            )
+
+        self.world = world
+        # the frame time includes the time reported for work outside of the physics (e.g.
+        # rendering), the average of a window is compared with threshold * budget
+        self.frame_budget = frame_budget
+        self.levels = tuple(levels)
+        self.degrade_threshold = degrade_threshold
+        self.recover_threshold = recover_threshold
+        self._clock = clock
+        self._level = 0
+        self._frame = 0
+        self._frame_times = deque(maxlen=window)
+        self._decisions: List[GovernorDecision] = []
+        # steps the objects outside of the full fidelity radius, it holds the focus points
+        self._lod = LodController(world, math.inf)
+
+    @property
+    def level(self) -> int:
+        """Index of the current quality level, 0 is the highest quality."""
+        return self._level
+
+    @property
+    def quality(self) -> QualityLevel:
+        return self.levels[self._level]
+
+    @property
+    def frame(self) -> int:
+        """Number of frames stepped so far."""
+        return self._frame
+
+    @property
+    def decisions(self) -> List[GovernorDecision]:
+        return list(self._decisions)
+
+    @property
+    def frame_times(self) -> List[float]:
+        """Measured times of the recent frames at the current level."""
+        return list(self._frame_times)
+
+    @property
+    def queries_due(self) -> bool:
+        """Whether queries and sensors should run in the frame which was stepped last."""
+        return (self._frame - 1) % self.quality.query_interval == 0
+
+    @property
+    def focus_points(self) -> Dict[Hashable, Union[Vector, GameObject]]:
+        return self._lod.focus_points
+
+    @property
+    def coarse_objects(self) -> Set[GameObject]:
+        """Objects outside of the full fidelity radius which are stepped at a coarser rate."""
+        return self._lod.distant_objects
+
+    def set_focus(self, key: Hashable, target: Union[Vector, GameObject]):
+        """Registers or moves a focus point, objects are followed as they move."""
+        self._lod.set_focus(key, target)
+
+    def remove_focus(self, key: Hashable):
+        self._lod.remove_focus(key)
+
+    def step(self, frame_dt: float):
+        """Advances the world by frame_dt with the substeps of the current quality level."""
+        self._adjust()
+        quality = self.quality
+
+        start = self._clock()
+        if quality.solver is not None:
+            self.world.solver = quality.solver
+        self.world.solver_iterations = quality.solver_iterations
+        for _ in range(quality.substeps):
+            self._update(frame_dt / quality.substeps, quality)
+        self._frame_times.append(self._clock() - start)
+        self._frame += 1
+
+    def report(self, seconds: float):
+        """Adds time spent outside of the physics to the frame which was stepped last."""
+        if not self._frame_times:
+            raise ValueError("No frame has been stepped at the current level")
+        self._frame_times[-1] += seconds
+
+    def _update(self, dt: float, quality: QualityLevel):
+        lod = self._lod
+        if quality.full_fidelity_radius is None:
+            if not lod.distant_objects:
+                self.world.update(dt)
+                return
+            # the coarse objects of a previous level catch up and return to full fidelity
+            lod.radius = math.inf
+        else:
+            lod.radius = quality.full_fidelity_radius
+        lod.interval = quality.coarse_interval
+        lod.update(dt)
+
+    def _adjust(self):
+        # the level is only changed after a full window of frames at the current level
+        if len(self._frame_times) < self._frame_times.maxlen:
+            return
+        frame_time = sum(self._frame_times) / len(self._frame_times)
+        level = self._level
+        if frame_time > self.degrade_threshold * self.frame_budget:
+            level = min(level + 1, len(self.levels) - 1)
+        elif frame_time < self.recover_threshold * self.frame_budget:
+            level = max(level - 1, 0)
+        if level == self._level:
+            return
+
+        decision = GovernorDecision(
+            self._frame, self._level, level, frame_time, self.frame_budget
+        )
+        self._decisions.append(decision)
+        logging.info(
+            f"Frame {decision.frame}: {'degrading' if decision.degraded else 'recovering'} "
+            f"from level {decision.previous_level} to {decision.level}, frames took "
+            f"{frame_time:.4f}s on average with a budget of {self.frame_budget:.4f}s"
+        )
+        self._level = level
+        self._frame_times.clear()
@@ -0,0 +1,133 @@
+from typing import Dict, Hashable, List, Optional, Set, Union
+import math
+
+from ppe.collision import bounding_box_contact, resolve_collision, should_collide
+from ppe.objects import (
+    STEP_ANGLE_WARNING_THRESHOLD,
+    STEP_DISTANCE_WARNING_THRESHOLD,
+    GameObject,
+)
+from ppe.vector import Vector
+from ppe.world import World
+
+
+class LodController:
+    """Updates a world with a reduced level of detail for objects far away from all focus points.
+
+    Distant objects are detached from the world and stepped every `interval` frames instead.
+    """
+
+    def __init__(
+        self, world: World, radius: float, margin: float = 0, interval: int = 4
+    ):
+        if radius < 0 or margin < 0:
+            raise ValueError("Radius and margin must not be negative")
+        if interval < 1:
+            raise ValueError("Interval must be at least 1")
+
+        self.world = world
+        # objects within radius of a focus point are simulated normally, objects further away
+        # than radius + margin become distant (the margin avoids switching back and forth)
+        self.radius = radius
+        self.margin = margin
+        # the distant objects are spread over the frames, about 1/interval of them is stepped
+        # per frame with the time accumulated since its last step
+        self.interval = interval
+        self._focus_points: Dict[Hashable, Union[Vector, GameObject]] = {}
+        # distant object -> [frame offset of its steps, time since its last step]
+        self._distant: Dict[GameObject, List[float]] = {}
+        self._frame = 0
+        self._next_offset = 0
+        # accelerations of the force fields in the current frame, computed on first use
+        self._field_acc: Optional[Dict[GameObject, Vector]] = None
+
+    @property
+    def focus_points(self) -> Dict[Hashable, Union[Vector, GameObject]]:
+        return dict(self._focus_points)
+
+    @property
+    def distant_objects(self) -> Set[GameObject]:
+        return set(self._distant)
+
+    def set_focus(self, key: Hashable, target: Union[Vector, GameObject]):
+        """Registers or moves a focus point, objects are followed as they move."""
+        self._focus_points[key] = target
+
+    def remove_focus(self, key: Hashable):
+        del self._focus_points[key]
+
+    def update(self, dt: float):
+        self._field_acc = None
+        self._classify()
+        for obj, state in self._distant.items():
+            state[1] += dt
+            if (self._frame + state[0]) % self.interval == 0:
+                self._step_distant(obj, state[1])
+                state[1] = 0
+        self.world.detached_objects = set(self._distant)
+        self.world.update(dt)
+        self._frame += 1
+
+    def _objects_near(self, radius: float) -> Set[GameObject]:
+        near = set()
+        for target in self._focus_points.values():
+            point = target.pos if isinstance(target, GameObject) else target
+            near.update(self.world.query_radius(point, radius))
+        return near
+
+    def _classify(self):
+        objects = set(self.world.objects)
+        for obj in [obj for obj in self._distant if obj not in objects]:
+            del self._distant[obj]
+
+        # without focus points all objects are simulated normally
+        if not self._focus_points:
+            inner = outer = objects
+        else:
+            inner = self._objects_near(self.radius)
+            outer = self._objects_near(self.radius + self.margin)
+
+        for obj in self.world.objects:
+            state = self._distant.get(obj)
+            if state is not None and obj in inner:
+                # catches up so that the object continues from where it would be now
+                del self._distant[obj]
+                if state[1] > 0:
+                    self._step_distant(obj, state[1])
+            elif state is None and obj not in outer:
+                self._distant[obj] = [self._next_offset, 0]
+                self._next_offset = (self._next_offset + 1) % self.interval
+
+    def _step_distant(self, obj: GameObject, dt: float):
+        extra_acc = self._field_acceleration(obj)
+        acc = obj.acc if extra_acc is None else obj.acc + extra_acc
+        # the accumulated time is split into steps which stay below the warning thresholds of
+        # GameObject.update, with a constant acceleration this gives the same trajectory
+        # bounds of the distance and angle of the whole step (including the velocity gained)
+        distance = (obj.vel.magnitude() + 1.5 * acc.magnitude() * dt) * dt
+        angle = (abs(obj.angular_vel) + 1.5 * abs(obj.angular_acc) * dt) * dt
+        n_steps = max(
+            math.ceil(distance / STEP_DISTANCE_WARNING_THRESHOLD),
+            math.ceil(angle / STEP_ANGLE_WARNING_THRESHOLD),
+            1,
+        )
+        for _ in range(n_steps):
+            obj.update(dt / n_steps, extra_acc)
+        if obj.fixed:
+            return
+        # only collides with fixed objects, approximated by the bounding boxes and without
+        # collision callbacks
+        for other in self.world.query_aabb(obj.bbox):
+            if other is obj or not other.fixed or not should_collide(obj, other):
+                continue
+            coll = bounding_box_contact(obj, other)
+            if coll is not None:
+                resolve_collision(coll)
+
+    def _field_acceleration(self, obj: GameObject) -> Optional[Vector]:
+        # the force fields of the world act on the distant objects like in World.update
+        if not self.world.force_fields:
+            return None
+        if self._field_acc is None:
+            self._field_acc = self.world._field_accelerations()
+        return self._field_acc.get(obj)
@@ -1,23 +1,61 @@
 from abc import ABC, abstractmethod
-from typing import Tuple, List, Iterator, Dict, Any, Callable
+from typing import Tuple, List, Iterator, Dict, Any, Callable, Union
 import random
+from itertools import repeat
 import math
 import logging
 
 from ppe.vector import Vector
+from ppe.shapes import PolygonShape, is_convex
 from ppe.collision import (
     Collision,
+    DEFAULT_CATEGORY,
+    ALL_CATEGORIES,
     bounding_box_collision,
     ball_polygon_collision,
     polygon_polygon_collision,
     ball_ball_collision,
+    ball_box_collision,
+    box_box_collision,
+    capsule_ball_collision,
+    capsule_capsule_collision,
+    capsule_polygon_collision,
+    closest_point_on_segment,
+    collide,
+    register_collision_test,
 )
 
 STEP_DISTANCE_WARNING_THRESHOLD = 0.05
 STEP_ANGLE_WARNING_THRESHOLD = 5 * (2 * math.pi / 360)  # 5 degree
+# capsules whose axis is closer to perpendicular to a direction than this (cosine of the angle)
+# touch with their whole side, see Capsule.support_feature
+CAPSULE_SIDE_TOLERANCE = 0.01
 
 
 class GameObject(ABC):
+    # objects are created in large numbers, so they do not have an instance __dict__
+    __slots__ = (
+        "_pos",
+        "_vel",
+        "_acc",
+        "_mass",
+        "_angle",
+        "_angular_vel",
+        "_angular_acc",
+        "_fixed",
+        "_style_attributes",
+        "_name",
+        "_bounciness",
+        "_collision_callbacks",
+        "_collision_category",
+        "_collision_mask",
+        "_collision_group",
+        "_spatial_hash",
+        "_bbox",
+        "_area",
+        "__weakref__",
+    )
+
     def __init__(
         self,
         pos: Vector,  # in meter
@@ -32,6 +70,9 @@ class GameObject(ABC):
         name: str,
         bounciness: float,
         collision_callbacks: List[Callable],
+        collision_category: int = DEFAULT_CATEGORY,
+        collision_mask: int = ALL_CATEGORIES,
+        collision_group: int = 0,
     ):
         self._pos = pos
         self._vel = vel
@@ -41,10 +82,14 @@ class GameObject(ABC):
         self._angular_vel = angular_vel
         self._angular_acc = angular_acc
         self._fixed = fixed
+        # empty style attributes and callbacks are stored as None and only created on access
         self._style_attributes = style_attributes
         self._name = name
         self._bounciness = bounciness
         self._collision_callbacks = collision_callbacks
+        self._collision_category = collision_category
+        self._collision_mask = collision_mask
+        self._collision_group = collision_group
 
         if self._fixed and self._mass != float("inf"):
             raise ValueError("Fixed objects must have infinite mass")
@@ -52,12 +97,46 @@ class GameObject(ABC):
         if self._mass <= 0:
             raise ValueError("Mass must be positive")
 
+        # set by the spatial hash the object is inserted into
+        self._spatial_hash = None
+
         self._bbox = None
         self._update_bbox()
 
         self._area = None
         self._update_area()
 
+    def __getstate__(self) -> Dict[str, Any]:
+        # the spatial hash is not pickled, unpickled objects are not part of any world
+        state = {}
+        for cls in type(self).__mro__:
+            for name in getattr(cls, "__slots__", ()):
+                if name != "__weakref__" and hasattr(self, name):
+                    state[name] = getattr(self, name)
+        state["_spatial_hash"] = None
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    @classmethod
+    def _create_many(
+        cls, bboxes: List[Tuple[Vector, Vector]], areas: List[float], **attributes
+    ) -> List["GameObject"]:
+        # creates objects from already validated attribute columns and precomputed geometry
+        # without running __init__, used for creating many objects at once (see World.add_balls)
+        names = ["_spatial_hash", "_bbox", "_area"] + [
+            "_" + name for name in attributes
+        ]
+        objects = []
+        for values in zip(repeat(None), bboxes, areas, *attributes.values()):
+            obj = cls.__new__(cls)
+            for name, value in zip(names, values):
+                setattr(obj, name, value)
+            objects.append(obj)
+        return objects
+
     @property
     def pos(self):
         return self._pos
@@ -65,7 +144,7 @@ class GameObject(ABC):
     @pos.setter
     def pos(self, value: Vector):
         self._pos = value
-        self._update_bbox()
+        self._bbox_changed()
 
     @property
     def vel(self):
@@ -112,7 +191,7 @@ class GameObject(ABC):
     @angle.setter
     def angle(self, value: float):
         self._angle = value
-        self._update_bbox()
+        self._bbox_changed()
 
     @property
     def angular_vel(self):
@@ -147,6 +226,8 @@ class GameObject(ABC):
 
     @property
     def style_attributes(self):
+        if self._style_attributes is None:
+            self._style_attributes = {}
         return self._style_attributes
 
     @style_attributes.setter
@@ -175,16 +256,47 @@ class GameObject(ABC):
 
     @property
     def collision_callbacks(self):
+        if self._collision_callbacks is None:
+            self._collision_callbacks = []
         return self._collision_callbacks
 
     @collision_callbacks.setter
     def collision_callbacks(self, value: List[Callable]):
         self._collision_callbacks = value
 
+    @property
+    def collision_category(self):
+        # bitfield of the categories the object belongs to
+        return self._collision_category
+
+    @collision_category.setter
+    def collision_category(self, value: int):
+        self._collision_category = value
+
+    @property
+    def collision_mask(self):
+        # bitfield of the categories the object collides with
+        return self._collision_mask
+
+    @collision_mask.setter
+    def collision_mask(self, value: int):
+        self._collision_mask = value
+
+    @property
+    def collision_group(self):
+        # objects sharing a positive group always collide, objects sharing a negative group never
+        # collide, the categories and masks are only used if the groups differ or are 0
+        return self._collision_group
+
+    @collision_group.setter
+    def collision_group(self, value: int):
+        self._collision_group = value
+
     def __repr__(self) -> str:
         return f"GameObject({self.name}, pos={self.pos}, vel={self.vel}, acc={self.acc}, mass={self.mass})"
 
-    def update(self, dt: float):
+    def update(self, dt: float, extra_acc: Vector = None):
+        # extra_acc is added to the acceleration of this step only, e.g. from force fields
         # account for angular acceleration
         angle_delta = self.angular_vel * dt + 0.5 * self.angular_acc * dt**2
         if angle_delta > STEP_ANGLE_WARNING_THRESHOLD:
@@ -199,31 +311,35 @@ class GameObject(ABC):
 
         # we do NOT use verlet integration as we want to be able to set the velocity directly
         # while this does not represent a real world physics, it is useful for the game
-        pos_delta = self.vel * dt + 0.5 * self.acc * dt**2
+        acc = self.acc if extra_acc is None else self.acc + extra_acc
+        pos_delta = self.vel * dt + 0.5 * acc * dt**2
         if pos_delta.magnitude() > STEP_DISTANCE_WARNING_THRESHOLD:
             logging.warning(f"Large position delta in a single step: {pos_delta}")
-        self.vel += self.acc * dt
+        self.vel += acc * dt
         self.pos += pos_delta
 
     def collides_with(self, other: "GameObject") -> Collision:
         if not bounding_box_collision(self, other):
             return None
+        # the narrow phase depends on the types of both objects, see register_collision_test
+        return collide(self, other)
 
-        if isinstance(other, Ball) and isinstance(self, Ball):
-            return ball_ball_collision(self, other)
-        elif isinstance(other, Ball) and isinstance(self, ConvexPolygon):
-            return ball_polygon_collision(other, self)
-        elif isinstance(other, ConvexPolygon) and isinstance(self, Ball):
-            return ball_polygon_collision(self, other)
-        elif isinstance(other, ConvexPolygon) and isinstance(self, ConvexPolygon):
-            return polygon_polygon_collision(self, other)
-        else:
-            raise ValueError(f"Unknown object types {type(self)} and {type(other)}")
+    def cache_geometry(self):
+        # computes the lazily cached geometry which is used by the collision tests, so that
+        # concurrent tests only read the object (see get_collisions)
+        pass
 
     def on_collision(self, collision: Collision):
-        for callback in self.collision_callbacks:
+        if not self._collision_callbacks:
+            return
+        for callback in self._collision_callbacks:
             callback(self, collision)
 
+    def _bbox_changed(self):
+        self._update_bbox()
+        if self._spatial_hash is not None:
+            self._spatial_hash.update(self)
+
     @abstractmethod
     def _update_bbox(self):
         raise NotImplementedError()
@@ -236,8 +352,35 @@ class GameObject(ABC):
     def projected_extends(self, axis: Vector) -> Tuple[float, float]:
         raise NotImplementedError()
 
+    @abstractmethod
+    def contains_point(self, point: Vector) -> bool:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def distance_to_point(self, point: Vector) -> float:
+        # distance from the point to the shape, 0 if the point is inside the shape
+        raise NotImplementedError()
+
+    @abstractmethod
+    def intersects_box(self, box: Tuple[Vector, Vector]) -> bool:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def primitives(self) -> Tuple[List[Tuple[Vector, float]], List[List[Vector]]]:
+        # circles (center, radius) and convex polygons (anticlockwise vertices) whose union is the
+        # shape of the object, used by the vectorized tests (see pack_shapes)
+        raise NotImplementedError()
+
+    @abstractmethod
+    def support_feature(self, direction: Vector) -> Tuple[Vector, ...]:
+        # the point or the two ends of the edge of the surface which are furthest in the
+        # (normalized) direction, used for the contact points (see contact_manifold)
+        raise NotImplementedError()
+
 
 class Ball(GameObject):
+    __slots__ = ("_radius",)
+
     def __init__(
         self,
         pos: Vector,
@@ -253,6 +396,9 @@ class Ball(GameObject):
         name: str = None,
         bounciness: float = 1,
         collision_callbacks: List[Callable] = None,
+        collision_category: int = DEFAULT_CATEGORY,
+        collision_mask: int = ALL_CATEGORIES,
+        collision_group: int = 0,
     ):
         self._radius = radius
         super().__init__(
@@ -264,10 +410,13 @@ class Ball(GameObject):
             angular_vel,
             angular_acc,
             fixed=fixed,
-            style_attributes=style_attributes or {},
+            style_attributes=style_attributes,
             name=name,
             bounciness=bounciness,
-            collision_callbacks=collision_callbacks or [],
+            collision_callbacks=collision_callbacks,
+            collision_category=collision_category,
+            collision_mask=collision_mask,
+            collision_group=collision_group,
         )
 
     @classmethod
@@ -310,28 +459,39 @@ class Ball(GameObject):
     def _update_area(self):
         self._area = math.pi * self._radius**2
 
-    def collides_with(self, other: GameObject) -> Collision:
-        if not bounding_box_collision(self, other):
-            return None
-
-        if isinstance(other, Ball):
-            return ball_ball_collision(self, other)
-        elif isinstance(other, ConvexPolygon):
-            return ball_polygon_collision(self, other)
-        else:
-            raise ValueError(f"Unknown object type {type(other)}")
-
     def projected_extends(self, axis: Vector) -> Tuple[float, float]:
         # https://en.wikipedia.org/wiki/Vector_projection#Vector_projection_2
         center = self.pos
         proj_dist = center.dot(axis) / axis.magnitude()
         return proj_dist - self._radius, proj_dist + self._radius
 
+    def contains_point(self, point: Vector) -> bool:
+        return (point - self.pos).magnitude() <= self._radius
+
+    def distance_to_point(self, point: Vector) -> float:
+        return max((point - self.pos).magnitude() - self._radius, 0)
+
+    def intersects_box(self, box: Tuple[Vector, Vector]) -> bool:
+        # distance from the center to the closest point of the box
+        closest = Vector(
+            min(max(self.pos.x, box[0].x), box[1].x),
+            min(max(self.pos.y, box[0].y), box[1].y),
+        )
+        return (closest - self.pos).magnitude() <= self._radius
+
+    def primitives(self) -> Tuple[List[Tuple[Vector, float]], List[List[Vector]]]:
+        return [(self.pos, self._radius)], []
+
+    def support_feature(self, direction: Vector) -> Tuple[Vector, ...]:
+        return (self.pos + direction * self._radius,)
+
 
 class ConvexPolygon(GameObject):
+    __slots__ = ("_shape", "_vertices", "_normals")
+
     def __init__(
         self,
-        vertices: List[Vector],
+        vertices: Union[List[Vector], PolygonShape],
         vel: Vector = Vector(0, 0),
         acc: Vector = Vector(0, 0),
         mass: float = 1,
@@ -342,35 +502,49 @@ class ConvexPolygon(GameObject):
         name: str = None,
         bounciness: float = 1,
         collision_callbacks: List[Callable] = None,
+        collision_category: int = DEFAULT_CATEGORY,
+        collision_mask: int = ALL_CATEGORIES,
+        collision_group: int = 0,
+        pos: Vector = None,
+        angle: float = 0,
     ):
-        assert len(vertices) >= 3
-
-        self._vertices = vertices
-        if not self._is_convex():
-            raise ValueError("Polygon is not convex")
-
-        if not self._is_anticlockwise():
-            self._vertices = list(reversed(self._vertices))
+        # objects can share the shape, otherwise a new shape is created from the vertices
+        if isinstance(vertices, PolygonShape):
+            self._shape = vertices
+        else:
+            self._shape = PolygonShape(vertices)
 
-        pos = self._compute_center_of_mass()
+        # the transformed vertices and normals are computed lazily as many objects
+        # (e.g. fixed ones) never need them
+        self._vertices = None
+        self._normals = None
 
         super().__init__(
-            pos,
+            pos if pos is not None else self._shape.centroid,
             vel,
             acc,
             mass if not fixed else float("inf"),
-            0,
+            angle % (2 * math.pi),
             angular_vel,
             angular_acc,
             fixed=fixed,
-            style_attributes=style_attributes or {},
+            style_attributes=style_attributes,
             name=name,
             bounciness=bounciness,
-            collision_callbacks=collision_callbacks or [],
+            collision_callbacks=collision_callbacks,
+            collision_category=collision_category,
+            collision_mask=collision_mask,
+            collision_group=collision_group,
         )
 
     @property
-    def vertices(self):
+    def shape(self) -> PolygonShape:
+        return self._shape
+
+    @property
+    def vertices(self) -> List[Vector]:
+        if self._vertices is None:
+            self._vertices = self._shape.transformed_vertices(self._pos, self._angle)
         return self._vertices
 
     @property
@@ -379,12 +553,9 @@ class ConvexPolygon(GameObject):
 
     @pos.setter
     def pos(self, value: Vector):
-        delta = value - self.pos
-        for i, vertex in enumerate(self._vertices):
-            self._vertices[i] = vertex + delta
-
         self._pos = value
-        self._update_bbox()
+        self._vertices = None
+        self._bbox_changed()
 
     @property
     def angle(self):
@@ -392,12 +563,10 @@ class ConvexPolygon(GameObject):
 
     @angle.setter
     def angle(self, value: float):
-        delta = value - self._angle
-        for i, vertex in enumerate(self._vertices):
-            self._vertices[i] = (vertex - self.pos).rotate(delta) + self.pos
-
         self._angle = value % (2 * math.pi)
-        self._update_bbox()
+        self._vertices = None
+        self._normals = None
+        self._bbox_changed()
 
     @classmethod
     def create_rectangle(
@@ -459,86 +628,379 @@ class ConvexPolygon(GameObject):
         return polygon
 
     def _is_convex(self) -> bool:
-        n = len(self._vertices)
-        vertex_signs = []
-        for i in range(n):
-            p1 = self._vertices[i]
-            p2 = self._vertices[(i + 1) % n]
-            p3 = self._vertices[(i + 2) % n]
-            edge1 = p2 - p1
-            edge2 = p3 - p2
-
-            vertex_signs.append(edge1.cross(edge2) > 0)
-
-        return all(vertex_signs) or not any(vertex_signs)
-
-    def _is_anticlockwise(self) -> bool:
-        n = len(self._vertices)
-        total = 0
-        for i in range(n):
-            j = (i + 1) % n
-            total += (self._vertices[j].x - self._vertices[i].x) * (
-                self._vertices[j].y + self._vertices[i].y
-            )
-        return total < 0
+        return is_convex(self.vertices)
 
     def _update_bbox(self) -> Tuple[Vector, Vector]:
-        xs = [v.x for v in self._vertices]
-        ys = [v.y for v in self._vertices]
-        self._bbox = (Vector(min(xs), min(ys)), Vector(max(xs), max(ys)))
+        self._bbox = self._shape.transformed_bbox(self._pos, self._angle)
 
     def _update_area(self) -> float:
-        # https://en.wikipedia.org/wiki/Centroid#Of_a_polygon
-        n = len(self._vertices)
-        area = 0
-        for i in range(n):
-            j = (i + 1) % n
-            area += self._vertices[i].cross(self._vertices[j])
-        self._area = area / 2
-
-    def _compute_center_of_mass(self) -> Vector:
-        # https://en.wikipedia.org/wiki/Centroid#Of_a_polygon
-        n = len(self._vertices)
-        cx = 0
-        cy = 0
-        # we can not use self.area as it is not yet computed when this method is called in the constructor
-        area = 0
-        for i in range(n):
-            j = (i + 1) % n
-            factor = self._vertices[i].cross(self._vertices[j])
-            cx += (self._vertices[i].x + self._vertices[j].x) * factor
-            cy += (self._vertices[i].y + self._vertices[j].y) * factor
-            area += factor
-        return Vector(cx, cy) / (3 * area)
+        self._area = self._shape.area
 
     def __repr__(self) -> str:
         return f"ConvexPolygon({self.name}, pos={self.pos}"  # , vel={self.vel}, acc={self.acc}, mass={self.mass}, vertices={self.vertices})"
 
-    def collides_with(self, other: GameObject) -> Collision:
-        if not bounding_box_collision(self, other):
-            return None
-
-        if isinstance(other, Ball):
-            return ball_polygon_collision(other, self)
-        elif isinstance(other, ConvexPolygon):
-            return polygon_polygon_collision(self, other)
-        else:
-            raise ValueError(f"Unknown object type {type(other)}")
-
     def projected_extends(self, axis: Vector) -> Tuple[float, float]:
         min_proj = float("inf")
         max_proj = float("-inf")
         axis_magnitude = axis.magnitude()
-        for vertex in self._vertices:
+        for vertex in self.vertices:
             proj_dist = vertex.dot(axis) / axis_magnitude
             min_proj = min(min_proj, proj_dist)
             max_proj = max(max_proj, proj_dist)
 
         return min_proj, max_proj
 
+    def contains_point(self, point: Vector) -> bool:
+        # the vertices are anticlockwise so inside points are on the left of every edge
+        vertices = self.vertices
+        n = len(vertices)
+        for i in range(n):
+            p1 = vertices[i]
+            p2 = vertices[(i + 1) % n]
+            if (p2 - p1).cross(point - p1) < 0:
+                return False
+        return True
+
+    def distance_to_point(self, point: Vector) -> float:
+        if self.contains_point(point):
+            return 0
+
+        vertices = self.vertices
+        n = len(vertices)
+        min_dist = float("inf")
+        for i in range(n):
+            p1 = vertices[i]
+            edge = vertices[(i + 1) % n] - p1
+            # closest point on the edge segment
+            t = min(max((point - p1).dot(edge) / edge.dot(edge), 0), 1)
+            min_dist = min(min_dist, (point - (p1 + edge * t)).magnitude())
+        return min_dist
+
+    def intersects_box(self, box: Tuple[Vector, Vector]) -> bool:
+        # separating axis test, the box axes are covered by the bounding box check
+        bbox_min, bbox_max = self.bbox
+        if (
+            bbox_min.x > box[1].x
+            or bbox_max.x < box[0].x
+            or bbox_min.y > box[1].y
+            or bbox_max.y < box[0].y
+        ):
+            return False
+
+        corners = [
+            box[0],
+            Vector(box[1].x, box[0].y),
+            box[1],
+            Vector(box[0].x, box[1].y),
+        ]
+        for normal in self.get_normals():
+            min1, max1 = self.projected_extends(normal)
+            projections = [corner.dot(normal) for corner in corners]
+            if max1 < min(projections) or max(projections) < min1:
+                return False
+        return True
+
     def get_normals(self) -> Iterator[Vector]:
-        for i, p1 in enumerate(self.vertices):
-            p2 = self.vertices[(i + 1) % len(self.vertices)]
-            edge = p2 - p1
-            normal = Vector(edge.y, -edge.x).normalize()
-            yield normal
+        if self._normals is None:
+            self._normals = self._shape.transformed_normals(self._angle)
+        return iter(self._normals)
+
+    def primitives(self) -> Tuple[List[Tuple[Vector, float]], List[List[Vector]]]:
+        return [], [self.vertices]
+
+    def cache_geometry(self):
+        self.vertices
+        self.get_normals()
+
+    def support_feature(self, direction: Vector) -> Tuple[Vector, ...]:
+        # the edge at the furthest vertex which is more perpendicular to the direction
+        vertices = self.vertices
+        n = len(vertices)
+        i = max(range(n), key=lambda k: vertices[k].dot(direction))
+        previous, vertex, following = (
+            vertices[i - 1],
+            vertices[i],
+            vertices[(i + 1) % n],
+        )
+        to_previous = (vertex - previous).normalize()
+        to_following = (following - vertex).normalize()
+        if abs(to_previous.dot(direction)) <= abs(to_following.dot(direction)):
+            return previous, vertex
+        return vertex, following
+
+
+class AABox(ConvexPolygon):
+    """Rectangle which is always axis aligned and can not rotate, e.g. for walls and floors."""
+
+    # collisions with balls and other boxes use closed form tests, all other collisions are
+    # handled like for any convex polygon
+
+    __slots__ = ("_half_width", "_half_height")
+
+    def __init__(
+        self,
+        pos: Vector,
+        width: float,
+        height: float,
+        vel: Vector = Vector(0, 0),
+        acc: Vector = Vector(0, 0),
+        mass: float = 1,
+        fixed: bool = False,
+        style_attributes: Dict[Any, Any] = None,
+        name: str = None,
+        bounciness: float = 1,
+        collision_callbacks: List[Callable] = None,
+        collision_category: int = DEFAULT_CATEGORY,
+        collision_mask: int = ALL_CATEGORIES,
+        collision_group: int = 0,
+    ):
+        if width <= 0 or height <= 0:
+            raise ValueError("Width and height must be positive")
+        self._half_width = width / 2
+        self._half_height = height / 2
+        super().__init__(
+            [
+                Vector(-self._half_width, -self._half_height),
+                Vector(self._half_width, -self._half_height),
+                Vector(self._half_width, self._half_height),
+                Vector(-self._half_width, self._half_height),
+            ],
+            vel,
+            acc,
+            mass,
+            fixed=fixed,
+            style_attributes=style_attributes,
+            name=name,
+            bounciness=bounciness,
+            collision_callbacks=collision_callbacks,
+            collision_category=collision_category,
+            collision_mask=collision_mask,
+            collision_group=collision_group,
+            pos=pos,
+        )
+
+    @property
+    def half_width(self) -> float:
+        return self._half_width
+
+    @property
+    def half_height(self) -> float:
+        return self._half_height
+
+    @property
+    def angle(self):
+        return self._angle
+
+    @angle.setter
+    def angle(self, value: float):
+        if value % (2 * math.pi) != 0:
+            raise ValueError("Axis aligned boxes can not be rotated")
+
+    def __repr__(self) -> str:
+        return f"AABox({self.name}, pos={self.pos}"
+
+    def _update_bbox(self):
+        half_extends = Vector(self._half_width, self._half_height)
+        self._bbox = (self._pos - half_extends, self._pos + half_extends)
+
+    def contains_point(self, point: Vector) -> bool:
+        return (
+            abs(point.x - self._pos.x) <= self._half_width
+            and abs(point.y - self._pos.y) <= self._half_height
+        )
+
+    def distance_to_point(self, point: Vector) -> float:
+        dx = max(abs(point.x - self._pos.x) - self._half_width, 0)
+        dy = max(abs(point.y - self._pos.y) - self._half_height, 0)
+        return math.hypot(dx, dy)
+
+    def intersects_box(self, box: Tuple[Vector, Vector]) -> bool:
+        bbox_min, bbox_max = self._bbox
+        return not (
+            bbox_min.x > box[1].x
+            or bbox_max.x < box[0].x
+            or bbox_min.y > box[1].y
+            or bbox_max.y < box[0].y
+        )
+
+
+class Capsule(GameObject):
+    """Segment of length 2 * half_length along the x axis of the object, rounded by a radius."""
+
+    __slots__ = ("_half_length", "_radius", "_ends")
+
+    def __init__(
+        self,
+        pos: Vector,
+        half_length: float,
+        radius: float,
+        vel: Vector = Vector(0, 0),
+        acc: Vector = Vector(0, 0),
+        angle: float = 0,
+        angular_vel: float = 0,
+        angular_acc: float = 0,
+        mass: float = 1,
+        fixed: bool = False,
+        style_attributes: Dict[Any, Any] = None,
+        name: str = None,
+        bounciness: float = 1,
+        collision_callbacks: List[Callable] = None,
+        collision_category: int = DEFAULT_CATEGORY,
+        collision_mask: int = ALL_CATEGORIES,
+        collision_group: int = 0,
+    ):
+        if half_length < 0 or radius <= 0:
+            raise ValueError("Capsules need a positive radius and half length")
+        self._half_length = half_length
+        self._radius = radius
+        self._ends = None
+        super().__init__(
+            pos,
+            vel,
+            acc,
+            mass if not fixed else float("inf"),
+            angle,
+            angular_vel,
+            angular_acc,
+            fixed=fixed,
+            style_attributes=style_attributes,
+            name=name,
+            bounciness=bounciness,
+            collision_callbacks=collision_callbacks,
+            collision_category=collision_category,
+            collision_mask=collision_mask,
+            collision_group=collision_group,
+        )
+
+    @property
+    def half_length(self) -> float:
+        return self._half_length
+
+    @property
+    def radius(self) -> float:
+        return self._radius
+
+    @property
+    def pos(self):
+        return self._pos
+
+    @pos.setter
+    def pos(self, value: Vector):
+        self._pos = value
+        self._ends = None
+        self._bbox_changed()
+
+    @property
+    def angle(self):
+        return self._angle
+
+    @angle.setter
+    def angle(self, value: float):
+        self._angle = value
+        self._ends = None
+        self._bbox_changed()
+
+    @property
+    def ends(self) -> Tuple[Vector, Vector]:
+        """The two ends of the axis segment."""
+        if self._ends is None:
+            offset = self.axis * self._half_length
+            self._ends = (self._pos - offset, self._pos + offset)
+        return self._ends
+
+    @property
+    def axis(self) -> Vector:
+        return Vector(math.cos(self._angle), math.sin(self._angle))
+
+    @property
+    def axis_normal(self) -> Vector:
+        return Vector(-math.sin(self._angle), math.cos(self._angle))
+
+    def __repr__(self) -> str:
+        return f"Capsule({self.name}, pos={self.pos}"
+
+    def _update_bbox(self):
+        self._ends = None
+        start, end = self.ends
+        r = Vector(self._radius, self._radius)
+        self._bbox = (
+            Vector(min(start.x, end.x), min(start.y, end.y)) - r,
+            Vector(max(start.x, end.x), max(start.y, end.y)) + r,
+        )
+
+    def _update_area(self):
+        self._area = math.pi * self._radius**2 + 4 * self._half_length * self._radius
+
+    def projected_extends(self, axis: Vector) -> Tuple[float, float]:
+        axis_magnitude = axis.magnitude()
+        start, end = self.ends
+        proj1 = start.dot(axis) / axis_magnitude
+        proj2 = end.dot(axis) / axis_magnitude
+        return min(proj1, proj2) - self._radius, max(proj1, proj2) + self._radius
+
+    def contains_point(self, point: Vector) -> bool:
+        closest = closest_point_on_segment(point, *self.ends)
+        return (point - closest).magnitude() <= self._radius
+
+    def distance_to_point(self, point: Vector) -> float:
+        closest = closest_point_on_segment(point, *self.ends)
+        return max((point - closest).magnitude() - self._radius, 0)
+
+    def intersects_box(self, box: Tuple[Vector, Vector]) -> bool:
+        bbox_min, bbox_max = self._bbox
+        if (
+            bbox_min.x > box[1].x
+            or bbox_max.x < box[0].x
+            or bbox_min.y > box[1].y
+            or bbox_max.y < box[0].y
+        ):
+            return False
+        # separating axis test of the box and the capsule, the axes of the box are covered above
+        corners = [
+            box[0],
+            Vector(box[1].x, box[0].y),
+            box[1],
+            Vector(box[0].x, box[1].y),
+        ]
+        axes = [self.axis_normal]
+        for end in self.ends:
+            closest = Vector(
+                min(max(end.x, box[0].x), box[1].x),
+                min(max(end.y, box[0].y), box[1].y),
+            )
+            if closest != end:
+                axes.append(closest - end)
+        for axis in axes:
+            min1, max1 = self.projected_extends(axis)
+            projections = [corner.dot(axis) / axis.magnitude() for corner in corners]
+            if max1 < min(projections) or max(projections) < min1:
+                return False
+        return True
+
+    def primitives(self) -> Tuple[List[Tuple[Vector, float]], List[List[Vector]]]:
+        start, end = self.ends
+        side = self.axis_normal * self._radius
+        return [(start, self._radius), (end, self._radius)], [
+            [start - side, end - side, end + side, start + side]
+        ]
+
+    def cache_geometry(self):
+        self.ends
+
+    def support_feature(self, direction: Vector) -> Tuple[Vector, ...]:
+        start, end = self.ends
+        offset = direction * self._radius
+        along = self.axis.dot(direction)
+        if abs(along) <= CAPSULE_SIDE_TOLERANCE:
+            return start + offset, end + offset
+        return ((end if along > 0 else start) + offset,)
+
+
+register_collision_test(Ball, Ball, ball_ball_collision)
+register_collision_test(Ball, ConvexPolygon, ball_polygon_collision)
+register_collision_test(ConvexPolygon, ConvexPolygon, polygon_polygon_collision)
+register_collision_test(Ball, AABox, ball_box_collision)
+register_collision_test(AABox, AABox, box_box_collision)
+register_collision_test(Capsule, Ball, capsule_ball_collision)
+register_collision_test(Capsule, Capsule, capsule_capsule_collision)
+register_collision_test(Capsule, ConvexPolygon, capsule_polygon_collision)
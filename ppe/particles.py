@@ -0,0 +1,337 @@
+from typing import Tuple, Union
+
+import numpy as np
+
+from ppe.raycast import ShapeArrays, pack_shapes
+from ppe.resolution import scatter_sum
+from ppe.vector import Vector
+from ppe.world import World
+
+ArrayLike = Union[float, np.ndarray]
+
+# offsets of the neighboring cells which are searched for particle pairs, every pair of
+# neighboring cells is only visited once
+_HALF_STENCIL = ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1))
+
+
+class ParticleSystem:
+    """Particles stored in arrays which collide with the objects of a world.
+
+    Every particle only has a position, a velocity, a remaining lifetime and a radius, all
+    particles share the acceleration and the bounciness. The particles are integrated, collided
+    and expired for all particles at once. The particles are pushed out of the objects of the
+    world but have no mass, i.e. the objects are not affected by them and no collision callbacks
+    are called. Collisions between the particles are optional and treat all particles as having
+    the same mass.
+
+    Particles whose lifetime is over or which leave the world bounding box are removed. The
+    particles are sorted into a grid with `cell_size` (at least the largest particle diameter),
+    which is used to find the particles close to the objects and to each other.
+    """
+
+    def __init__(
+        self,
+        world: World,
+        acc: Vector = Vector(0, 0),
+        bounciness: float = 0.5,
+        collide_particles: bool = False,
+        cell_size: float = 1,
+    ):
+        if cell_size <= 0:
+            raise ValueError("Cell size must be positive")
+        self.world = world
+        self.acc = acc
+        self.bounciness = bounciness
+        self.collide_particles = collide_particles
+        self.cell_size = cell_size
+        self._pos = np.zeros((0, 2))
+        self._vel = np.zeros((0, 2))
+        self._lifetime = np.zeros(0)
+        self._radius = np.zeros(0)
+
+    def __len__(self) -> int:
+        return len(self._lifetime)
+
+    @property
+    def positions(self) -> np.ndarray:
+        return self._pos
+
+    @property
+    def velocities(self) -> np.ndarray:
+        return self._vel
+
+    @property
+    def lifetimes(self) -> np.ndarray:
+        """Remaining lifetime of the particles in seconds."""
+        return self._lifetime
+
+    @property
+    def radii(self) -> np.ndarray:
+        return self._radius
+
+    def emit(
+        self,
+        positions: np.ndarray,
+        velocities: np.ndarray,
+        lifetimes: ArrayLike,
+        radii: ArrayLike,
+    ):
+        """Adds particles with the (n, 2) positions and velocities, lifetimes and radii can also
+        be single values for all particles."""
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        n = len(positions)
+        velocities = np.broadcast_to(np.asarray(velocities, dtype=np.float64), (n, 2))
+        self._pos = np.concatenate((self._pos, positions))
+        self._vel = np.concatenate((self._vel, velocities))
+        self._lifetime = np.concatenate(
+            (self._lifetime, np.broadcast_to(lifetimes, (n,)))
+        )
+        self._radius = np.concatenate((self._radius, np.broadcast_to(radii, (n,))))
+
+    def clear(self):
+        self._keep(np.zeros(len(self), dtype=bool))
+
+    def update(self, dt: float):
+        acc = np.array(self.acc.to_tuple())
+        self._pos += self._vel * dt + 0.5 * acc * dt**2
+        self._vel += acc * dt
+        self._lifetime -= dt
+
+        keep = self._lifetime > 0
+        if self.world.world_bbox is not None:
+            bbox_min, bbox_max = self.world.world_bbox
+            keep &= np.all(
+                (self._pos >= bbox_min.to_tuple()) & (self._pos <= bbox_max.to_tuple()),
+                axis=1,
+            )
+        if not keep.all():
+            self._keep(keep)
+        if not len(self):
+            return
+
+        cell_size = max(self.cell_size, 2 * self._radius.max())
+        cells = np.floor(self._pos / cell_size).astype(np.int64)
+        # the particles are sorted by their cell, the cells are ordered row by row
+        cells -= cells.min(axis=0)
+        n_columns = cells[:, 0].max() + 2
+        keys = cells[:, 1] * n_columns + cells[:, 0]
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+
+        if self.world.objects:
+            self._collide_objects(order, sorted_keys, n_columns, cell_size)
+        if self.collide_particles:
+            self._collide_particles(order, sorted_keys, n_columns)
+
+    def _keep(self, keep: np.ndarray):
+        self._pos = self._pos[keep]
+        self._vel = self._vel[keep]
+        self._lifetime = self._lifetime[keep]
+        self._radius = self._radius[keep]
+
+    def _collide_objects(
+        self,
+        order: np.ndarray,
+        sorted_keys: np.ndarray,
+        n_columns: int,
+        cell_size: float,
+    ):
+        # only the objects overlapping the bounding box of all particles are packed, they are
+        # found with the broad phase of the world
+        max_radius = self._radius.max()
+        pos_min, pos_max = self._pos.min(axis=0), self._pos.max(axis=0)
+        objects = self.world.query_aabb(
+            (
+                Vector(*(pos_min - max_radius).tolist()),
+                Vector(*(pos_max + max_radius).tolist()),
+            )
+        )
+        if not objects:
+            return
+        shapes = pack_shapes(objects)
+
+        # candidate pairs of particles and objects from the cells overlapping the bounding boxes
+        origin = np.floor(pos_min / cell_size)
+        cell_min = np.floor((shapes.bbox_min - max_radius) / cell_size) - origin
+        cell_max = np.floor((shapes.bbox_max + max_radius) / cell_size) - origin
+        cell_min = np.maximum(cell_min, 0).astype(np.int64)
+        cell_max = np.minimum(cell_max, (n_columns - 2, sorted_keys[-1] // n_columns))
+        cell_max = cell_max.astype(np.int64)
+        particles, owners = [], []
+        for i in np.flatnonzero(np.all(cell_max >= cell_min, axis=1)).tolist():
+            rows = np.arange(cell_min[i, 1], cell_max[i, 1] + 1) * n_columns
+            starts = np.searchsorted(sorted_keys, rows + cell_min[i, 0])
+            ends = np.searchsorted(sorted_keys, rows + cell_max[i, 0], side="right")
+            candidates = order[_ranges(starts, ends)]
+            particles.append(candidates)
+            owners.append(np.full(len(candidates), i, dtype=np.intp))
+        if not particles:
+            return
+        particles = np.concatenate(particles)
+        owners = np.concatenate(owners)
+
+        normals, depths = _object_contacts(
+            self._pos[particles], self._radius[particles], owners, shapes
+        )
+        hit = depths > 0
+        particles, owners = particles[hit], owners[hit]
+        normals, depths = normals[hit], depths[hit]
+        if not len(particles):
+            return
+
+        # the objects are not moved, so the particles get the full correction
+        n = len(self)
+        self._pos += scatter_sum(particles, normals * depths[:, None], n)
+        obj_vel = np.array([obj.vel.to_tuple() for obj in objects])[owners]
+        obj_bounciness = np.array([obj.bounciness for obj in objects])[owners]
+        e = (self.bounciness + obj_bounciness) / 2
+        approach = np.einsum("cd,cd->c", self._vel[particles] - obj_vel, normals)
+        dvel = -normals * ((1 + e) * np.minimum(approach, 0))[:, None]
+        # a particle touching several objects gets the average of the velocity changes
+        counts = np.bincount(particles, minlength=n)
+        self._vel += scatter_sum(particles, dvel, n) / np.maximum(counts, 1)[:, None]
+
+    def _collide_particles(
+        self, order: np.ndarray, sorted_keys: np.ndarray, n_columns: int
+    ):
+        index1, index2 = [], []
+        for dx, dy in _HALF_STENCIL:
+            neighbors = sorted_keys + dy * n_columns + dx
+            starts = np.searchsorted(sorted_keys, neighbors)
+            ends = np.searchsorted(sorted_keys, neighbors, side="right")
+            if (dx, dy) == (0, 0):
+                # only the particles after each particle in its own cell
+                starts = np.arange(1, len(sorted_keys) + 1)
+            counts = np.maximum(ends - starts, 0)
+            index1.append(np.repeat(order, counts))
+            index2.append(order[_ranges(starts, ends)])
+        index1 = np.concatenate(index1)
+        index2 = np.concatenate(index2)
+
+        delta = self._pos[index2] - self._pos[index1]
+        distance = np.sqrt(np.einsum("cd,cd->c", delta, delta))
+        depths = self._radius[index1] + self._radius[index2] - distance
+        hit = (depths > 0) & (distance > 0)
+        index1, index2 = index1[hit], index2[hit]
+        normals = delta[hit] / distance[hit, None]
+        depths = depths[hit]
+        if not len(index1):
+            return
+
+        # particles have the same mass, so both move by half of the depth and the relative
+        # normal velocity is split evenly
+        n = len(self)
+        indices = np.concatenate((index1, index2))
+        correction = normals * (depths / 2)[:, None]
+        self._pos += scatter_sum(indices, np.concatenate((-correction, correction)), n)
+        approach = np.einsum("cd,cd->c", self._vel[index1] - self._vel[index2], normals)
+        impulse = (
+            normals * ((1 + self.bounciness) / 2 * np.maximum(approach, 0))[:, None]
+        )
+        counts = np.maximum(np.bincount(indices, minlength=n), 1)[:, None]
+        self._vel += (
+            scatter_sum(indices, np.concatenate((-impulse, impulse)), n) / counts
+        )
+
+
+def _ranges(starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    # concatenation of np.arange(start, end) for all ranges
+    counts = np.maximum(ends - starts, 0)
+    total = counts.sum()
+    if not total:
+        return np.zeros(0, dtype=np.intp)
+    offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+    return np.arange(total) + offsets
+
+
+def _object_contacts(
+    pos: np.ndarray, radius: np.ndarray, owners: np.ndarray, shapes: ShapeArrays
+) -> Tuple[np.ndarray, np.ndarray]:
+    # normals pointing from the object towards the particle and penetration depths (negative if
+    # the particle does not touch the object) of the particle-object pairs, the objects are
+    # unions of circles and polygons and the deepest contact of all of them is used
+    n_objects = len(shapes.bbox_min)
+    contact_pairs, contact_normals, contact_depths = [], [], []
+
+    # circles, the circles of every object are contiguous
+    pairs, balls = _expand(owners, shapes.ball_owner, n_objects)
+    delta = pos[pairs] - shapes.ball_centers[balls]
+    distance = np.sqrt(np.einsum("cd,cd->c", delta, delta))
+    # a particle at the center is pushed upwards
+    contact_pairs.append(pairs)
+    contact_normals.append(
+        np.where(
+            distance[:, None] > 0,
+            delta / np.where(distance > 0, distance, 1)[:, None],
+            (0, 1),
+        )
+    )
+    contact_depths.append(shapes.ball_radii[balls] + radius[pairs] - distance)
+
+    # polygons, the polygons of every object and the edges of every polygon are contiguous
+    polygon_owner = np.zeros(0, dtype=np.intp)
+    if len(shapes.edge_polygon):
+        first = np.flatnonzero(np.diff(shapes.edge_polygon, prepend=-1))
+        polygon_owner = shapes.edge_owner[first]
+    pairs, polygons = _expand(owners, polygon_owner, n_objects)
+    group_pairs, edges = _expand(polygons, shapes.edge_polygon, len(polygon_owner))
+    if len(edges):
+        counts = np.bincount(group_pairs, minlength=len(pairs))
+        group_starts = np.cumsum(counts) - counts
+
+        p = pos[pairs[group_pairs]]
+        start, end = shapes.edge_starts[edges], shapes.edge_ends[edges]
+        edge_normals = shapes.edge_normals[edges]
+        # signed distances to the lines of the edges, all are negative inside of the polygon
+        plane = np.einsum("cd,cd->c", p - start, edge_normals)
+        # closest points on the edges
+        edge = end - start
+        length2 = np.einsum("cd,cd->c", edge, edge)
+        t = np.clip(
+            np.einsum("cd,cd->c", p - start, edge) / np.where(length2 > 0, length2, 1),
+            0,
+            1,
+        )
+        offset = p - (start + edge * t[:, None])
+        distance = np.sqrt(np.einsum("cd,cd->c", offset, offset))
+
+        deepest = np.lexsort((-plane, group_pairs))[group_starts]
+        closest = np.lexsort((distance, group_pairs))[group_starts]
+        inside = plane[deepest] <= 0
+        contact_pairs.append(pairs)
+        contact_normals.append(
+            np.where(
+                inside[:, None],
+                edge_normals[deepest],
+                offset[closest]
+                / np.where(distance[closest] > 0, distance[closest], 1)[:, None],
+            )
+        )
+        contact_depths.append(
+            radius[pairs] + np.where(inside, -plane[deepest], -distance[closest])
+        )
+
+    # the deepest contact per pair
+    contact_pairs = np.concatenate(contact_pairs)
+    contact_normals = np.concatenate(contact_normals)
+    contact_depths = np.concatenate(contact_depths)
+    normals = np.zeros_like(pos)
+    depths = np.full(len(pos), -np.inf)
+    order = np.lexsort((-contact_depths, contact_pairs))
+    found, first = np.unique(contact_pairs[order], return_index=True)
+    normals[found] = contact_normals[order[first]]
+    depths[found] = contact_depths[order[first]]
+    return normals, depths
+
+
+def _expand(
+    groups: np.ndarray, owner: np.ndarray, n_groups: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    # pairs of the indices of the given groups and the indices of all items of their group, the
+    # items of every group are contiguous in the owner array
+    counts = np.bincount(owner, minlength=n_groups)
+    first = np.cumsum(counts) - counts
+    indices = np.arange(len(groups))
+    return np.repeat(indices, counts[groups]), _ranges(
+        first[groups], first[groups] + counts[groups]
+    )
@@ -0,0 +1,242 @@
+from dataclasses import dataclass
+from typing import List, Tuple
+
+import numpy as np
+
+from ppe.objects import GameObject
+
+# maximum number of ray-primitive combinations which are evaluated in a single array operation
+MAX_BATCH_ELEMENTS = 2**20
+
+
+@dataclass
+class ShapeArrays:
+    """Geometry of a set of objects packed into arrays for vectorized tests."""
+
+    # the *_owner arrays contain the index of the object in the packed object list
+    ball_centers: np.ndarray  # (n_balls, 2)
+    ball_radii: np.ndarray  # (n_balls,)
+    ball_owner: np.ndarray  # (n_balls,)
+    edge_starts: np.ndarray  # (n_edges, 2)
+    edge_ends: np.ndarray  # (n_edges, 2)
+    edge_normals: np.ndarray  # (n_edges, 2), pointing outwards
+    edge_owner: np.ndarray  # (n_edges,)
+    edge_polygon: (
+        np.ndarray
+    )  # (n_edges,), index of the polygon, the edges of a polygon are contiguous
+    bbox_min: np.ndarray  # (n_objects, 2)
+    bbox_max: np.ndarray  # (n_objects, 2)
+
+
+def pack_shapes(objects: List[GameObject]) -> ShapeArrays:
+    ball_centers, ball_radii, ball_owner = [], [], []
+    vertices, edge_owner, edge_polygon, next_vertex = [], [], [], []
+    n_polygons = 0
+    bbox_min, bbox_max = [], []
+    for i, obj in enumerate(objects):
+        bbox_min.append(obj.bbox[0].to_tuple())
+        bbox_max.append(obj.bbox[1].to_tuple())
+        # the shapes are packed as the union of their circles and polygons
+        circles, polygons = obj.primitives()
+        for center, radius in circles:
+            ball_centers.append(center.to_tuple())
+            ball_radii.append(radius)
+            ball_owner.append(i)
+        for polygon in polygons:
+            n = len(polygon)
+            start = len(vertices)
+            vertices.extend(v.to_tuple() for v in polygon)
+            edge_owner.extend([i] * n)
+            edge_polygon.extend([n_polygons] * n)
+            n_polygons += 1
+            next_vertex.extend(range(start + 1, start + n))
+            next_vertex.append(start)
+
+    vertices = np.array(vertices, dtype=np.float64).reshape(-1, 2)
+    edge_ends = vertices[np.array(next_vertex, dtype=np.intp)]
+    edges = edge_ends - vertices
+    # the vertices are anticlockwise, so (y, -x) points outwards
+    edge_normals = np.stack((edges[:, 1], -edges[:, 0]), axis=1)
+    lengths = np.linalg.norm(edge_normals, axis=1, keepdims=True)
+    edge_normals /= np.where(lengths > 0, lengths, 1)
+
+    return ShapeArrays(
+        ball_centers=np.array(ball_centers, dtype=np.float64).reshape(-1, 2),
+        ball_radii=np.array(ball_radii, dtype=np.float64),
+        ball_owner=np.array(ball_owner, dtype=np.intp),
+        edge_starts=vertices,
+        edge_ends=edge_ends,
+        edge_normals=edge_normals,
+        edge_owner=np.array(edge_owner, dtype=np.intp),
+        edge_polygon=np.array(edge_polygon, dtype=np.intp),
+        bbox_min=np.array(bbox_min, dtype=np.float64).reshape(-1, 2),
+        bbox_max=np.array(bbox_max, dtype=np.float64).reshape(-1, 2),
+    )
+
+
+def _candidate_pairs(
+    origins: np.ndarray,
+    directions: np.ndarray,
+    radii: np.ndarray,
+    max_distances: np.ndarray,
+    shapes: ShapeArrays,
+) -> np.ndarray:
+    # coarse (n_rays, n_objects) mask of the swept circles passing the bounding circles of the objects
+    centers = (shapes.bbox_min + shapes.bbox_max) / 2
+    bounding_radii = np.linalg.norm(shapes.bbox_max - shapes.bbox_min, axis=1) / 2
+    # the components are handled separately as this is a lot faster than einsum for small arrays
+    dx = centers[None, :, 0] - origins[:, 0, None]
+    dy = centers[None, :, 1] - origins[:, 1, None]
+    proj = dx * directions[:, 0, None] + dy * directions[:, 1, None]
+    np.clip(proj, 0, max_distances[:, None], out=proj)
+    dx -= proj * directions[:, 0, None]
+    dy -= proj * directions[:, 1, None]
+    reach = bounding_radii[None, :] + radii[:, None]
+    return dx**2 + dy**2 <= reach**2
+
+
+def _circle_hits(
+    origins: np.ndarray,
+    directions: np.ndarray,
+    centers: np.ndarray,
+    radii: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+    # intersects rays with circles (all arrays are given per ray-circle pair),
+    # returns the hit distances (inf for misses) and the normals at the hit points
+    offsets = origins - centers
+    b = np.einsum("pd,pd->p", offsets, directions)
+    c = np.einsum("pd,pd->p", offsets, offsets) - radii**2
+    disc = b**2 - c
+    with np.errstate(invalid="ignore"):
+        t = -b - np.sqrt(disc)
+    # rays starting inside a circle (c < 0) do not hit it
+    t = np.where((disc >= 0) & (c >= 0) & (t >= 0), t, np.inf)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        normals = (offsets + t[:, None] * directions) / radii[:, None]
+    return t, normals
+
+
+def _edge_hits(
+    origins: np.ndarray,
+    directions: np.ndarray,
+    starts: np.ndarray,
+    ends: np.ndarray,
+    normals: np.ndarray,
+) -> np.ndarray:
+    # intersects rays with the front side of edges (all arrays are given per ray-edge pair),
+    # returns the hit distances
+    edges = ends - starts
+    denom = np.einsum("pd,pd->p", directions, normals)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.einsum("pd,pd->p", starts - origins, normals) / denom
+        points = origins + t[:, None] * directions
+        s = np.einsum("pd,pd->p", points - starts, edges) / np.einsum(
+            "pd,pd->p", edges, edges
+        )
+    valid = (denom < 0) & (t >= 0) & (s >= 0) & (s <= 1)
+    return np.where(valid, t, np.inf)
+
+
+def cast(
+    shapes: ShapeArrays,
+    origins: np.ndarray,
+    directions: np.ndarray,
+    radii: np.ndarray,
+    max_distances: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Casts circles with the given radii (0 for rays) along normalized directions.
+
+    Returns the distances (inf if nothing is hit), hit normals and object indices (-1 if nothing
+    is hit), shapes which contain the origin of a ray are ignored.
+    """
+    n_rays = len(origins)
+    distances = np.full(n_rays, np.inf)
+    normals = np.zeros((n_rays, 2))
+    indices = np.full(n_rays, -1, dtype=np.intp)
+
+    # the coarse test is evaluated densely, so the rays are processed in batches to bound the memory
+    batch_size = max(MAX_BATCH_ELEMENTS // max(len(shapes.bbox_min), 1), 1)
+    for start in range(0, n_rays, batch_size):
+        batch = slice(start, start + batch_size)
+        _cast_batch(
+            shapes,
+            origins[batch],
+            directions[batch],
+            radii[batch],
+            max_distances[batch],
+            distances[batch],
+            normals[batch],
+            indices[batch],
+        )
+
+    return distances, normals, indices
+
+
+def _cast_batch(
+    shapes: ShapeArrays,
+    origins: np.ndarray,
+    directions: np.ndarray,
+    radii: np.ndarray,
+    max_distances: np.ndarray,
+    distances: np.ndarray,
+    normals: np.ndarray,
+    indices: np.ndarray,
+):
+    candidates = _candidate_pairs(origins, directions, radii, max_distances, shapes)
+    # hits of all primitives as (ray, distance, normal, object) which are reduced to the closest hit per ray
+    hit_rays, hit_t, hit_normals, hit_owner = [], [], [], []
+
+    # balls, the cast circle hits a ball if the ray hits the ball grown by the circle radius
+    rays, balls = np.nonzero(candidates[:, shapes.ball_owner])
+    t, ball_normals = _circle_hits(
+        origins[rays],
+        directions[rays],
+        shapes.ball_centers[balls],
+        shapes.ball_radii[balls] + radii[rays],
+    )
+    hit_rays.append(rays)
+    hit_t.append(t)
+    hit_normals.append(ball_normals)
+    hit_owner.append(shapes.ball_owner[balls])
+
+    # polygons, the polygon grown by the circle radius consists of the edges shifted outwards
+    # along their normal and circles with the circle radius around each vertex
+    rays, edges = np.nonzero(candidates[:, shapes.edge_owner])
+    edge_normals = shapes.edge_normals[edges]
+    offsets = radii[rays, None] * edge_normals
+    t = _edge_hits(
+        origins[rays],
+        directions[rays],
+        shapes.edge_starts[edges] + offsets,
+        shapes.edge_ends[edges] + offsets,
+        edge_normals,
+    )
+    hit_rays.append(rays)
+    hit_t.append(t)
+    hit_normals.append(edge_normals)
+    hit_owner.append(shapes.edge_owner[edges])
+
+    round_corners = radii[rays] > 0
+    rays, edges = rays[round_corners], edges[round_corners]
+    t, vertex_normals = _circle_hits(
+        origins[rays], directions[rays], shapes.edge_starts[edges], radii[rays]
+    )
+    hit_rays.append(rays)
+    hit_t.append(t)
+    hit_normals.append(vertex_normals)
+    hit_owner.append(shapes.edge_owner[edges])
+
+    hit_rays = np.concatenate(hit_rays)
+    hit_t = np.concatenate(hit_t)
+    hit = hit_t <= max_distances[hit_rays]
+    hit_rays, hit_t = hit_rays[hit], hit_t[hit]
+    hit_normals = np.concatenate(hit_normals)[hit]
+    hit_owner = np.concatenate(hit_owner)[hit]
+
+    # the first entry per ray after sorting by ray and distance is the closest hit
+    order = np.lexsort((hit_t, hit_rays))
+    rays, first = np.unique(hit_rays[order], return_index=True)
+    closest = order[first]
+    distances[rays] = hit_t[closest]
+    normals[rays] = hit_normals[closest]
+    indices[rays] = hit_owner[closest]
@@ -0,0 +1,470 @@
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+import json
+import struct
+
+import numpy as np
+
+from ppe.objects import AABox, Ball, Capsule, ConvexPolygon, GameObject
+from ppe.vector import Vector
+from ppe.world import World
+
+KEYFRAME = 1
+DELTA = 2
+# kind, sequence, baseline sequence (0 for keyframes), number of states, number of removed
+# objects and number of spawned objects
+_HEADER = struct.Struct("<BIIIII")
+# quanta of the state fields, only part of keyframes
+_QUANTA = struct.Struct("<6d")
+# quantized x, y, angle, vx, vy and angular velocity of an object
+N_STATE_FIELDS = 6
+# network id, shape type, number of shape parameters, mass, bounciness, fixed, collision
+# category, mask and group and length of the JSON encoded style attributes of a spawned object
+_SPAWN = struct.Struct("<IBHdd?IIiI")
+# shape type ids of spawned objects, subclasses are sent as their registered base class
+SPAWN_TYPES = {Ball: 1, AABox: 2, ConvexPolygon: 3, Capsule: 4}
+
+
+@dataclass
+class _Frame:
+    # objects which changed, were spawned or were removed in one encoded frame
+    sequence: int
+    changed: Set[int] = field(default_factory=set)
+    spawned: Set[int] = field(default_factory=set)
+    removed: Set[int] = field(default_factory=set)
+
+
+class StateEncoder:
+    """Encodes the state of a world for a client after every update.
+
+    Every object gets a network id. The positions, angles and velocities are quantized with the
+    given quanta and an object only counts as changed if one of its quantized values changed.
+    A delta contains the quantized state of all objects which changed since the baseline, the
+    last frame acknowledged by the client, the objects spawned since then and the ids of removed
+    objects. Spawned objects are sent as their shape parameters, mass, bounciness, collision
+    filters and style attributes (which have to be JSON serializable), collision callbacks,
+    names and accelerations are not sent. Since the states are absolute, a delta can be applied
+    to any state of the client between its baseline and the delta. Keyframes contain all objects
+    and are sent every `keyframe_interval` frames, before the first acknowledgement and when the
+    baseline is older than the last `max_unacked` frames.
+
+    Only awake objects are checked for changes, an object falls asleep after `sleep_frames`
+    frames without changes and is woken by a collision with an awake object, by the removal of an
+    object touching its bounding box or by `touch`. The cost of a delta therefore depends on the
+    number of moving objects and not on the size of the world. Objects have to be added and
+    removed with the methods of the encoder, objects changed from outside of the world update
+    have to be touched. Keyframes check all objects and pick up everything which was missed. One
+    encoder is needed per client.
+    """
+
+    def __init__(
+        self,
+        world: World,
+        position_quantum: float = 1e-3,
+        angle_quantum: float = 1e-3,
+        velocity_quantum: float = 1e-3,
+        keyframe_interval: int = 60,
+        max_unacked: int = 32,
+        sleep_frames: int = 10,
+    ):
+        if min(position_quantum, angle_quantum, velocity_quantum) <= 0:
+            raise ValueError("Quanta must be positive")
+        if keyframe_interval < 1 or max_unacked < 1 or sleep_frames < 1:
+            raise ValueError(
+                "Keyframe interval, max unacked and sleep frames must be at least 1"
+            )
+
+        self.world = world
+        self.quanta = np.array(
+            [
+                position_quantum,
+                position_quantum,
+                angle_quantum,
+                velocity_quantum,
+                velocity_quantum,
+                angle_quantum,
+            ]
+        )
+        self.keyframe_interval = keyframe_interval
+        self.sleep_frames = sleep_frames
+        self._ids: Dict[GameObject, int] = {}
+        self._objects: Dict[int, GameObject] = {}
+        self._next_id = 1
+        # last quantized state of every object
+        self._sent: Dict[int, Tuple[int, ...]] = {}
+        # awake object -> number of frames without changes
+        self._awake: Dict[GameObject, int] = {}
+        self._pending = _Frame(0)  # spawned and removed objects of the next frame
+        self._history = deque(maxlen=max_unacked)
+        self._sequence = 0
+        self._acknowledged = None
+        self._last_keyframe = None
+
+    @property
+    def sequence(self) -> int:
+        """Sequence number of the last encoded frame, the first frame has number 1."""
+        return self._sequence
+
+    @property
+    def acknowledged(self) -> Optional[int]:
+        return self._acknowledged
+
+    @property
+    def awake_objects(self) -> Set[GameObject]:
+        return set(self._awake)
+
+    def network_id(self, obj: GameObject) -> int:
+        return self._ids[obj]
+
+    def add_object(self, obj: GameObject):
+        self.world.add_object(obj)
+        self._register(obj)
+
+    def remove_object(self, obj: GameObject):
+        self.world.remove_object(obj)
+        self._unregister(obj)
+
+    def touch(self, obj: GameObject):
+        """Marks an object which was changed from outside of the world update."""
+        self._awake[obj] = 0
+
+    def acknowledge(self, sequence: int):
+        """Called when the client has applied the frame with the given sequence number."""
+        if sequence > self._sequence:
+            raise ValueError(f"Frame {sequence} has not been encoded yet")
+        if self._acknowledged is not None and sequence <= self._acknowledged:
+            return
+        self._acknowledged = sequence
+        while self._history and self._history[0].sequence <= sequence:
+            self._history.popleft()
+
+    def step(self, dt: float) -> bytes:
+        """Updates the world and encodes the new state."""
+        self.world.update(dt)
+        return self.encode()
+
+    def encode(self) -> bytes:
+        """Encodes the current state of the world as a keyframe or a delta."""
+        for obj in self.world.removed_objects:
+            if obj in self._ids:
+                self._unregister(obj)
+
+        self._sequence += 1
+        keyframe = self._keyframe_due()
+        if keyframe:
+            self._register_world_objects()
+        frame, self._pending = self._pending, _Frame(0)
+        frame.sequence = self._sequence
+        if keyframe:
+            return self._encode_keyframe(frame)
+
+        self._wake_colliding_objects()
+        self._update_states(list(self._awake), frame)
+        self._history.append(frame)
+
+        # everything which changed since the baseline, in the order of the network ids
+        changed, spawned, removed = set(), set(), set()
+        for past in self._history:
+            changed |= past.changed
+            spawned |= past.spawned
+            removed |= past.removed
+        alive = sorted((changed | spawned) - removed)
+        spawned_objects = [(i, self._objects[i]) for i in sorted(spawned - removed)]
+        return self._pack(
+            DELTA, self._acknowledged, alive, sorted(removed), spawned_objects
+        )
+
+    def _keyframe_due(self) -> bool:
+        if self._acknowledged is None or self._last_keyframe is None:
+            return True
+        if self._sequence - self._last_keyframe >= self.keyframe_interval:
+            return True
+        # the frames after the baseline including this one have to fit into the history
+        return self._sequence - self._acknowledged > self._history.maxlen
+
+    def _register_world_objects(self):
+        # objects added to or removed from the world directly are picked up by keyframes
+        alive = set(self.world.objects)
+        for obj in [obj for obj in self._ids if obj not in alive]:
+            self._unregister(obj)
+        for obj in self.world.objects:
+            if obj not in self._ids:
+                self._register(obj)
+
+    def _encode_keyframe(self, frame: _Frame) -> bytes:
+        objects = self.world.objects
+        self._update_states(objects, frame)
+        self._awake = {obj: 0 for obj in objects if not obj.fixed}
+        self._history.append(frame)
+        self._last_keyframe = self._sequence
+
+        ids = [self._ids[obj] for obj in objects]
+        return self._pack(KEYFRAME, 0, sorted(ids), [], list(zip(ids, objects)))
+
+    def _wake_colliding_objects(self):
+        awake = self._awake
+        if self.world.force_fields:
+            for obj in self.world.objects:
+                if not obj.fixed:
+                    awake[obj] = 0
+        for coll in self.world.collisions:
+            if coll.obj1 in awake and not coll.obj2.fixed:
+                awake[coll.obj2] = 0
+            elif coll.obj2 in awake and not coll.obj1.fixed:
+                awake[coll.obj1] = 0
+
+    def _update_states(self, objects: List[GameObject], frame: _Frame):
+        if not objects:
+            return
+        states = self._quantize(objects).tolist()
+        for obj, state in zip(objects, states):
+            i = self._ids.get(obj)
+            if i is None:
+                # removed from the world while it was awake
+                self._awake.pop(obj, None)
+                continue
+            state = tuple(state)
+            if self._sent.get(i) != state:
+                self._sent[i] = state
+                frame.changed.add(i)
+                if obj in self._awake:
+                    self._awake[obj] = 0
+            elif obj in self._awake:
+                self._awake[obj] += 1
+                if self._awake[obj] >= self.sleep_frames:
+                    del self._awake[obj]
+
+    def _quantize(self, objects: List[GameObject]) -> np.ndarray:
+        values = np.array(
+            [
+                (
+                    obj.pos.x,
+                    obj.pos.y,
+                    obj.angle,
+                    obj.vel.x,
+                    obj.vel.y,
+                    obj.angular_vel,
+                )
+                for obj in objects
+            ],
+            dtype=np.float64,
+        )
+        states = np.rint(values / self.quanta)
+        if not np.all(np.abs(states) < 2**31):
+            raise ValueError("Quantized state does not fit into 32 bits")
+        return states.astype(np.int64)
+
+    def _register(self, obj: GameObject):
+        i = self._next_id
+        self._next_id += 1
+        self._ids[obj] = i
+        self._objects[i] = obj
+        self._pending.spawned.add(i)
+        self._awake[obj] = 0
+
+    def _unregister(self, obj: GameObject):
+        i = self._ids.pop(obj)
+        del self._objects[i]
+        self._sent.pop(i, None)
+        self._awake.pop(obj, None)
+        self._pending.removed.add(i)
+        # objects resting on the removed object start to move
+        margin = Vector(self.quanta[0], self.quanta[1])
+        bbox_min, bbox_max = obj.bbox
+        for other in self.world.query_aabb((bbox_min - margin, bbox_max + margin)):
+            if other in self._ids and not other.fixed:
+                self._awake[other] = 0
+
+    def _pack(
+        self,
+        kind: int,
+        baseline: int,
+        ids: List[int],
+        removed: List[int],
+        spawned: List[Tuple[int, GameObject]],
+    ) -> bytes:
+        states = np.array([self._sent[i] for i in ids], dtype=np.int32).reshape(
+            -1, N_STATE_FIELDS
+        )
+        spawned_data = b"".join(_encode_spawn(i, obj) for i, obj in spawned)
+        return b"".join(
+            (
+                _HEADER.pack(
+                    kind,
+                    self._sequence,
+                    baseline,
+                    len(ids),
+                    len(removed),
+                    len(spawned),
+                ),
+                _QUANTA.pack(*self.quanta.tolist()) if kind == KEYFRAME else b"",
+                np.asarray(ids, dtype="<u4").tobytes(),
+                states.astype("<i4").tobytes(),
+                np.asarray(removed, dtype="<u4").tobytes(),
+                spawned_data,
+            )
+        )
+
+
+class StateDecoder:
+    """Applies the frames of a `StateEncoder` to a mirror world.
+
+    The first frame has to be a keyframe. Frames which are older than the last applied frame are
+    ignored, the sequence number of the last applied frame should be sent back to the encoder as
+    acknowledgement. Keyframes update the known objects and only create the new ones.
+    """
+
+    def __init__(self, world: World):
+        self.world = world
+        self._quanta = None
+        self._objects: Dict[int, GameObject] = {}
+        self._sequence = None
+
+    @property
+    def sequence(self) -> Optional[int]:
+        """Sequence number of the last applied frame."""
+        return self._sequence
+
+    @property
+    def objects(self) -> Dict[int, GameObject]:
+        """The mirrored objects by their network id."""
+        return dict(self._objects)
+
+    def apply(self, data: bytes) -> bool:
+        """Applies a frame, returns False if it was ignored because it is outdated."""
+        kind, sequence, baseline, n_states, n_removed, n_spawned = _HEADER.unpack_from(
+            data
+        )
+        if self._sequence is not None and sequence <= self._sequence:
+            return False
+        if kind == DELTA and (self._sequence is None or baseline > self._sequence):
+            raise ValueError(
+                f"Frame {sequence} is based on frame {baseline} which was not applied"
+            )
+
+        offset = _HEADER.size
+        if kind == KEYFRAME:
+            self._quanta = np.array(_QUANTA.unpack_from(data, offset))
+            offset += _QUANTA.size
+        ids = np.frombuffer(data, "<u4", n_states, offset).tolist()
+        offset += 4 * n_states
+        states = np.frombuffer(data, "<i4", n_states * N_STATE_FIELDS, offset)
+        offset += 4 * n_states * N_STATE_FIELDS
+        removed = np.frombuffer(data, "<u4", n_removed, offset).tolist()
+        offset += 4 * n_removed
+        spawned = []
+        for _ in range(n_spawned):
+            i, obj, offset = _decode_spawn(data, offset, self._objects)
+            spawned.append((i, obj))
+
+        if kind == KEYFRAME:
+            # keyframes contain all objects, the known ones are reused
+            alive = {i for i, _ in spawned}
+            removed = [i for i in self._objects if i not in alive]
+        self.world.remove_objects(
+            [self._objects.pop(i) for i in removed if i in self._objects]
+        )
+        new_objects = [(i, obj) for i, obj in spawned if i not in self._objects]
+        self._objects.update(new_objects)
+        self.world.add_objects([obj for _, obj in new_objects])
+
+        values = (states.reshape(-1, N_STATE_FIELDS) * self._quanta).tolist()
+        for i, (x, y, angle, vx, vy, angular_vel) in zip(ids, values):
+            obj = self._objects[i]
+            obj.pos = Vector(x, y)
+            obj.angle = angle
+            obj.vel = Vector(vx, vy)
+            obj.angular_vel = angular_vel
+
+        self._sequence = sequence
+        return True
+
+
+def _encode_spawn(i: int, obj: GameObject) -> bytes:
+    type_id = next(
+        (SPAWN_TYPES[cls] for cls in type(obj).__mro__ if cls in SPAWN_TYPES), None
+    )
+    if type_id is None:
+        raise ValueError(f"Objects of type {type(obj)} can not be replicated")
+    if type_id == SPAWN_TYPES[Ball]:
+        params = [obj.radius]
+    elif type_id == SPAWN_TYPES[AABox]:
+        params = [2 * obj.half_width, 2 * obj.half_height]
+    elif type_id == SPAWN_TYPES[ConvexPolygon]:
+        params = [c for v in obj.shape.vertices for c in (v.x, v.y)]
+    else:
+        params = [obj.half_length, obj.radius]
+    try:
+        style = json.dumps(obj.style_attributes).encode()
+    except TypeError as e:
+        raise ValueError(f"Style attributes of {obj} are not JSON serializable") from e
+
+    return b"".join(
+        (
+            _SPAWN.pack(
+                i,
+                type_id,
+                len(params),
+                obj.mass,
+                obj.bounciness,
+                obj.fixed,
+                obj.collision_category,
+                obj.collision_mask,
+                obj.collision_group,
+                len(style),
+            ),
+            struct.pack(f"<{len(params)}d", *params),
+            style,
+        )
+    )
+
+
+def _decode_spawn(
+    data: bytes, offset: int, known: Dict[int, GameObject]
+) -> Tuple[int, GameObject, int]:
+    # returns the network id, the object and the offset of the next record, known objects are
+    # returned without decoding the record
+    i, type_id, n_params, mass, bounciness, fixed, category, mask, group, n_style = (
+        _SPAWN.unpack_from(data, offset)
+    )
+    offset += _SPAWN.size
+    end = offset + 8 * n_params + n_style
+    if i in known:
+        return i, known[i], end
+    params = struct.unpack_from(f"<{n_params}d", data, offset)
+    offset += 8 * n_params
+    style = _as_tuples(json.loads(data[offset:end]))
+    offset = end
+
+    attributes = dict(
+        mass=mass,
+        fixed=fixed,
+        style_attributes=style,
+        bounciness=bounciness,
+        collision_category=category,
+        collision_mask=mask,
+        collision_group=group,
+    )
+    origin = Vector(0, 0)
+    if type_id == SPAWN_TYPES[Ball]:
+        obj = Ball(origin, params[0], **attributes)
+    elif type_id == SPAWN_TYPES[AABox]:
+        obj = AABox(origin, params[0], params[1], **attributes)
+    elif type_id == SPAWN_TYPES[ConvexPolygon]:
+        vertices = [Vector(x, y) for x, y in zip(params[::2], params[1::2])]
+        obj = ConvexPolygon(vertices, pos=origin, **attributes)
+    elif type_id == SPAWN_TYPES[Capsule]:
+        obj = Capsule(origin, params[0], params[1], **attributes)
+    else:
+        raise ValueError(f"Unknown shape type {type_id}")
+    return i, obj, offset
+
+
+def _as_tuples(value: Any) -> Any:
+    # JSON has no tuples, colors and other sequences in the style attributes are sent as lists
+    if isinstance(value, list):
+        return tuple(_as_tuples(v) for v in value)
+    if isinstance(value, dict):
+        return {k: _as_tuples(v) for k, v in value.items()}
+    return value
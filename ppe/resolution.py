@@ -0,0 +1,295 @@
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from typing import Collection, Dict, List
+
+import numpy as np
+
+from ppe.collision import Collision, gil_enabled, is_immovable, resolve_collision
+from ppe.vector import Vector
+
+# islands with at least this many contacts are split into batches which can be resolved concurrently
+COLORING_THRESHOLD = 64
+
+
+def resolve_collisions(
+    collisions: List[Collision],
+    iterations: int = 10,
+    immovable: Collection["GameObject"] = (),
+):
+    """Vectorized version of calling `handle_collision` for every collision.
+
+    The positional corrections and restitution impulses of all contacts are computed as arrays
+    and scattered back to the bodies afterwards. A contact whose two bodies have no other contact
+    gives the same positions and velocities as the sequential resolution, up to rounding. A body
+    with a single contact whose partner has other contacts gets a different result, as the
+    velocity of the partner is averaged over all of its contacts.
+
+    Bodies with several simultaneous contacts:
+    - the positional corrections of all contacts are summed, which is also what the sequential
+      resolution does as it does not update the depths of the other contacts either
+    - the contacts are treated as simultaneous, i.e. the result does not depend on their order.
+      The impulses are refined over `iterations` Jacobi iterations, in each of which a body gets
+      the average of the velocity changes of its contacts. Summing them instead would apply the
+      same approaching velocity several times (e.g. a ball hitting two touching balls).
+
+    The immovable objects are treated like fixed objects at rest, see `resolve_collision`.
+    The collision callbacks are not called, see `call_collision_callbacks`.
+    """
+    # gather the contacts and the bodies taking part in them, every body is read only once
+    body_index = {}
+    bodies = []
+    index1, index2 = [], []
+    normals, depths = [], []
+    for coll in collisions:
+        obj1, obj2 = coll.obj1, coll.obj2
+        if is_immovable(obj1, immovable) and is_immovable(obj2, immovable):
+            continue
+        for obj, indices in ((obj1, index1), (obj2, index2)):
+            i = body_index.get(obj)
+            if i is None:
+                i = body_index[obj] = len(bodies)
+                bodies.append(obj)
+            indices.append(i)
+        normals.append((coll.normal.x, coll.normal.y))
+        depths.append(coll.depth)
+
+    if bodies:
+        _resolve(
+            bodies,
+            np.array(index1, dtype=np.intp),
+            np.array(index2, dtype=np.intp),
+            np.array(normals, dtype=np.float64),
+            np.array(depths, dtype=np.float64),
+            iterations,
+            np.array([obj in immovable for obj in bodies], dtype=bool),
+        )
+
+
+def _resolve(
+    bodies: List["GameObject"],
+    index1: np.ndarray,
+    index2: np.ndarray,
+    normals: np.ndarray,
+    depths: np.ndarray,
+    iterations: int,
+    immovable: np.ndarray,
+):
+    n = len(bodies)
+    pos = np.array([obj.pos.to_tuple() for obj in bodies], dtype=np.float64)
+    vel = np.array([obj.vel.to_tuple() for obj in bodies], dtype=np.float64)
+    # fixed objects have an infinite mass, immovable objects are also at rest
+    inv_mass = 1 / np.array([obj.mass for obj in bodies], dtype=np.float64)
+    inv_mass[immovable] = 0
+    vel[immovable] = 0
+    bounciness = np.array([obj.bounciness for obj in bodies], dtype=np.float64)
+    free = inv_mass > 0
+    free1, free2 = free[index1], free[index2]
+
+    # move objects so that they don't overlap anymore, a free object is moved by the full depth
+    # if the other object is fixed and by half of the depth otherwise
+    share1 = np.where(free1, np.where(free2, 0.5, 1), 0)
+    share2 = np.where(free2, np.where(free1, 0.5, 1), 0)
+    correction1 = -normals * (depths * share1)[:, None]
+    correction2 = normals * (depths * share2)[:, None]
+
+    indices = np.concatenate((index1, index2))
+    dpos = scatter_sum(indices, np.concatenate((correction1, correction2)), n)
+
+    # https://en.wikipedia.org/wiki/Collision_response
+    # the relative normal velocity of every contact has to be reversed and scaled by the
+    # bounciness, the impulses achieving this for all contacts at once are found with
+    # Jacobi iterations in which every body gets the average of its velocity changes
+    e = (bounciness[index1] + bounciness[index2]) / 2
+    inv_mass1, inv_mass2 = inv_mass[index1], inv_mass[index2]
+    inv_mass_sum = inv_mass1 + inv_mass2
+    target = -e * np.einsum("cd,cd->c", vel[index1] - vel[index2], normals)
+    relaxation = 1 / np.maximum(np.bincount(indices, minlength=n), 1)[:, None]
+    new_vel = vel.copy()
+    for _ in range(iterations):
+        approach = np.einsum("cd,cd->c", new_vel[index1] - new_vel[index2], normals)
+        impulse = (target - approach) / inv_mass_sum
+        dvel1 = normals * (impulse * inv_mass1)[:, None]
+        dvel2 = -normals * (impulse * inv_mass2)[:, None]
+        new_vel += scatter_sum(indices, np.concatenate((dvel1, dvel2)), n) * relaxation
+
+    # only free bodies are written back, setting the position updates the bounding box
+    new_pos = (pos + dpos).tolist()
+    new_vel = new_vel.tolist()
+    for i in np.flatnonzero(free).tolist():
+        obj = bodies[i]
+        obj.pos = Vector(*new_pos[i])
+        obj.vel = Vector(*new_vel[i])
+
+
+def scatter_sum(indices: np.ndarray, values: np.ndarray, n: int) -> np.ndarray:
+    """Sums the (m, 2) values per index into an (n, 2) array, like np.add.at but faster."""
+    # bincount is a lot faster than np.add.at
+    return np.stack(
+        (
+            np.bincount(indices, weights=values[:, 0], minlength=n),
+            np.bincount(indices, weights=values[:, 1], minlength=n),
+        ),
+        axis=1,
+    )
+
+
+@dataclass
+class ContactGraphStats:
+    n_contacts: int
+    island_sizes: List[int]  # number of contacts per island
+    batch_sizes: List[int]  # number of contacts per batch of the colored islands
+
+    @property
+    def n_islands(self) -> int:
+        return len(self.island_sizes)
+
+    @property
+    def largest_island(self) -> int:
+        return max(self.island_sizes, default=0)
+
+    @property
+    def n_batches(self) -> int:
+        return len(self.batch_sizes)
+
+
+class ContactGraph:
+    """Graph of the contacts of a step in which two contacts are connected if they share a body.
+
+    Contacts which are not connected through any chain of contacts form independent islands which
+    can be resolved concurrently. The contacts of islands with at least `coloring_threshold`
+    contacts are additionally colored such that no two contacts of the same color share a body,
+    all contacts of one color (of all large islands) form a batch which can be resolved
+    concurrently. Fixed and immovable bodies do not connect contacts as they are never modified.
+    Contacts between two such bodies are not part of the graph.
+    """
+
+    def __init__(
+        self,
+        collisions: List[Collision],
+        coloring_threshold: int = COLORING_THRESHOLD,
+        immovable: Collection["GameObject"] = (),
+    ):
+        self.coloring_threshold = coloring_threshold
+        contacts = [
+            coll
+            for coll in collisions
+            if not (
+                is_immovable(coll.obj1, immovable)
+                and is_immovable(coll.obj2, immovable)
+            )
+        ]
+
+        # union find over the free bodies
+        parents: Dict["GameObject", "GameObject"] = {}
+
+        def find(obj):
+            root = parents.setdefault(obj, obj)
+            while root is not parents[root]:
+                root = parents[root]
+            # path compression
+            while obj is not root:
+                parents[obj], obj = root, parents[obj]
+            return root
+
+        for coll in contacts:
+            if not is_immovable(coll.obj1, immovable) and not is_immovable(
+                coll.obj2, immovable
+            ):
+                root1, root2 = find(coll.obj1), find(coll.obj2)
+                if root1 is not root2:
+                    parents[root2] = root1
+
+        # islands are ordered by their first contact and keep the order of their contacts
+        islands: Dict["GameObject", List[Collision]] = {}
+        for coll in contacts:
+            body = coll.obj2 if is_immovable(coll.obj1, immovable) else coll.obj1
+            islands.setdefault(find(body), []).append(coll)
+        self.islands: List[List[Collision]] = list(islands.values())
+
+        self.small_islands: List[List[Collision]] = []
+        large_islands = []
+        for island in self.islands:
+            if len(island) >= coloring_threshold:
+                large_islands.append(island)
+            else:
+                self.small_islands.append(island)
+        self.batches = self._color(
+            [coll for island in large_islands for coll in island], immovable
+        )
+
+        self.stats = ContactGraphStats(
+            n_contacts=len(contacts),
+            island_sizes=[len(island) for island in self.islands],
+            batch_sizes=[len(batch) for batch in self.batches],
+        )
+
+    @staticmethod
+    def _color(
+        contacts: List[Collision], immovable: Collection["GameObject"]
+    ) -> List[List[Collision]]:
+        # greedy coloring, every contact gets the first color none of its free bodies has yet
+        batches: List[List[Collision]] = []
+        colors: Dict["GameObject", set] = {}
+        for coll in contacts:
+            bodies = [
+                obj
+                for obj in (coll.obj1, coll.obj2)
+                if not is_immovable(obj, immovable)
+            ]
+            used = set().union(*(colors.get(obj, ()) for obj in bodies))
+            color = 0
+            while color in used:
+                color += 1
+            if color == len(batches):
+                batches.append([])
+            batches[color].append(coll)
+            for obj in bodies:
+                colors.setdefault(obj, set()).add(color)
+        return batches
+
+
+def resolve_collisions_parallel(
+    collisions: List[Collision],
+    executor: Executor,
+    n_workers: int,
+    coloring_threshold: int = COLORING_THRESHOLD,
+    immovable: Collection["GameObject"] = (),
+) -> ContactGraphStats:
+    """Resolves the collisions like `resolve_collision` with the contacts distributed over workers.
+
+    The small islands of the contact graph are resolved in the order of their contacts, which
+    gives the same result as the sequential resolution. The batches of the large islands are
+    resolved one after another, so contacts of large islands are resolved in a different order
+    than sequentially. Moving the objects must not modify shared state, see
+    `SpatialHash.deferred_updates`. The immovable objects are treated like fixed objects at rest.
+    The collision callbacks are not called. With the GIL the parts are resolved in the calling
+    thread in the same order, threads would only add overhead.
+    """
+    graph = ContactGraph(collisions, coloring_threshold, immovable)
+
+    def resolve(contacts):
+        for coll in contacts:
+            resolve_collision(coll, immovable)
+
+    map_parts = map if executor is None or gil_enabled() else executor.map
+    # the small islands are independent of each other and of the large islands
+    list(map_parts(resolve, _partition(graph.small_islands, n_workers)))
+    for batch in graph.batches:
+        list(map_parts(resolve, _partition([[coll] for coll in batch], n_workers)))
+
+    return graph.stats
+
+
+def _partition(groups: List[List[Collision]], n_parts: int) -> List[List[Collision]]:
+    # concatenates consecutive groups to about n_parts parts of similar size, groups are not split
+    total = sum(len(group) for group in groups)
+    target = max(-(-total // max(n_parts, 1)), 1)
+    parts, part = [], []
+    for group in groups:
+        part.extend(group)
+        if len(part) >= target:
+            parts.append(part)
+            part = []
+    if part:
+        parts.append(part)
+    return parts
@@ -0,0 +1,170 @@
+from dataclasses import dataclass
+from typing import Tuple
+
+import numpy as np
+
+from ppe.vector import Vector
+
+
+@dataclass
+class PolygonArrays:
+    """Validated geometry of many convex polygons whose vertices are stored in one pool.
+
+    The vertices of polygon i are `vertices[offsets[i]:offsets[i + 1]]` and are anticlockwise.
+    """
+
+    vertices: np.ndarray  # (n_vertices, 2)
+    offsets: np.ndarray  # (n_polygons + 1,)
+    normals: (
+        np.ndarray
+    )  # (n_vertices, 2), outward normal of the edge starting at each vertex
+    centers: np.ndarray  # (n_polygons, 2), center of mass
+    areas: np.ndarray  # (n_polygons,)
+    bbox_min: np.ndarray  # (n_polygons, 2)
+    bbox_max: np.ndarray  # (n_polygons, 2)
+
+
+def _next_vertex(offsets: np.ndarray) -> np.ndarray:
+    # index of the following vertex of every vertex in the pool, wrapping around within each polygon
+    next_vertex = np.arange(1, offsets[-1] + 1)
+    next_vertex[offsets[1:] - 1] = offsets[:-1]
+    return next_vertex
+
+
+def validate_polygons(vertices: np.ndarray, offsets: np.ndarray) -> PolygonArrays:
+    """Vectorized version of the checks and computations done in `PolygonShape.__init__`.
+
+    Raises a ValueError if any polygon is not convex. Clockwise polygons are reversed.
+    """
+    vertices = np.array(vertices, dtype=np.float64).reshape(-1, 2)
+    offsets = np.asarray(offsets, dtype=np.intp)
+    counts = np.diff(offsets)
+    if offsets[0] != 0 or offsets[-1] != len(vertices):
+        raise ValueError("Offsets must start at 0 and end at the number of vertices")
+    if np.any(counts < 3):
+        raise ValueError("Polygons must have at least 3 vertices")
+
+    starts = offsets[:-1]
+    polygon_of_vertex = np.repeat(np.arange(len(counts)), counts)
+
+    # same criterion as ConvexPolygon._is_convex: all turns must have the same direction
+    next_vertex = _next_vertex(offsets)
+    edges = vertices[next_vertex] - vertices
+    next_edges = edges[next_vertex]
+    left_turns = (edges[:, 0] * next_edges[:, 1] - edges[:, 1] * next_edges[:, 0]) > 0
+    n_left_turns = np.add.reduceat(left_turns.astype(np.intp), starts)
+    convex = (n_left_turns == 0) | (n_left_turns == counts)
+    if not np.all(convex):
+        raise ValueError(f"Polygons {np.flatnonzero(~convex).tolist()} are not convex")
+
+    # reverse the vertices of clockwise polygons
+    cross = (
+        vertices[:, 0] * vertices[next_vertex, 1]
+        - vertices[:, 1] * vertices[next_vertex, 0]
+    )
+    clockwise = np.add.reduceat(cross, starts) < 0
+    reverse = clockwise[polygon_of_vertex]
+    if np.any(reverse):
+        source = np.arange(len(vertices))
+        source[reverse] = (
+            starts[polygon_of_vertex] + offsets[1:][polygon_of_vertex] - 1 - source
+        )[reverse]
+        vertices = vertices[source]
+        cross = (
+            vertices[:, 0] * vertices[next_vertex, 1]
+            - vertices[:, 1] * vertices[next_vertex, 0]
+        )
+
+    # https://en.wikipedia.org/wiki/Centroid#Of_a_polygon
+    double_areas = np.add.reduceat(cross, starts)
+    centers = np.stack(
+        (
+            np.add.reduceat(
+                (vertices[:, 0] + vertices[next_vertex, 0]) * cross, starts
+            ),
+            np.add.reduceat(
+                (vertices[:, 1] + vertices[next_vertex, 1]) * cross, starts
+            ),
+        ),
+        axis=1,
+    ) / (3 * double_areas[:, None])
+
+    edges = vertices[next_vertex] - vertices
+    normals = np.stack((edges[:, 1], -edges[:, 0]), axis=1)
+    normals /= np.linalg.norm(normals, axis=1, keepdims=True)
+
+    return PolygonArrays(
+        vertices=vertices,
+        offsets=offsets,
+        normals=normals,
+        centers=centers,
+        areas=double_areas / 2,
+        bbox_min=np.minimum.reduceat(vertices, starts),
+        bbox_max=np.maximum.reduceat(vertices, starts),
+    )
+
+
+def random_balls(
+    n: int,
+    pos_bounds: Tuple[Vector, Vector],
+    radius_bounds: Tuple[float, float],
+    seed: int = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Vectorized version of `Ball.create_random`, returns the positions and radii for `World.add_balls`."""
+    rng = np.random.default_rng(seed)
+    positions = rng.uniform(
+        pos_bounds[0].to_tuple(), pos_bounds[1].to_tuple(), size=(n, 2)
+    )
+    radii = rng.uniform(*radius_bounds, size=n)
+    return positions, radii
+
+
+def random_polygons(
+    n: int,
+    pos_bounds: Tuple[Vector, Vector],
+    extend_bounds: Tuple[float, float],
+    n_vertices_bounds: Tuple[int, int],
+    seed: int = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Vectorized version of `ConvexPolygon.create_random`.
+
+    Returns the vertex pool and the offsets for `World.add_polygons`.
+    """
+    rng = np.random.default_rng(seed)
+    counts = rng.integers(n_vertices_bounds[0], n_vertices_bounds[1] + 1, size=n)
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+    polygon_of_vertex = np.repeat(np.arange(n), counts)
+    index_in_polygon = np.arange(offsets[-1]) - offsets[:-1][polygon_of_vertex]
+
+    ellipse_a = rng.uniform(*extend_bounds, size=n) / 2
+    ellipse_b = rng.uniform(*extend_bounds, size=n) / 2
+
+    # distribute the vertices uniformly on the ellipse with a small random perturbation
+    delta_t = 2 * np.pi / counts[polygon_of_vertex]
+    ts = index_in_polygon * delta_t
+    ts += rng.uniform(-0.5, 0.5, size=len(ts)) * delta_t
+    local = np.stack(
+        (
+            ellipse_a[polygon_of_vertex] * np.cos(ts),
+            ellipse_b[polygon_of_vertex] * np.sin(ts),
+        ),
+        axis=1,
+    )
+
+    # rotate around the ellipse center and move it to a random position, the ellipse center
+    # is used instead of the center of mass as it does not need to be computed
+    angles = rng.uniform(0, 2 * np.pi, size=n)[polygon_of_vertex]
+    positions = rng.uniform(
+        pos_bounds[0].to_tuple(), pos_bounds[1].to_tuple(), size=(n, 2)
+    )
+    cos, sin = np.cos(angles), np.sin(angles)
+    vertices = np.stack(
+        (
+            local[:, 0] * cos - local[:, 1] * sin,
+            local[:, 0] * sin + local[:, 1] * cos,
+        ),
+        axis=1,
+    )
+    vertices += positions[polygon_of_vertex]
+
+    return vertices, offsets
@@ -0,0 +1,173 @@
+from typing import List, Tuple
+import math
+
+from ppe.vector import Vector
+
+
+def is_convex(vertices: List[Vector]) -> bool:
+    n = len(vertices)
+    vertex_signs = []
+    for i in range(n):
+        p1 = vertices[i]
+        p2 = vertices[(i + 1) % n]
+        p3 = vertices[(i + 2) % n]
+        edge1 = p2 - p1
+        edge2 = p3 - p2
+
+        vertex_signs.append(edge1.cross(edge2) > 0)
+
+    return all(vertex_signs) or not any(vertex_signs)
+
+
+def is_anticlockwise(vertices: List[Vector]) -> bool:
+    n = len(vertices)
+    total = 0
+    for i in range(n):
+        j = (i + 1) % n
+        total += (vertices[j].x - vertices[i].x) * (vertices[j].y + vertices[i].y)
+    return total < 0
+
+
+def center_of_mass(vertices: List[Vector]) -> Tuple[Vector, float]:
+    # https://en.wikipedia.org/wiki/Centroid#Of_a_polygon
+    # returns the center of mass and the signed area
+    n = len(vertices)
+    cx = 0
+    cy = 0
+    area = 0
+    for i in range(n):
+        j = (i + 1) % n
+        factor = vertices[i].cross(vertices[j])
+        cx += (vertices[i].x + vertices[j].x) * factor
+        cy += (vertices[i].y + vertices[j].y) * factor
+        area += factor
+    return Vector(cx, cy) / (3 * area), area / 2
+
+
+class PolygonShape:
+    """Immutable geometry of a convex polygon which can be shared by many `ConvexPolygon` objects.
+
+    The vertices are stored anticlockwise relative to the center of mass, the objects referencing
+    the shape only store their position (of the center of mass) and angle.
+    """
+
+    __slots__ = (
+        "_vertices",
+        "_normals",
+        "_area",
+        "_centroid",
+        "_bounding_radius",
+        "_local_bbox",
+        # shapes are shared through weak references, see ChunkedWorld
+        "__weakref__",
+    )
+
+    def __init__(self, vertices: List[Vector]):
+        assert len(vertices) >= 3
+
+        if not is_convex(vertices):
+            raise ValueError("Polygon is not convex")
+
+        if not is_anticlockwise(vertices):
+            vertices = list(reversed(vertices))
+
+        centroid, area = center_of_mass(vertices)
+
+        # the normals are computed from the given vertices as the edges are not affected by
+        # the translation to the center of mass, this avoids additional rounding errors
+        normals = []
+        for i, p1 in enumerate(vertices):
+            edge = vertices[(i + 1) % len(vertices)] - p1
+            normals.append(Vector(edge.y, -edge.x).normalize())
+
+        self._init(
+            tuple(v - centroid for v in vertices), tuple(normals), area, centroid
+        )
+
+    def _init(
+        self,
+        vertices: Tuple[Vector, ...],
+        normals: Tuple[Vector, ...],
+        area: float,
+        centroid: Vector,
+    ):
+        self._vertices = vertices
+        self._normals = normals
+        self._area = area
+        self._centroid = centroid
+        self._bounding_radius = max(v.magnitude() for v in vertices)
+        xs = [v.x for v in vertices]
+        ys = [v.y for v in vertices]
+        self._local_bbox = (Vector(min(xs), min(ys)), Vector(max(xs), max(ys)))
+
+    @classmethod
+    def _create_precomputed(
+        cls,
+        vertices: Tuple[Vector, ...],
+        normals: Tuple[Vector, ...],
+        area: float,
+        centroid: Vector,
+    ) -> "PolygonShape":
+        # creates a shape from already validated local vertices (see World.add_polygons)
+        shape = cls.__new__(cls)
+        shape._init(vertices, normals, area, centroid)
+        return shape
+
+    @property
+    def vertices(self) -> Tuple[Vector, ...]:
+        # relative to the center of mass
+        return self._vertices
+
+    @property
+    def normals(self) -> Tuple[Vector, ...]:
+        # outward pointing normal of the edge from vertex i to vertex i + 1
+        return self._normals
+
+    @property
+    def area(self) -> float:
+        return self._area
+
+    @property
+    def centroid(self) -> Vector:
+        # center of mass in the coordinates the shape was defined in
+        return self._centroid
+
+    @property
+    def bounding_radius(self) -> float:
+        return self._bounding_radius
+
+    def __repr__(self) -> str:
+        return f"PolygonShape(n_vertices={len(self._vertices)}, area={self._area})"
+
+    def transformed_vertices(self, pos: Vector, angle: float) -> List[Vector]:
+        if angle == 0:
+            return [v + pos for v in self._vertices]
+
+        cos, sin = math.cos(angle), math.sin(angle)
+        px, py = pos.x, pos.y
+        return [
+            Vector(v.x * cos - v.y * sin + px, v.x * sin + v.y * cos + py)
+            for v in self._vertices
+        ]
+
+    def transformed_normals(self, angle: float) -> List[Vector]:
+        if angle == 0:
+            return list(self._normals)
+
+        cos, sin = math.cos(angle), math.sin(angle)
+        return [
+            Vector(n.x * cos - n.y * sin, n.x * sin + n.y * cos) for n in self._normals
+        ]
+
+    def transformed_bbox(self, pos: Vector, angle: float) -> Tuple[Vector, Vector]:
+        if angle == 0:
+            return self._local_bbox[0] + pos, self._local_bbox[1] + pos
+
+        # computed with plain floats to avoid creating the transformed vertices
+        cos, sin = math.cos(angle), math.sin(angle)
+        xs = [v.x * cos - v.y * sin for v in self._vertices]
+        ys = [v.x * sin + v.y * cos for v in self._vertices]
+        return (
+            Vector(min(xs) + pos.x, min(ys) + pos.y),
+            Vector(max(xs) + pos.x, max(ys) + pos.y),
+        )
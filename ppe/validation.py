@@ -0,0 +1,221 @@
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+import copy
+
+from ppe import collision as collision_module
+from ppe.collision import Collision, get_collisions, handle_collision, point_in_box
+from ppe.objects import GameObject
+from ppe.vector import Vector
+from ppe.world import World
+
+Pair = Tuple[int, int]  # indices of the objects in the scene, the smaller one first
+
+
+@dataclass
+class Tolerances:
+    position: float = 1e-9
+    velocity: float = 1e-9
+    angle: float = 1e-9
+    depth: float = 1e-9
+    normal: float = 1e-9
+
+
+@dataclass
+class Divergence:
+    step: int  # 1 for the first step
+    kind: str  # "objects", "collisions", "depth", "normal", "position", "velocity" or "angle"
+    objects: Tuple[int, ...]  # indices of the objects in the scene
+    reference: Any
+    accelerated: Any
+
+    def __str__(self) -> str:
+        return (
+            f"Step {self.step}: {self.kind} of objects {self.objects} differ, "
+            f"reference: {self.reference}, accelerated: {self.accelerated}"
+        )
+
+
+@dataclass
+class ValidationReport:
+    n_steps: int  # number of steps which matched
+    divergence: Optional[Divergence]
+    # largest difference of every quantity over all matching steps
+    max_errors: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return self.divergence is None
+
+
+@contextmanager
+def polygon_narrow_phase(method: str):
+    """Temporarily uses the given narrow phase for all pairs of polygons."""
+    previous = collision_module.POLYGON_NARROW_PHASE
+    collision_module.POLYGON_NARROW_PHASE = method
+    try:
+        yield
+    finally:
+        collision_module.POLYGON_NARROW_PHASE = previous
+
+
+def reference_step(
+    objects: List[GameObject], dt: float, world_bbox: Tuple[Vector, Vector] = None
+) -> Tuple[List[Collision], List[GameObject]]:
+    """Steps the objects with the plain scalar pipeline the accelerated paths are compared to.
+
+    All objects are moved with `GameObject.update`, all pairs of objects are tested with SAT
+    for polygons and the collisions are resolved one after another with `handle_collision`.
+    Objects leaving the world bounding box are removed from the list. Returns the collisions and
+    the removed objects.
+    """
+    for obj in objects:
+        obj.update(dt)
+    with polygon_narrow_phase("sat"):
+        collisions = get_collisions(objects)
+    for coll in collisions:
+        handle_collision(coll)
+
+    removed = []
+    if world_bbox:
+        removed = [obj for obj in objects if not point_in_box(obj.pos, world_bbox)]
+        removed_set = set(removed)
+        objects[:] = [obj for obj in objects if obj not in removed_set]
+    return collisions, removed
+
+
+def validate(
+    objects: List[GameObject],
+    n_steps: int,
+    dt: float,
+    world_bbox: Tuple[Vector, Vector] = None,
+    narrow_phase: str = None,
+    tolerances: Tolerances = Tolerances(),
+    **world_kwargs,
+) -> ValidationReport:
+    """Steps copies of the scene with `reference_step` and with a `World` and compares them.
+
+    The world is created with the given keyword arguments (e.g. solver="batch") and the polygon
+    narrow phase defaults to POLYGON_NARROW_PHASE. After every step the removed objects, the set
+    of colliding pairs, their depths and normals and the positions, velocities and angles of all
+    objects are compared. Pairs which only touch within the depth tolerance may be missing on
+    either side. The comparison stops at the first difference exceeding the tolerances.
+    The given objects are not modified.
+    """
+    reference_objects = copy.deepcopy(objects)
+    accelerated_objects = copy.deepcopy(objects)
+    reference_index = {obj: i for i, obj in enumerate(reference_objects)}
+    accelerated_index = {obj: i for i, obj in enumerate(accelerated_objects)}
+    max_errors = {
+        kind: 0.0 for kind in ("depth", "normal", "position", "velocity", "angle")
+    }
+
+    with World(list(accelerated_objects), world_bbox, **world_kwargs) as world:
+        for step in range(1, n_steps + 1):
+            collisions, removed = reference_step(reference_objects, dt, world_bbox)
+            with polygon_narrow_phase(
+                narrow_phase or collision_module.POLYGON_NARROW_PHASE
+            ):
+                world.update(dt)
+
+            divergence = _compare_removed(
+                step,
+                sorted(reference_index[obj] for obj in removed),
+                sorted(accelerated_index[obj] for obj in world.removed_objects),
+            )
+            divergence = divergence or _compare_collisions(
+                step,
+                _contacts(collisions, reference_index),
+                _contacts(world.collisions, accelerated_index),
+                tolerances,
+                max_errors,
+            )
+            divergence = divergence or _compare_poses(
+                step,
+                reference_objects,
+                [
+                    accelerated_objects[reference_index[obj]]
+                    for obj in reference_objects
+                ],
+                [reference_index[obj] for obj in reference_objects],
+                tolerances,
+                max_errors,
+            )
+            if divergence is not None:
+                return ValidationReport(step - 1, divergence, max_errors)
+
+    return ValidationReport(n_steps, None, max_errors)
+
+
+def _contacts(
+    collisions: List[Collision], index: Dict[GameObject, int]
+) -> Dict[Pair, Tuple[Vector, float]]:
+    # normal pointing from the object with the smaller index to the other object and depth
+    contacts = {}
+    for coll in collisions:
+        i, j = index[coll.obj1], index[coll.obj2]
+        if i < j:
+            contacts[(i, j)] = (coll.normal, coll.depth)
+        else:
+            contacts[(j, i)] = (-coll.normal, coll.depth)
+    return contacts
+
+
+def _compare_removed(
+    step: int, reference: List[int], accelerated: List[int]
+) -> Optional[Divergence]:
+    if reference == accelerated:
+        return None
+    differing = tuple(sorted(set(reference) ^ set(accelerated)))
+    return Divergence(step, "objects", differing, reference, accelerated)
+
+
+def _compare_collisions(
+    step: int,
+    reference: Dict[Pair, Tuple[Vector, float]],
+    accelerated: Dict[Pair, Tuple[Vector, float]],
+    tolerances: Tolerances,
+    max_errors: Dict[str, float],
+) -> Optional[Divergence]:
+    for pair in sorted(reference.keys() | accelerated.keys()):
+        if pair not in accelerated or pair not in reference:
+            contact = reference.get(pair) or accelerated.get(pair)
+            if contact[1] <= tolerances.depth:
+                continue
+            return Divergence(
+                step, "collisions", pair, reference.get(pair), accelerated.get(pair)
+            )
+
+        reference_normal, reference_depth = reference[pair]
+        accelerated_normal, accelerated_depth = accelerated[pair]
+        depth_error = abs(reference_depth - accelerated_depth)
+        normal_error = (reference_normal - accelerated_normal).magnitude()
+        if depth_error > tolerances.depth:
+            return Divergence(step, "depth", pair, reference_depth, accelerated_depth)
+        if normal_error > tolerances.normal:
+            return Divergence(
+                step, "normal", pair, reference_normal, accelerated_normal
+            )
+        max_errors["depth"] = max(max_errors["depth"], depth_error)
+        max_errors["normal"] = max(max_errors["normal"], normal_error)
+    return None
+
+
+def _compare_poses(
+    step: int,
+    reference: List[GameObject],
+    accelerated: List[GameObject],
+    indices: List[int],
+    tolerances: Tolerances,
+    max_errors: Dict[str, float],
+) -> Optional[Divergence]:
+    for i, obj1, obj2 in zip(indices, reference, accelerated):
+        for kind, value1, value2, error in (
+            ("position", obj1.pos, obj2.pos, (obj1.pos - obj2.pos).magnitude()),
+            ("velocity", obj1.vel, obj2.vel, (obj1.vel - obj2.vel).magnitude()),
+            ("angle", obj1.angle, obj2.angle, abs(obj1.angle - obj2.angle)),
+        ):
+            if error > getattr(tolerances, kind):
+                return Divergence(step, kind, (i,), value1, value2)
+            max_errors[kind] = max(max_errors[kind], error)
+    return None
@@ -3,6 +3,9 @@ from typing import Tuple
 
 
 class Vector:
+    # vectors are the most frequently allocated objects, so they do not have an instance __dict__
+    __slots__ = ("_x", "_y")
+
     def __init__(self, x, y):
         self._x = x
         self._y = y
@@ -1,9 +1,13 @@
 from abc import ABC, abstractmethod
+from typing import Iterable, Dict, Any, Tuple
+import os
+import math
 
+import numpy as np
 import pygame
 
 from ppe.world import World
-from ppe.objects import Ball, ConvexPolygon
+from ppe.objects import Ball, Capsule, ConvexPolygon
 from ppe.vector import Vector
 
 
@@ -20,14 +24,38 @@ class Visualizer(ABC):
     def draw_polygon(self, polygon: ConvexPolygon):
         raise NotImplementedError()
 
+    def draw_capsule(self, capsule: Capsule):
+        # fallback for visualizers without a capsule method: draw the primitives of the capsule
+        style = capsule.style_attributes
+        circles, polygons = capsule.primitives()
+        for vertices in polygons:
+            self.draw_polygon(ConvexPolygon(vertices, style_attributes=style))
+        for pos, radius in circles:
+            self.draw_ball(Ball(pos, radius, style_attributes=style))
+
+    # names of the draw methods per object type, subclasses of the types use the same method
+    # unless they are registered themselves, see register_draw_method
+    draw_methods: Dict[type, str] = {
+        Ball: "draw_ball",
+        ConvexPolygon: "draw_polygon",
+        Capsule: "draw_capsule",
+    }
+
+    @classmethod
+    def register_draw_method(cls, object_type: type, method_name: str):
+        cls.draw_methods = {**cls.draw_methods, object_type: method_name}
+
     def draw(self, world: World):
         for obj in world.objects:
-            if isinstance(obj, Ball):
-                self.draw_ball(obj)
-            elif isinstance(obj, ConvexPolygon):
-                self.draw_polygon(obj)
-            else:
-                raise ValueError(f"Unknown object type {type(obj)}")
+            self.draw_object(obj)
+
+    def draw_object(self, obj):
+        for object_type in type(obj).__mro__:
+            method_name = self.draw_methods.get(object_type)
+            if method_name is not None:
+                getattr(self, method_name)(obj)
+                return
+        raise ValueError(f"Unknown object type {type(obj)}")
 
     @abstractmethod
     def pixel_2_world_coord(self, pos: Vector) -> Vector:
@@ -76,3 +104,206 @@ class PyGameVisualizer(Visualizer):
             polygon.style_attributes["color"],
             [self.world_2_pixel_coord(v).to_tuple() for v in polygon.vertices],
         )
+
+    def draw_capsule(self, capsule: Capsule):
+        color = capsule.style_attributes["color"]
+        _, [rectangle] = capsule.primitives()
+        pygame.draw.polygon(
+            self.screen,
+            color,
+            [self.world_2_pixel_coord(v).to_tuple() for v in rectangle],
+        )
+        for end in capsule.ends:
+            pygame.draw.circle(
+                self.screen,
+                color,
+                self.world_2_pixel_coord(end).to_tuple(),
+                capsule.radius * self.scale,
+            )
+
+
+class NumpyVisualizer(Visualizer):
+    """Rasterizes the world into a NumPy RGB image buffer without needing a display.
+
+    The image is stored in `self.image` with shape (height, width, 3) and dtype uint8. Pixels are
+    filled if their center lies inside a shape, i.e. there is no anti-aliasing.
+    """
+
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        scale: float = 100,
+        viewport_offset: Vector = None,
+        background_color: Any = (255, 255, 255),
+    ):
+        super().__init__(scale, viewport_offset)
+        self.width = width
+        self.height = height
+        self.background_color = background_color
+        self.image = np.empty((height, width, 3), dtype=np.uint8)
+
+        # pixel center coordinates, sliced to the bounding window of each shape when drawing
+        self._xs = np.arange(width, dtype=np.float64) + 0.5
+        self._ys = np.arange(height, dtype=np.float64) + 0.5
+        self._colors: Dict[Any, Tuple[int, int, int]] = {}
+        self._background = None
+        self._background_color = None
+
+        self.clear()
+
+    def world_2_pixel_coord(self, pos: Vector) -> Vector:
+        pos = pos - self.viewport_offset
+        pos = pos * self.scale
+        pos = Vector(pos.x, self.height - pos.y)  # flip y axis
+
+        return pos
+
+    def pixel_2_world_coord(self, pos: Vector) -> Vector:
+        pos = Vector(pos.x, self.height - pos.y)
+        pos = pos / self.scale
+        pos = pos + self.viewport_offset
+
+        return pos
+
+    def _rgb(self, color: Any) -> Tuple[int, int, int]:
+        # colors can be given in every format pygame understands (tuples, names, hex strings)
+        key = color if isinstance(color, (str, tuple)) else tuple(color)
+        rgb = self._colors.get(key)
+        if rgb is None:
+            rgb = tuple(pygame.Color(color))[:3]
+            self._colors[key] = rgb
+        return rgb
+
+    def _window(
+        self, x_min: float, x_max: float, y_min: float, y_max: float
+    ) -> Tuple[int, int, int, int]:
+        # rows and columns whose pixel centers can lie within the given pixel space bounds
+        c0 = max(math.floor(x_min), 0)
+        c1 = min(math.ceil(x_max) + 1, self.width)
+        r0 = max(math.floor(y_min), 0)
+        r1 = min(math.ceil(y_max) + 1, self.height)
+        return r0, r1, c0, c1
+
+    def clear(self):
+        # the background is cached as a full image as copying it is much faster than broadcasting a color
+        if self._background is None or self._background_color != self.background_color:
+            self._background = np.empty_like(self.image)
+            self._background[:] = self._rgb(self.background_color)
+            self._background_color = self.background_color
+        np.copyto(self.image, self._background)
+
+    def draw_ball(self, ball: Ball):
+        cx = (ball.pos.x - self.viewport_offset.x) * self.scale
+        cy = self.height - (ball.pos.y - self.viewport_offset.y) * self.scale
+        radius = ball.radius * self.scale
+        r0, r1, c0, c1 = self._window(
+            cx - radius, cx + radius, cy - radius, cy + radius
+        )
+        if r0 >= r1 or c0 >= c1:
+            return
+
+        dx = self._xs[c0:c1] - cx
+        dy = self._ys[r0:r1] - cy
+        mask = dy[:, None] ** 2 + dx[None, :] ** 2 <= radius**2
+        self.image[r0:r1, c0:c1][mask] = self._rgb(ball.style_attributes["color"])
+
+    def draw_polygon(self, polygon: ConvexPolygon):
+        # same transformation as world_2_pixel_coord but for all vertices at once
+        points = np.array([v.to_tuple() for v in polygon.vertices])
+        points -= self.viewport_offset.to_tuple()
+        points *= self.scale
+        points[:, 1] = self.height - points[:, 1]
+
+        bbox_min, bbox_max = polygon.bbox
+        r0, r1, c0, c1 = self._window(
+            (bbox_min.x - self.viewport_offset.x) * self.scale,
+            (bbox_max.x - self.viewport_offset.x) * self.scale,
+            self.height - (bbox_max.y - self.viewport_offset.y) * self.scale,
+            self.height - (bbox_min.y - self.viewport_offset.y) * self.scale,
+        )
+        if r0 >= r1 or c0 >= c1:
+            return
+
+        # the vertices are anticlockwise in world coordinates and therefore clockwise in pixel
+        # coordinates (flipped y axis), so inside points are on the left of every edge in the y-down frame
+        edges = np.concatenate((points[1:], points[:1])) - points
+        dx = self._xs[c0:c1][None, None, :] - points[:, 0, None, None]
+        dy = self._ys[r0:r1][None, :, None] - points[:, 1, None, None]
+        cross = edges[:, 0, None, None] * dy - edges[:, 1, None, None] * dx
+        mask = np.all(cross <= 0, axis=0)
+        self.image[r0:r1, c0:c1][mask] = self._rgb(polygon.style_attributes["color"])
+
+    def draw_capsule(self, capsule: Capsule):
+        # pixels whose distance to the axis of the capsule is at most the radius
+        start, end = capsule.ends
+        start = np.array(self.world_2_pixel_coord(start).to_tuple())
+        end = np.array(self.world_2_pixel_coord(end).to_tuple())
+        radius = capsule.radius * self.scale
+        r0, r1, c0, c1 = self._window(
+            min(start[0], end[0]) - radius,
+            max(start[0], end[0]) + radius,
+            min(start[1], end[1]) - radius,
+            max(start[1], end[1]) + radius,
+        )
+        if r0 >= r1 or c0 >= c1:
+            return
+
+        axis = end - start
+        length2 = max(axis.dot(axis), 1e-12)
+        dx = self._xs[c0:c1][None, :] - start[0]
+        dy = self._ys[r0:r1][:, None] - start[1]
+        t = np.clip((dx * axis[0] + dy * axis[1]) / length2, 0, 1)
+        mask = (dx - t * axis[0]) ** 2 + (dy - t * axis[1]) ** 2 <= radius**2
+        self.image[r0:r1, c0:c1][mask] = self._rgb(capsule.style_attributes["color"])
+
+    def render(self, world: World) -> np.ndarray:
+        self.clear()
+        self.draw(world)
+        return self.image
+
+    def render_frames(self, frames: Iterable[World], out: np.ndarray) -> int:
+        """Renders each frame into consecutive entries of `out` which has shape (n, height, width, 3).
+
+        `frames` is usually a generator which steps a world and yields it after every recorded step.
+        Rendering stops when either the frames or the output array is exhausted. Returns the number
+        of rendered frames.
+        """
+        n_frames = 0
+        for world, frame in zip(frames, out):
+            self.render(world)
+            frame[:] = self.image
+            n_frames += 1
+
+        return n_frames
+
+    def render_to_memmap(
+        self, frames: Iterable[World], path: str, n_frames: int
+    ) -> np.memmap:
+        """Renders up to `n_frames` frames into a memory mapped .npy file which can be loaded with np.load."""
+        out = np.lib.format.open_memmap(
+            path,
+            mode="w+",
+            dtype=np.uint8,
+            shape=(n_frames, self.height, self.width, 3),
+        )
+        self.render_frames(frames, out)
+        out.flush()
+
+        return out
+
+    def render_to_image_sequence(
+        self, frames: Iterable[World], directory: str, pattern: str = "frame_{:06d}.png"
+    ) -> int:
+        """Renders every frame into an image file. The image format is derived from the file extension."""
+        os.makedirs(directory, exist_ok=True)
+
+        n_frames = 0
+        for i, world in enumerate(frames):
+            self.render(world)
+            # pygame surfaces are indexed by (x, y) while the image is indexed by (row, column)
+            surface = pygame.surfarray.make_surface(self.image.swapaxes(0, 1))
+            pygame.image.save(surface, os.path.join(directory, pattern.format(i)))
+            n_frames += 1
+
+        return n_frames
@@ -1,34 +1,806 @@
-from typing import List, Tuple
+from typing import List, Tuple, Dict, Any, Callable
+import heapq
+import math
+import gc
+import os
+import copy
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
 
-from ppe.objects import GameObject
-from ppe.collision import get_collisions, handle_collision, point_in_box
+import numpy as np
+
+from ppe.objects import GameObject, Ball, ConvexPolygon
+from ppe.collision import (
+    get_collisions,
+    handle_collision,
+    call_collision_callbacks,
+    should_collide,
+    point_in_box,
+    gil_enabled,
+    DEFAULT_CATEGORY,
+    ALL_CATEGORIES,
+)
+from ppe.broadphase import SpatialHash
+from ppe.forces import ForceField
+from ppe.raycast import pack_shapes, cast
+from ppe.resolution import (
+    resolve_collisions,
+    resolve_collisions_parallel,
+    ContactGraphStats,
+)
+from ppe.scene import validate_polygons
+from ppe.shapes import PolygonShape
 from ppe.vector import Vector
 
+SOLVERS = ("sequential", "batch", "parallel")
+# fields which can be recorded by World.step_many
+RECORD_FIELDS = ("positions", "velocities", "angles", "contact_counts")
+
+
+@dataclass
+class Prediction:
+    """Predicted trajectory of a single object, see `World.predict`."""
+
+    positions: np.ndarray  # (n_steps + 1, 2), including the start position
+    velocities: np.ndarray  # (n_steps + 1, 2)
+    # one entry per contact
+    contact_steps: np.ndarray  # (n_contacts,), index of the step (1 for the first step)
+    contact_objects: (
+        np.ndarray
+    )  # (n_contacts,), index of the hit object in World.objects
+    contact_normals: (
+        np.ndarray
+    )  # (n_contacts, 2), direction in which the object was pushed
+
 
 class World:
     def __init__(
-        self, objects: List[GameObject], world_bbox: Tuple[Vector, Vector] = None
+        self,
+        objects: List[GameObject],
+        world_bbox: Tuple[Vector, Vector] = None,
+        cell_size: float = 1,
+        solver: str = "sequential",
+        solver_iterations: int = 10,
+        n_workers: int = None,
+        force_fields: List[ForceField] = None,
+        threaded_narrow_phase: bool = False,
     ):
+        # "sequential" resolves the collisions one after another with handle_collision,
+        # "batch" resolves all collisions of a step at once with resolve_collisions and
+        # "parallel" resolves independent collisions concurrently with resolve_collisions_parallel
+        # on free-threaded builds of Python and like "sequential" with the GIL
+        if solver not in SOLVERS:
+            raise ValueError(f"Unknown solver {solver}, expected one of {SOLVERS}")
+        self.solver = solver
+        self.solver_iterations = solver_iterations
+        self.n_workers = n_workers or os.cpu_count() or 1
+        # tests the candidate pairs of a step with n_workers threads, only used by free-threaded
+        # builds of Python, with the GIL the threads would only add overhead
+        self.threaded_narrow_phase = threaded_narrow_phase
+        # accelerations which are added to the acceleration of the objects in every update
+        self.force_fields = list(force_fields or [])
+        self._executor = None
+        self._close_executor = None
+        self._contact_stats = None
+        self._spatial_hash = SpatialHash(cell_size)
         self.world_bbox = world_bbox
         self.objects = objects
         self._collisions = tuple()
+        self._removed_objects = tuple()
+        # objects which are not moved by update, they still collide with the other objects like
+        # fixed objects at rest but not with each other, e.g. paused objects
+        self.frozen_objects = set()
+        # objects which are neither moved by update nor tested for collisions, see LodController
+        self.detached_objects = set()
+
+    @property
+    def objects(self) -> List[GameObject]:
+        return self._objects
+
+    @objects.setter
+    def objects(self, value: List[GameObject]):
+        self._objects = value
+        # copy of the objects list in the state indexed by the spatial hash
+        self._indexed_objects = list(value)
+        self._spatial_hash.clear()
+        for obj in value:
+            self._spatial_hash.insert(obj)
+
+    @property
+    def world_bbox(self) -> Tuple[Vector, Vector]:
+        return self._world_bbox
+
+    @world_bbox.setter
+    def world_bbox(self, value: Tuple[Vector, Vector]):
+        self._world_bbox = value
+        # only objects close to the border of the world can leave it during a step
+        self._spatial_hash.watch_region(value)
 
     @property
     def collisions(self):
         return self._collisions
 
+    @property
+    def contact_stats(self) -> ContactGraphStats:
+        """Islands and batches of the contacts of the last update with the parallel solver.
+
+        None if the parallel solver fell back to the sequential resolution because of the GIL.
+        """
+        return self._contact_stats
+
+    @property
+    def removed_objects(self) -> Tuple[GameObject, ...]:
+        """Objects which left the world bounding box during the last update and were removed."""
+        return self._removed_objects
+
+    def add_object(self, obj: GameObject):
+        self._objects.append(obj)
+        self._indexed_objects.append(obj)
+        self._spatial_hash.insert(obj)
+
+    def remove_object(self, obj: GameObject):
+        self._objects.remove(obj)
+        self._indexed_objects.remove(obj)
+        self._spatial_hash.remove(obj)
+        self.frozen_objects.discard(obj)
+        self.detached_objects.discard(obj)
+
+    def add_objects(self, objects: List[GameObject]):
+        self._objects.extend(objects)
+        self._indexed_objects.extend(objects)
+        for obj in objects:
+            self._spatial_hash.insert(obj)
+
+    def remove_objects(self, objects: List[GameObject]):
+        # removes all objects at once, the objects list is only rebuilt once
+        if not objects:
+            return
+        for obj in objects:
+            self._spatial_hash.remove(obj)
+        removed_set = set(objects)
+        self._objects = [obj for obj in self._objects if obj not in removed_set]
+        self._indexed_objects = [
+            obj for obj in self._indexed_objects if obj not in removed_set
+        ]
+        self.frozen_objects -= removed_set
+        self.detached_objects -= removed_set
+
+    def add_balls(
+        self,
+        positions: np.ndarray,
+        radii: np.ndarray,
+        velocities: np.ndarray = (0, 0),
+        accelerations: np.ndarray = (0, 0),
+        masses: np.ndarray = 1,
+        fixed: np.ndarray = False,
+        bounciness: np.ndarray = 1,
+        style_attributes: Dict[Any, Any] = None,
+        names: List[str] = None,
+        collision_callbacks: List[Callable] = None,
+        collision_category: np.ndarray = DEFAULT_CATEGORY,
+        collision_mask: np.ndarray = ALL_CATEGORIES,
+        collision_group: np.ndarray = 0,
+    ) -> List[Ball]:
+        """Creates many balls at once and adds them to the world.
+
+        `positions` has shape (n, 2) and `radii` shape (n,). The other numeric arguments are either
+        given per ball or a single value for all balls. Every ball gets its own copy of the style
+        attributes and collision callbacks.
+        """
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        n = len(positions)
+        radii = np.broadcast_to(np.asarray(radii, dtype=np.float64), (n,))
+        if np.any(radii <= 0):
+            raise ValueError("Radii must be positive")
+
+        with _gc_paused():
+            attributes = self._bulk_attributes(
+                n,
+                velocities,
+                accelerations,
+                masses,
+                fixed,
+                bounciness,
+                style_attributes,
+                names,
+                collision_callbacks,
+                collision_category,
+                collision_mask,
+                collision_group,
+            )
+            bbox_min = _vectors(positions - radii[:, None])
+            bbox_max = _vectors(positions + radii[:, None])
+
+            balls = Ball._create_many(
+                list(zip(bbox_min, bbox_max)),
+                (math.pi * radii**2).tolist(),
+                radius=radii.tolist(),
+                pos=_vectors(positions),
+                **attributes,
+            )
+            self._objects.extend(balls)
+            self._indexed_objects.extend(balls)
+            self._spatial_hash.insert_many(
+                balls, positions - radii[:, None], positions + radii[:, None]
+            )
+
+        return balls
+
+    def add_polygons(
+        self,
+        vertex_pool: np.ndarray,
+        offsets: np.ndarray,
+        velocities: np.ndarray = (0, 0),
+        accelerations: np.ndarray = (0, 0),
+        masses: np.ndarray = 1,
+        fixed: np.ndarray = False,
+        bounciness: np.ndarray = 1,
+        style_attributes: Dict[Any, Any] = None,
+        names: List[str] = None,
+        collision_callbacks: List[Callable] = None,
+        collision_category: np.ndarray = DEFAULT_CATEGORY,
+        collision_mask: np.ndarray = ALL_CATEGORIES,
+        collision_group: np.ndarray = 0,
+    ) -> List[ConvexPolygon]:
+        """Creates many convex polygons at once and adds them to the world.
+
+        The vertices of polygon i are `vertex_pool[offsets[i]:offsets[i + 1]]`, i.e. `offsets` has
+        one entry more than there are polygons. The polygons are validated like in the
+        `ConvexPolygon` constructor but in vectorized form. The other arguments are handled like
+        in `add_balls`.
+        """
+        polygons = validate_polygons(vertex_pool, offsets)
+        n = len(polygons.areas)
+
+        with _gc_paused():
+            attributes = self._bulk_attributes(
+                n,
+                velocities,
+                accelerations,
+                masses,
+                fixed,
+                bounciness,
+                style_attributes,
+                names,
+                collision_callbacks,
+                collision_category,
+                collision_mask,
+                collision_group,
+            )
+            # every polygon gets its own shape which is created without validating it again
+            polygon_of_vertex = np.repeat(np.arange(n), np.diff(polygons.offsets))
+            local_vertices = polygons.vertices - polygons.centers[polygon_of_vertex]
+            local_vertices = _vectors(local_vertices)
+            normals = _vectors(polygons.normals)
+            offsets = polygons.offsets.tolist()
+            centers = _vectors(polygons.centers)
+            shapes = [
+                PolygonShape._create_precomputed(
+                    tuple(local_vertices[offsets[i] : offsets[i + 1]]),
+                    tuple(normals[offsets[i] : offsets[i + 1]]),
+                    area,
+                    center,
+                )
+                for i, (area, center) in enumerate(
+                    zip(polygons.areas.tolist(), centers)
+                )
+            ]
+
+            created = ConvexPolygon._create_many(
+                list(zip(_vectors(polygons.bbox_min), _vectors(polygons.bbox_max))),
+                polygons.areas.tolist(),
+                shape=shapes,
+                vertices=[None] * n,
+                normals=[None] * n,
+                pos=centers,
+                **attributes,
+            )
+            self._objects.extend(created)
+            self._indexed_objects.extend(created)
+            self._spatial_hash.insert_many(
+                created, polygons.bbox_min, polygons.bbox_max
+            )
+
+        return created
+
+    @staticmethod
+    def _bulk_attributes(
+        n: int,
+        velocities: np.ndarray,
+        accelerations: np.ndarray,
+        masses: np.ndarray,
+        fixed: np.ndarray,
+        bounciness: np.ndarray,
+        style_attributes: Dict[Any, Any],
+        names: List[str],
+        collision_callbacks: List[Callable],
+        collision_category: np.ndarray,
+        collision_mask: np.ndarray,
+        collision_group: np.ndarray,
+    ) -> Dict[str, List[Any]]:
+        # validates and broadcasts the attributes shared by all object types to one value per object
+        fixed = np.broadcast_to(np.asarray(fixed, dtype=bool), (n,))
+        masses = np.broadcast_to(np.asarray(masses, dtype=np.float64), (n,))
+        masses = np.where(fixed, np.inf, masses)
+        if np.any(masses <= 0):
+            raise ValueError("Mass must be positive")
+        if names is not None and len(names) != n:
+            raise ValueError("There must be one name per object")
+
+        def vectors(values):
+            return _vectors(
+                np.broadcast_to(np.asarray(values, dtype=np.float64), (n, 2))
+            )
+
+        return {
+            "vel": vectors(velocities),
+            "acc": vectors(accelerations),
+            "angle": [0] * n,
+            "mass": masses.tolist(),
+            "angular_vel": [0] * n,
+            "angular_acc": [0] * n,
+            "fixed": fixed.tolist(),
+            "bounciness": np.broadcast_to(bounciness, (n,)).tolist(),
+            "name": names if names is not None else [None] * n,
+            "style_attributes": [
+                dict(style_attributes) if style_attributes else None for _ in range(n)
+            ],
+            "collision_callbacks": [
+                list(collision_callbacks) if collision_callbacks else None
+                for _ in range(n)
+            ],
+            "collision_category": np.broadcast_to(collision_category, (n,)).tolist(),
+            "collision_mask": np.broadcast_to(collision_mask, (n,)).tolist(),
+            "collision_group": np.broadcast_to(collision_group, (n,)).tolist(),
+        }
+
+    def _sync_spatial_hash(self):
+        # objects can also be added to, removed from or replaced in the objects list directly,
+        # in this case the spatial hash is rebuilt once (the lists are compared by identity first)
+        if self._objects != self._indexed_objects:
+            self.objects = self._objects
+
     def update(self, dt: float):
+        self._sync_spatial_hash()
+
+        frozen = self.frozen_objects
+        detached = self.detached_objects
+        extra_acc = self._field_accelerations() if self.force_fields else {}
         for obj in self.objects:
-            obj.update(dt)
+            if obj not in frozen and obj not in detached:
+                obj.update(dt, extra_acc.get(obj))
 
-        collisions = get_collisions(self.objects)
-        for coll in collisions:
-            handle_collision(coll)
+        pairs = self._spatial_hash.candidate_pairs()
+        if frozen:
+            pairs = [
+                pair for pair in pairs if pair[0] not in frozen or pair[1] not in frozen
+            ]
+        if detached:
+            pairs = [
+                pair
+                for pair in pairs
+                if pair[0] not in detached and pair[1] not in detached
+            ]
+        executor = None
+        if self.threaded_narrow_phase and not gil_enabled():
+            executor = self._get_executor()
+        collisions = get_collisions(
+            self.objects, pairs=pairs, executor=executor, n_workers=self.n_workers
+        )
+        if self.solver == "batch":
+            resolve_collisions(collisions, self.solver_iterations, frozen)
+            call_collision_callbacks(collisions, frozen)
+        elif self.solver == "parallel" and not gil_enabled():
+            with self._spatial_hash.deferred_updates():
+                self._contact_stats = resolve_collisions_parallel(
+                    collisions,
+                    self._get_executor(),
+                    self.n_workers,
+                    immovable=frozen,
+                )
+            call_collision_callbacks(collisions, frozen)
+        else:
+            # with the GIL the parallel solver falls back to the sequential resolution, the
+            # worker threads could only run one after another
+            self._contact_stats = None
+            for coll in collisions:
+                handle_collision(coll, frozen)
 
+        removed_objects = []
         if self.world_bbox:
-            objects_in_world = [
-                obj for obj in self.objects if point_in_box(obj.pos, self.world_bbox)
-            ]
-            self.objects = objects_in_world
+            removed_objects = self._spatial_hash.sort(
+                obj
+                for obj in self._spatial_hash.boundary_objects
+                if not point_in_box(obj.pos, self.world_bbox)
+            )
+        self.remove_objects(removed_objects)
 
         self._collisions = tuple(collisions)
+        self._removed_objects = tuple(removed_objects)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # the pool is created once and shared by the narrow phase and the parallel solver, it is
+        # shut down by close or when the world is garbage collected
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.n_workers)
+            self._close_executor = weakref.finalize(
+                self, self._executor.shutdown, wait=False
+            )
+        return self._executor
+
+    def close(self):
+        """Shuts down the worker threads, the world creates new ones if it is updated again."""
+        if self._executor is not None:
+            self._close_executor()
+            self._executor = None
+            self._close_executor = None
+
+    def __enter__(self) -> "World":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _field_accelerations(self) -> Dict[GameObject, Vector]:
+        # all objects with a finite mass are sources of the fields, only the free ones are moved
+        sources = [obj for obj in self._objects if math.isfinite(obj.mass)]
+        if not sources:
+            return {}
+        pos = np.array([obj.pos.to_tuple() for obj in sources], dtype=np.float64)
+        mass = np.array([obj.mass for obj in sources], dtype=np.float64)
+        acc = sum(field.accelerations(pos, mass) for field in self.force_fields)
+        return {
+            obj: Vector(*obj_acc)
+            for obj, obj_acc in zip(sources, acc.tolist())
+            if not obj.fixed
+        }
+
+    def step_many(
+        self,
+        n_steps: int,
+        dt: float,
+        record: Tuple[str, ...] = ("positions",),
+        every: int = 1,
+        out: Dict[str, np.ndarray] = None,
+    ) -> Dict[str, np.ndarray]:
+        """Calls `update` n_steps times and records the state of the objects after every k-th step.
+
+        The recorded fields (see RECORD_FIELDS) are written into arrays of shape
+        (n_steps // every, n_objects, ...) for the objects in the world before the first step:
+        positions and velocities (..., 2), angles and the number of contacts in the recorded step.
+        Objects which are removed from the world are recorded as NaN (and 0 contacts). The arrays
+        can be preallocated and passed as `out`, e.g. to reuse them across calls.
+        """
+        if every < 1:
+            raise ValueError("Every must be at least 1")
+        for field in record:
+            if field not in RECORD_FIELDS:
+                raise ValueError(
+                    f"Unknown field {field}, expected one of {RECORD_FIELDS}"
+                )
+
+        objects = list(self._objects)
+        n_records = n_steps // every
+        shapes = {
+            "positions": (n_records, len(objects), 2),
+            "velocities": (n_records, len(objects), 2),
+            "angles": (n_records, len(objects)),
+            "contact_counts": (n_records, len(objects)),
+        }
+        out = dict(out or {})
+        for field in record:
+            if field not in out:
+                dtype = np.intp if field == "contact_counts" else np.float64
+                out[field] = np.empty(shapes[field], dtype=dtype)
+            elif out[field].shape != shapes[field]:
+                raise ValueError(f"Expected shape {shapes[field]} for {field}")
+
+        for step in range(1, n_steps + 1):
+            self.update(dt)
+            if step % every == 0:
+                self._record(objects, record, out, step // every - 1)
+
+        return out
+
+    def _record(
+        self,
+        objects: List[GameObject],
+        record: Tuple[str, ...],
+        out: Dict[str, np.ndarray],
+        row: int,
+    ):
+        # objects removed from the world are no longer in the spatial hash
+        alive = np.array([obj in self._spatial_hash for obj in objects], dtype=bool)
+
+        for field in record:
+            if field == "positions":
+                out[field][row] = [obj.pos.to_tuple() for obj in objects]
+            elif field == "velocities":
+                out[field][row] = [obj.vel.to_tuple() for obj in objects]
+            elif field == "angles":
+                out[field][row] = [obj.angle for obj in objects]
+            elif field == "contact_counts":
+                indices = {obj: i for i, obj in enumerate(objects)}
+                involved = [
+                    indices.get(obj)
+                    for coll in self._collisions
+                    for obj in (coll.obj1, coll.obj2)
+                ]
+                involved = np.array(
+                    [i for i in involved if i is not None], dtype=np.intp
+                )
+                out[field][row] = np.bincount(involved, minlength=len(objects))
+
+            if not alive.all():
+                out[field][row][~alive] = 0 if field == "contact_counts" else np.nan
+
+    def query_point(self, point: Vector) -> List[GameObject]:
+        """Returns all objects which contain the given point."""
+        self._sync_spatial_hash()
+        candidates = self._spatial_hash.query_aabb((point, point))
+        return self._spatial_hash.sort(
+            obj for obj in candidates if obj.contains_point(point)
+        )
+
+    def query_aabb(self, box: Tuple[Vector, Vector]) -> List[GameObject]:
+        """Returns all objects which intersect the given axis aligned box."""
+        self._sync_spatial_hash()
+        candidates = self._spatial_hash.query_aabb(box)
+        return self._spatial_hash.sort(
+            obj for obj in candidates if obj.intersects_box(box)
+        )
+
+    def query_radius(self, center: Vector, radius: float) -> List[GameObject]:
+        """Returns all objects which are at most `radius` away from the given point."""
+        self._sync_spatial_hash()
+        offset = Vector(radius, radius)
+        candidates = self._spatial_hash.query_aabb((center - offset, center + offset))
+        return self._spatial_hash.sort(
+            obj for obj in candidates if obj.distance_to_point(center) <= radius
+        )
+
+    def predict(
+        self,
+        obj: GameObject,
+        horizon: float,
+        dt: float,
+        include_dynamic: bool = False,
+    ) -> Prediction:
+        """Predicts the trajectory of the object over the horizon with steps of dt.
+
+        Only the given object moves, it collides with the fixed objects and optionally with the
+        other objects at rest. Neither the object nor the world are modified.
+        """
+        # each step integrates and resolves collisions like update, so the prediction matches the
+        # simulation as long as the object only hits fixed objects
+        self._sync_spatial_hash()
+        n_steps = max(int(round(horizon / dt)), 0)
+        positions = np.empty((n_steps + 1, 2))
+        velocities = np.empty((n_steps + 1, 2))
+        contacts = []
+
+        # the position and velocity are integrated with floats, the probe is a detached copy
+        # of the object which is only used for the collision tests
+        probe = copy.copy(obj)
+        x, y = obj.pos.x, obj.pos.y
+        vx, vy = obj.vel.x, obj.vel.y
+        ax, ay = obj.acc.x, obj.acc.y
+        angle, angular_vel = obj.angle, obj.angular_vel
+        mass, bounciness = obj.mass, obj.bounciness
+        positions[0] = x, y
+        velocities[0] = vx, vy
+
+        # the sources of the force fields like in _field_accelerations, the row of the object is
+        # set to its predicted position in every step
+        field_pos = None
+        if self.force_fields and not obj.fixed and math.isfinite(obj.mass):
+            sources = [other for other in self._objects if math.isfinite(other.mass)]
+            if obj not in sources:
+                sources.append(obj)
+            field_row = sources.index(obj)
+            field_pos = np.array(
+                [other.pos.to_tuple() for other in sources], dtype=np.float64
+            )
+            field_mass = np.array([other.mass for other in sources], dtype=np.float64)
+
+        # fixed objects are not affected by collisions
+        last_range = None
+        candidates = []
+        for step in range(1, n_steps + 1):
+            # same integration as GameObject.update
+            if angular_vel != 0 or obj.angular_acc != 0:
+                angle += angular_vel * dt + 0.5 * obj.angular_acc * dt**2
+                angular_vel += obj.angular_acc * dt
+                probe.angle = angle
+            if field_pos is not None:
+                field_pos[field_row] = x, y
+                acc = sum(
+                    field.accelerations(field_pos, field_mass)
+                    for field in self.force_fields
+                )
+                field_x, field_y = acc[field_row].tolist()
+                ax, ay = obj.acc.x + field_x, obj.acc.y + field_y
+            x += vx * dt + 0.5 * ax * dt**2
+            y += vy * dt + 0.5 * ay * dt**2
+            vx += ax * dt
+            vy += ay * dt
+            probe.pos = Vector(x, y)
+
+            # the candidates only change when the probe enters other cells
+            cell_range = self._spatial_hash.cell_range(probe.bbox)
+            if cell_range != last_range and not obj.fixed:
+                last_range = cell_range
+                candidates = [
+                    other
+                    for other in self._spatial_hash.sort(
+                        self._spatial_hash.query_cells(cell_range)
+                    )
+                    if other is not obj
+                    and (include_dynamic or other.fixed)
+                    and should_collide(probe, other)
+                ]
+
+            # like in update all collisions are detected before any of them is resolved
+            collisions = [probe.collides_with(other) for other in candidates]
+            for other, coll in zip(candidates, collisions):
+                if coll is None:
+                    continue
+                # like handle_collision with the other object being immovable, frozen
+                # dynamic objects are treated like fixed objects at rest
+                sign = -1 if coll.obj1 is probe else 1
+                nx, ny = coll.normal.x * sign, coll.normal.y * sign
+                x += nx * coll.depth
+                y += ny * coll.depth
+                other_vel = other.vel if other.fixed else Vector(0, 0)
+                e = (bounciness + other.bounciness) / 2
+                rel_vel = (vx - other_vel.x) * nx + (vy - other_vel.y) * ny
+                impulse = -(1 + e) * rel_vel / (1 / mass)
+                vx += impulse / mass * nx
+                vy += impulse / mass * ny
+                contacts.append((step, other, nx, ny))
+            probe.pos = Vector(x, y)
+
+            positions[step] = x, y
+            velocities[step] = vx, vy
+
+        world_indices = {}
+        if contacts:
+            world_indices = {o: i for i, o in enumerate(self._objects)}
+        return Prediction(
+            positions=positions,
+            velocities=velocities,
+            contact_steps=np.array([c[0] for c in contacts], dtype=np.intp),
+            contact_objects=np.array(
+                [world_indices[c[1]] for c in contacts], dtype=np.intp
+            ),
+            contact_normals=np.array(
+                [(c[2], c[3]) for c in contacts], dtype=np.float64
+            ).reshape(-1, 2),
+        )
+
+    def nearest(self, point: Vector, k: int = 1) -> List[GameObject]:
+        """Returns the k objects closest to the given point, sorted by their distance.
+
+        The distance is measured to the shape of the objects, i.e. it is 0 for objects containing
+        the point. Ties are resolved by the order of the objects in the world.
+        """
+        if k < 1:
+            return []
+        self._sync_spatial_hash()
+        # max heap of the k closest objects so far as (-distance, -serial, obj)
+        closest = []
+        for covered_radius, candidates in self._spatial_hash.query_rings(point):
+            for obj in candidates:
+                entry = (
+                    -obj.distance_to_point(point),
+                    -self._spatial_hash.serial(obj),
+                    obj,
+                )
+                if len(closest) < k:
+                    heapq.heappush(closest, entry)
+                elif entry[:2] > closest[0][:2]:
+                    heapq.heapreplace(closest, entry)
+
+            # all objects which have not been visited yet are further away than the covered radius
+            if len(closest) == k and -closest[0][0] <= covered_radius:
+                break
+
+        return [obj for _, _, obj in sorted(closest, reverse=True)]
+
+    def raycast(
+        self, origins: np.ndarray, directions: np.ndarray, max_distances: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Casts a batch of rays, see `circle_cast` for the arguments and return values."""
+        return self.circle_cast(origins, directions, 0, max_distances)
+
+    def circle_cast(
+        self,
+        origins: np.ndarray,
+        directions: np.ndarray,
+        radii: np.ndarray,
+        max_distances: np.ndarray,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Sweeps a batch of circles along straight lines and reports the first object they hit.
+
+        `origins` and `directions` have shape (n, 2), `radii` and `max_distances` shape (n,) or are
+        scalars. The directions do not need to be normalized. Returns the distances travelled until
+        the first hit (inf for misses), the (n, 2) normals of the hit surfaces and the indices of
+        the hit objects in `self.objects` (-1 for misses). Objects which already overlap the circle
+        at its origin are ignored.
+        """
+        self._sync_spatial_hash()
+
+        origins = np.asarray(origins, dtype=np.float64).reshape(-1, 2)
+        n_rays = len(origins)
+        directions = np.asarray(directions, dtype=np.float64).reshape(-1, 2)
+        lengths = np.linalg.norm(directions, axis=1, keepdims=True)
+        if np.any(lengths == 0):
+            raise ValueError("Directions must not be zero")
+        directions = directions / lengths
+        radii = np.broadcast_to(np.asarray(radii, dtype=np.float64), (n_rays,))
+        max_distances = np.broadcast_to(
+            np.asarray(max_distances, dtype=np.float64), (n_rays,)
+        )
+
+        # rays with an infinite max distance reach infinity only along the non-zero components
+        # of their direction (inf * 0 would be nan)
+        offsets = np.multiply(
+            directions,
+            max_distances[:, None],
+            out=np.zeros_like(directions),
+            where=directions != 0,
+        )
+        candidates = self._cast_candidates(origins, origins + offsets, radii)
+        distances, normals, hits = cast(
+            pack_shapes(candidates), origins, directions, radii, max_distances
+        )
+
+        world_indices = {obj: i for i, obj in enumerate(self._objects)}
+        candidate_indices = np.array(
+            [world_indices[obj] for obj in candidates] + [-1], dtype=np.intp
+        )
+        # misses are -1 and therefore map to the appended -1
+        return distances, normals, candidate_indices[hits]
+
+    def _cast_candidates(
+        self, origins: np.ndarray, ends: np.ndarray, radii: np.ndarray
+    ) -> List[GameObject]:
+        # rays are grouped by the grid cell of their origin (e.g. all rays of a sensor) and the
+        # spatial hash is queried once per group with the bounding box of all rays in the group
+        ray_min = np.minimum(origins, ends) - radii[:, None]
+        ray_max = np.maximum(origins, ends) + radii[:, None]
+        cells = np.floor(origins / self._spatial_hash.cell_size)
+        _, groups = np.unique(cells, axis=0, return_inverse=True)
+        groups = groups.reshape(-1)
+
+        n_groups = groups.max() + 1 if len(groups) > 0 else 0
+        group_min = np.full((n_groups, 2), np.inf)
+        group_max = np.full((n_groups, 2), -np.inf)
+        np.minimum.at(group_min, groups, ray_min)
+        np.maximum.at(group_max, groups, ray_max)
+
+        candidates = set()
+        for box_min, box_max in zip(group_min, group_max):
+            candidates |= self._spatial_hash.query_aabb(
+                (Vector(*box_min), Vector(*box_max))
+            )
+        return self._spatial_hash.sort(candidates)
+
+
+def _vectors(values: np.ndarray) -> List[Vector]:
+    return [Vector(x, y) for x, y in values.tolist()]
+
+
+@contextmanager
+def _gc_paused():
+    # creating many objects at once repeatedly triggers the cyclic garbage collector which
+    # traverses all existing objects, although none of the new objects can be garbage yet
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
@@ -7,7 +7,7 @@ setup(
     author_email="your_email@example.com",
     description="Description of your package",
     packages=find_packages(),
-    install_requires=["pygame"],
+    install_requires=["pygame", "numpy"],
     additional_requires={"dev": ["pytest", "black"]},
     classifiers=[
         "License :: OSI Approved :: MIT License",
@@ -0,0 +1,122 @@
+import random
+
+import numpy as np
+import pytest
+
+from ppe.batched import BatchedWorld
+from ppe.objects import AABox, Ball, Capsule, ConvexPolygon
+from ppe.validation import polygon_narrow_phase
+from ppe.vector import Vector
+
+GRAVITY = Vector(0, -9.81)
+
+
+def _level():
+    random.seed(0)
+    return (
+        [
+            AABox(Vector(5, 0), 10, 1, fixed=True, mass=float("inf")),
+            AABox(Vector(0, 5), 1, 10, fixed=True, mass=float("inf")),
+        ]
+        + [
+            Ball(
+                Vector(random.uniform(1, 9), random.uniform(1, 6)),
+                0.4,
+                vel=Vector(random.uniform(-2, 2), 0),
+                acc=GRAVITY,
+                bounciness=0.5,
+            )
+            for _ in range(5)
+        ]
+        + [
+            ConvexPolygon.create_random(
+                (Vector(1, 2), Vector(9, 6)), (0.3, 0.6), (3, 6), acc=GRAVITY
+            )
+            for _ in range(3)
+        ]
+    )
+
+
+class TestBatchedWorld:
+    def test_matches_world(self):
+        batch = BatchedWorld(_level(), 3)
+        rng = np.random.default_rng(0)
+        batch.positions[1:, 2:] += rng.uniform(-0.3, 0.3, (2, 8, 2))
+        batch.angles[2, 7:] = 1
+        worlds = [batch.export_world(i) for i in range(3)]
+
+        with polygon_narrow_phase("sat"):
+            for _ in range(100):
+                batch.step(0.01)
+                for world in worlds:
+                    world.update(0.01)
+
+        for i, world in enumerate(worlds):
+            positions = [obj.pos.to_tuple() for obj in world.objects]
+            velocities = [obj.vel.to_tuple() for obj in world.objects]
+            assert np.array_equal(batch.positions[i], positions)
+            assert np.array_equal(batch.velocities[i], velocities)
+
+    def test_boxes_match_world(self):
+        # equal overlaps on both axes are separated along x like in box_box_collision
+        boxes = [AABox(Vector(10, 10), 2, 2), AABox(Vector(11, 11), 2, 2)]
+        boxes += [
+            AABox(Vector(x, 0), 1, 1, acc=GRAVITY, vel=Vector(1, 0))
+            for x in np.linspace(0, 3, 5)
+        ]
+        boxes.append(AABox(Vector(1.5, -1), 10, 1, fixed=True, mass=float("inf")))
+        batch = BatchedWorld(boxes, 3)
+        rng = np.random.default_rng(0)
+        batch.positions[1:, 2:7] += rng.uniform(-0.3, 0.3, (2, 5, 2))
+        worlds = [batch.export_world(i) for i in range(3)]
+
+        for _ in range(50):
+            batch.step(0.01)
+            for world in worlds:
+                world.update(0.01)
+
+        assert batch.positions[0, :2].tolist() == [[9.5, 10], [11.5, 11]]
+        for i, world in enumerate(worlds):
+            positions = [obj.pos.to_tuple() for obj in world.objects]
+            velocities = [obj.vel.to_tuple() for obj in world.objects]
+            assert np.array_equal(batch.positions[i], positions)
+            assert np.array_equal(batch.velocities[i], velocities)
+
+    def test_actions_and_reset(self):
+        floor = AABox(Vector(0, 0), 20, 1, fixed=True, mass=float("inf"))
+        player = Ball(Vector(0, 1), 0.5)
+        batch = BatchedWorld(
+            [floor, player],
+            2,
+            controlled=[1],
+            observation_fields=("positions", "contact_counts"),
+        )
+
+        for _ in range(10):
+            observation = batch.step(0.1, actions=[[[1, 0]], [[-1, 0]]])
+
+        # the player rests on the floor and is pushed in opposite directions
+        assert observation["positions"].shape == (2, 2, 2)
+        assert observation["positions"][0, 1, 0] == pytest.approx(0.5)
+        assert observation["positions"][1, 1, 0] == pytest.approx(-0.5)
+        assert batch.velocities[0, 1, 0] == pytest.approx(1)
+        with pytest.raises(ValueError):
+            batch.step(0.1, actions=np.zeros((2, 2, 2)))
+
+        batch.reset([1])
+        assert batch.positions[1, 1].tolist() == [0, 1]
+        assert batch.positions[0, 1, 0] == pytest.approx(0.5)
+
+    def test_contact_counts(self):
+        balls = [Ball(Vector(x, 0), 0.6) for x in range(3)]
+        batch = BatchedWorld(balls, 2)
+        batch.positions[1, 2] = (5, 0)
+
+        batch.step(0.01)
+
+        assert batch.contact_counts.tolist() == [[1, 2, 1], [1, 1, 0]]
+        assert batch.observe(("contact_counts",))["contact_counts"].shape == (2, 3)
+
+    def test_unsupported_objects(self):
+        with pytest.raises(ValueError):
+            BatchedWorld([Capsule(Vector(0, 0), 1, 0.5), Ball(Vector(0, 0), 1)], 2)
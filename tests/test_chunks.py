@@ -0,0 +1,121 @@
+import os
+
+from ppe.chunks import ChunkedWorld
+from ppe.objects import Ball, ConvexPolygon
+from ppe.vector import Vector
+
+
+def _create_world(directory, memory_budget=0):
+    world = ChunkedWorld(
+        str(directory), tile_size=10, load_radius=0, memory_budget=memory_budget
+    )
+    world.add_objects(
+        [Ball(Vector(5 + 20 * i, 5), 1, vel=Vector(1, 0)) for i in range(5)]
+    )
+    return world
+
+
+class TestChunkedWorld:
+    def test_only_tiles_near_focus_are_simulated(self, tmp_path):
+        world = _create_world(tmp_path)
+        world.set_focus("player", Vector(45, 5))
+
+        world.update(1)
+
+        assert world.active_tiles == {(4, 0)}
+        assert [obj.pos for obj in world.objects] == [Vector(46, 5)]
+        assert len(os.listdir(tmp_path)) == 5
+
+    def test_tiles_are_stored_and_reloaded(self, tmp_path):
+        world = _create_world(tmp_path)
+        world.set_focus("player", Vector(5, 5))
+        world.update(1)
+
+        world.set_focus("player", Vector(85, 5))
+        world.update(1)
+        world.set_focus("player", Vector(5, 5))
+        world.update(0)
+
+        # the ball was simulated for one step only while its tile was active
+        assert [obj.pos for obj in world.objects] == [Vector(6, 5)]
+        assert world.cached_tiles == []
+        assert len(os.listdir(tmp_path)) == 5
+
+    def test_cache_respects_memory_budget(self, tmp_path):
+        world = _create_world(tmp_path, memory_budget=10**6)
+        assert len(world.cached_tiles) == 5
+        assert os.listdir(tmp_path) == []
+
+        world.memory_budget = world.cache_bytes // 2
+        world.set_focus("camera", Vector(85, 5))
+        world.update(0)
+
+        # the least recently used tiles are written to disk
+        assert world.cache_bytes <= world.memory_budget
+        assert world.cached_tiles == [(4, 0), (6, 0)]
+        assert sorted(os.listdir(tmp_path)) == ["tile_0_0.pkl", "tile_2_0.pkl"]
+
+    def test_objects_move_between_tiles(self, tmp_path):
+        world = ChunkedWorld(str(tmp_path), tile_size=10, load_radius=0)
+        ball = Ball(Vector(9, 5), 0.5, vel=Vector(2, 0))
+        world.add_object(ball)
+        world.set_focus("camera", Vector(5, 5))
+
+        world.update(1)
+        world.update(0)
+
+        assert world.objects == []
+        assert world.cached_tiles == [(1, 0)]
+
+        world.set_focus("ball", Vector(11, 5))
+        world.flush()
+        assert sorted(os.listdir(tmp_path)) == ["tile_1_0.pkl"]
+        assert [obj.pos for obj in world.objects] == [Vector(11, 5)]
+
+    def test_objects_whose_cells_cross_a_tile_border_are_reassigned(self, tmp_path):
+        # the ball changes its tile without changing its cell
+        world = ChunkedWorld(str(tmp_path), tile_size=10, load_radius=0, cell_size=8)
+        world.add_object(Ball(Vector(9.9, 5), 0.5, vel=Vector(0.2, 0)))
+        world.set_focus("camera", Vector(5, 5))
+
+        world.update(1)
+        world.update(0)
+
+        assert world.objects == []
+        assert world.cached_tiles == [(1, 0)]
+
+    def test_moves_into_a_tile_are_buffered(self, tmp_path, monkeypatch):
+        world = _create_world(tmp_path, memory_budget=10**6)
+        world.set_focus("camera", Vector(25, 5))
+        world.update(0)
+        loads = []
+        monkeypatch.setattr(
+            "ppe.chunks.pickle.loads", lambda data: loads.append(data) or []
+        )
+
+        # the moved ball is not merged with the stored objects of the tile
+        world.objects[0].pos = Vector(42, 5)
+        world.update(0)
+        assert loads == []
+        monkeypatch.undo()
+
+        world.flush()
+        world.set_focus("camera", Vector(45, 5))
+        world.update(0)
+        assert sorted(obj.pos.x for obj in world.objects) == [42, 45]
+        assert sorted(os.listdir(tmp_path)) == [
+            f"tile_{x}_0.pkl" for x in (0, 4, 6, 8)
+        ]
+
+    def test_loaded_polygons_share_their_shapes(self, tmp_path):
+        world = ChunkedWorld(str(tmp_path), tile_size=10, load_radius=0)
+        square = ConvexPolygon.create_rectangle(Vector(2, 2), 1, 1)
+        world.add_object(square)
+        world.add_object(ConvexPolygon(square.shape, pos=Vector(5, 5)))
+
+        world.set_focus("camera", Vector(5, 5))
+        world.update(0)
+
+        first, second = world.objects
+        assert first.shape is second.shape
+        assert second.pos == Vector(5, 5)
@@ -0,0 +1,529 @@
+from concurrent.futures import ThreadPoolExecutor
+import math
+import random
+
+from ppe.world import World
+import ppe.collision
+import ppe.resolution
+import ppe.world
+import pytest
+
+from ppe.objects import AABox, Ball, Capsule, ConvexPolygon
+from ppe.vector import Vector
+from ppe.collision import (
+    Collision,
+    ball_polygon_collision,
+    calibrate_gjk_crossover,
+    collide,
+    get_collisions,
+    register_collision_test,
+    should_collide,
+    polygon_polygon_collision_sat,
+    polygon_polygon_collision,
+    polygon_polygon_collision_gjk,
+)
+from ppe.gjk import support_index
+from ppe.resolution import ContactGraph
+
+BULLET = 0b01
+PLAYER = 0b10
+
+
+class TestCollisionFilter:
+    def test_default_objects_collide(self):
+        assert should_collide(Ball(Vector(0, 0), 1), Ball(Vector(0, 0), 1))
+
+    def test_category_and_mask(self):
+        bullet1 = Ball(
+            Vector(0, 0), 1, collision_category=BULLET, collision_mask=PLAYER
+        )
+        bullet2 = Ball(
+            Vector(0, 0), 1, collision_category=BULLET, collision_mask=PLAYER
+        )
+        player = Ball(Vector(0, 0), 1, collision_category=PLAYER)
+
+        assert not should_collide(bullet1, bullet2)
+        assert should_collide(bullet1, player)
+        assert should_collide(player, bullet2)
+
+    def test_group_overrides_mask(self):
+        part1 = Ball(Vector(0, 0), 1, collision_group=-1)
+        part2 = Ball(Vector(0, 0), 1, collision_group=-1)
+        sensor1 = Ball(Vector(0, 0), 1, collision_group=2, collision_mask=0)
+        sensor2 = Ball(Vector(0, 0), 1, collision_group=2, collision_mask=0)
+
+        assert not should_collide(part1, part2)
+        assert should_collide(sensor1, sensor2)
+        assert not should_collide(part1, sensor1)
+
+    def test_filtered_pairs_are_skipped(self):
+        ball1 = Ball(Vector(0, 0), 1, collision_category=BULLET, collision_mask=PLAYER)
+        ball2 = Ball(
+            Vector(0.5, 0), 1, collision_category=BULLET, collision_mask=PLAYER
+        )
+        world = World([ball1, ball2])
+
+        world.update(0.001)
+
+        assert world.collisions == ()
+
+
+class TestBroadPhase:
+    def test_candidate_pairs_match_all_pairs(self):
+        random.seed(0)
+        bounds = (Vector(0, 0), Vector(5, 5))
+        objects = [Ball.create_random(bounds, (0.1, 0.5)) for _ in range(40)] + [
+            ConvexPolygon.create_random(bounds, (0.2, 1), (3, 8)) for _ in range(40)
+        ]
+        world = World(objects, cell_size=0.5)
+
+        expected = get_collisions(objects)
+        collisions = get_collisions(
+            objects, pairs=world._spatial_hash.candidate_pairs()
+        )
+
+        assert len(expected) > 0
+        assert [(c.obj1, c.obj2, c.depth) for c in collisions] == [
+            (c.obj1, c.obj2, c.depth) for c in expected
+        ]
+
+    def test_threaded_narrow_phase_keeps_the_order(self):
+        random.seed(0)
+        bounds = (Vector(0, 0), Vector(10, 10))
+        objects = [Ball.create_random(bounds, (0.1, 0.5)) for _ in range(100)] + [
+            ConvexPolygon.create_random(bounds, (0.2, 1), (3, 8)) for _ in range(100)
+        ]
+        pairs = World(objects, cell_size=0.5)._spatial_hash.candidate_pairs()
+
+        expected = get_collisions(objects, pairs=pairs)
+        with ThreadPoolExecutor(4) as executor:
+            collisions = get_collisions(
+                objects, pairs=pairs, executor=executor, n_workers=4
+            )
+
+        assert len(pairs) > 4 * 64
+        assert [(c.obj1, c.obj2, c.depth) for c in collisions] == [
+            (c.obj1, c.obj2, c.depth) for c in expected
+        ]
+
+    def test_threaded_world_matches_serial_world(self, monkeypatch):
+        serial = _create_pile(1, 20)
+        threaded = _create_pile(1, 20)
+        serial_world = World(serial)
+        with World(threaded, n_workers=2, threaded_narrow_phase=True) as world:
+            assert len(world._spatial_hash.candidate_pairs()) > 2 * 64
+            for gil in (True, False):
+                # GIL builds fall back to the serial narrow phase
+                monkeypatch.setattr(ppe.world, "gil_enabled", lambda: gil)
+                serial_world.update(0.01)
+                world.update(0.01)
+            assert world._executor is not None
+
+        for obj1, obj2 in zip(serial, threaded):
+            assert obj1.pos == obj2.pos
+            assert obj1.vel == obj2.vel
+
+
+class TestBatchResolution:
+    def test_matches_sequential_resolution(self):
+        # separated pairs, so that every body has a single contact
+        def create_objects():
+            objects = []
+            for i in range(10):
+                objects.append(
+                    Ball(Vector(3 * i, 0), 0.5, vel=Vector(1, 0.1 * i), mass=1 + i)
+                )
+                objects.append(
+                    Ball(
+                        Vector(3 * i + 0.8, 0.2), 0.5, vel=Vector(-1, 0), bounciness=0.5
+                    )
+                )
+            objects.append(Ball(Vector(0, 10), 0.5, vel=Vector(0, -1)))
+            objects.append(
+                ConvexPolygon.create_rectangle(
+                    Vector(0, 9), 4, 1.2, fixed=True, mass=float("inf")
+                )
+            )
+            return objects
+
+        sequential = create_objects()
+        World(sequential, solver="sequential").update(0)
+        batch = create_objects()
+        World(batch, solver="batch").update(0)
+
+        for obj1, obj2 in zip(sequential, batch):
+            assert (obj1.pos - obj2.pos).magnitude() < 1e-9
+            assert (obj1.vel - obj2.vel).magnitude() < 1e-9
+
+    def test_only_isolated_contacts_match_sequential_resolution(self):
+        def create_objects():
+            # an isolated pair and a chain in which the middle ball has two contacts
+            return [
+                Ball(Vector(0, 0), 0.5, vel=Vector(1, 0.3), mass=2),
+                Ball(Vector(0.8, 0.1), 0.5, vel=Vector(-1, 0), bounciness=0.5),
+                Ball(Vector(10, 0), 0.5, vel=Vector(1, 0)),
+                Ball(Vector(10.9, 0), 0.5),
+                Ball(Vector(11.8, 0), 0.5, vel=Vector(-2, 0)),
+            ]
+
+        sequential = create_objects()
+        World(sequential, solver="sequential").update(0)
+        batch = create_objects()
+        World(batch, solver="batch").update(0)
+
+        for obj1, obj2 in zip(sequential[:2], batch[:2]):
+            assert (obj1.pos - obj2.pos).magnitude() < 1e-12
+            assert (obj1.vel - obj2.vel).magnitude() < 1e-12
+        # the outer balls of the chain have a single contact but their partner has two
+        assert (sequential[2].vel - batch[2].vel).magnitude() > 0.1
+        assert (sequential[4].vel - batch[4].vel).magnitude() > 0.1
+
+    def test_simultaneous_contacts(self):
+        left = Ball(Vector(-0.9, 0), 0.5, vel=Vector(1, 0))
+        middle = Ball(Vector(0, 0), 0.5)
+        right = Ball(Vector(0.9, 0), 0.5, vel=Vector(-1, 0))
+        calls = []
+        middle.collision_callbacks.append(lambda obj, coll: calls.append(coll))
+
+        World([left, middle, right], solver="batch", solver_iterations=50).update(0)
+
+        # the contacts are resolved simultaneously, so the result is symmetric
+        assert (left.vel - Vector(-1, 0)).magnitude() < 1e-6
+        assert (right.vel - Vector(1, 0)).magnitude() < 1e-6
+        assert middle.vel.magnitude() < 1e-6
+        assert middle.pos == Vector(0, 0)
+        assert len(calls) == 2
+
+
+def _create_pile(seed, size):
+    random.seed(seed)
+    bounds = (Vector(0, 0), Vector(size, size))
+    objects = [Ball.create_random(bounds, (0.2, 0.6)) for _ in range(150)]
+    objects.append(
+        ConvexPolygon.create_rectangle(
+            Vector(size / 2, -0.5), size + 2, 1.2, fixed=True, mass=float("inf")
+        )
+    )
+    return objects
+
+
+class TestContactGraph:
+    def test_islands_and_batches(self):
+        objects = _create_pile(0, 8)
+        collisions = get_collisions(objects)
+        graph = ContactGraph(collisions, coloring_threshold=10)
+
+        # contacts of different islands do not share a free body
+        island_of = {}
+        for i, island in enumerate(graph.islands):
+            for coll in island:
+                for obj in (coll.obj1, coll.obj2):
+                    if not obj.fixed:
+                        assert island_of.setdefault(obj, i) == i
+
+        # contacts of a batch do not share a free body
+        for batch in graph.batches:
+            bodies = [
+                obj for coll in batch for obj in (coll.obj1, coll.obj2) if not obj.fixed
+            ]
+            assert len(bodies) == len(set(bodies))
+
+        n_colored = sum(len(island) for island in graph.islands if len(island) >= 10)
+        assert graph.stats.n_contacts == len(collisions)
+        assert sum(graph.stats.island_sizes) == len(collisions)
+        assert sum(graph.stats.batch_sizes) == n_colored
+        assert graph.stats.largest_island >= 10
+
+    def test_parallel_solver(self, monkeypatch):
+        sequential = _create_pile(1, 20)
+        World(sequential, solver="sequential").update(0.01)
+        # free-threaded build
+        monkeypatch.setattr(ppe.world, "gil_enabled", lambda: False)
+        monkeypatch.setattr(ppe.resolution, "gil_enabled", lambda: False)
+        parallel = _create_pile(1, 20)
+        with World(parallel, solver="parallel", n_workers=4) as world:
+            world.update(0.01)
+            executor = world._executor
+
+        # the worker threads are shut down when the world is closed
+        assert world._executor is None
+        with pytest.raises(RuntimeError):
+            executor.submit(print)
+        # without colored islands the contacts are resolved in the sequential order
+        assert world.contact_stats.largest_island < 64
+        for obj1, obj2 in zip(sequential, parallel):
+            assert obj1.pos == obj2.pos
+            assert obj1.vel == obj2.vel
+        assert world.query_aabb((Vector(0, 0), Vector(20, 20))) == [
+            obj
+            for obj in parallel
+            if obj.intersects_box((Vector(0, 0), Vector(20, 20)))
+        ]
+
+    def test_parallel_solver_with_the_gil(self, monkeypatch):
+        sequential = _create_pile(1, 20)
+        World(sequential, solver="sequential").update(0.01)
+        monkeypatch.setattr(ppe.world, "gil_enabled", lambda: True)
+        parallel = _create_pile(1, 20)
+
+        with World(parallel, solver="parallel", n_workers=4) as world:
+            world.update(0.01)
+            # the sequential resolution is used without any worker threads
+            assert world._executor is None
+            assert world.contact_stats is None
+        for obj1, obj2 in zip(sequential, parallel):
+            assert obj1.pos == obj2.pos
+            assert obj1.vel == obj2.vel
+
+
+def _minimum_translation(polygon1, polygon2):
+    # brute force, the minimum translation is along one of the edge normals
+    axes = list(polygon1.get_normals()) + [-n for n in polygon2.get_normals()]
+    return min(
+        (
+            max(v.dot(axis) for v in polygon1.vertices)
+            - min(v.dot(axis) for v in polygon2.vertices),
+            axis,
+        )
+        for axis in axes
+    )
+
+
+class TestGjk:
+    def test_support_index(self):
+        random.seed(0)
+        polygon = ConvexPolygon.create_random(
+            (Vector(0, 0), Vector(1, 1)), (1, 2), (40, 60)
+        )
+        vertices = polygon.vertices
+        for _ in range(100):
+            direction = Vector(1, 0).rotate(random.uniform(0, 7))
+            start = random.randrange(len(vertices))
+            i = support_index(vertices, direction.x, direction.y, start)
+            assert vertices[i].dot(direction) == max(v.dot(direction) for v in vertices)
+
+    def test_matches_minimum_translation(self):
+        random.seed(1)
+        bounds = (Vector(0, 0), Vector(2, 2))
+        n_collisions = 0
+        for _ in range(200):
+            polygon1 = ConvexPolygon.create_random(bounds, (0.5, 1.5), (3, 40))
+            polygon2 = ConvexPolygon.create_random(bounds, (0.5, 1.5), (3, 40))
+            coll = polygon_polygon_collision_gjk(polygon1, polygon2)
+            if polygon_polygon_collision_sat(polygon1, polygon2) is None:
+                assert coll is None
+                continue
+
+            n_collisions += 1
+            depth, normal = _minimum_translation(polygon1, polygon2)
+            assert abs(coll.depth - depth) < 1e-9
+            assert (coll.normal - normal).magnitude() < 1e-9
+        assert n_collisions > 50
+
+    def test_matches_sat_for_shallow_contacts(self):
+        polygon1 = ConvexPolygon.create_rectangle(Vector(0, 0), 2, 2)
+        polygon2 = ConvexPolygon.create_rectangle(Vector(1.9, 0.5), 2, 2, angle=0.1)
+
+        sat = polygon_polygon_collision_sat(polygon1, polygon2)
+        gjk = polygon_polygon_collision_gjk(polygon1, polygon2)
+
+        assert abs(sat.depth - gjk.depth) < 1e-9
+        assert (sat.normal - gjk.normal).magnitude() < 1e-9
+
+    def test_auto_dispatches_by_the_crossover(self, monkeypatch):
+        # SAT and EPA disagree for a box inside another box
+        outer = ConvexPolygon.create_rectangle(Vector(0, 0), 2, 2)
+        inner = ConvexPolygon.create_rectangle(Vector(0, 0.25), 1, 1)
+
+        assert ppe.collision.POLYGON_NARROW_PHASE == "auto"
+        assert polygon_polygon_collision(outer, inner, "sat").depth == pytest.approx(1)
+        assert polygon_polygon_collision(outer, inner).depth == pytest.approx(1.25)
+
+        # pairs with fewer vertices than the crossover use SAT
+        monkeypatch.setattr(ppe.collision, "GJK_CROSSOVER", 9)
+        assert polygon_polygon_collision(outer, inner).depth == pytest.approx(1)
+        monkeypatch.setattr(ppe.collision, "GJK_CROSSOVER", None)
+        assert polygon_polygon_collision(outer, inner).depth == pytest.approx(1)
+
+        crossover = calibrate_gjk_crossover(max_vertices=4, n_pairs=5)
+        assert crossover in (6, 8, 9)
+
+
+def _as_polygon(box):
+    return ConvexPolygon(list(box.vertices))
+
+
+class TestShapeRegistry:
+    def test_boxes_match_polygons(self):
+        random.seed(0)
+        for _ in range(200):
+            box1 = AABox(
+                Vector(random.uniform(0, 2), random.uniform(0, 2)),
+                random.uniform(0.6, 2),
+                random.uniform(0.6, 2),
+            )
+            box2 = AABox(Vector(1, 1), random.uniform(0.6, 2), random.uniform(0.6, 2))
+            # SAT only gives the penetration depth for balls with their center outside of boxes
+            ball = Ball(Vector(random.uniform(0, 2), random.uniform(0, 2)), 0.3)
+            if box2.contains_point(ball.pos):
+                continue
+
+            for closed_form, general in (
+                (
+                    collide(box1, box2),
+                    polygon_polygon_collision_sat(_as_polygon(box1), _as_polygon(box2)),
+                ),
+                (collide(ball, box2), ball_polygon_collision(ball, _as_polygon(box2))),
+            ):
+                assert (closed_form is None) == (general is None)
+                if closed_form is not None:
+                    assert closed_form.depth == pytest.approx(general.depth)
+                    assert (closed_form.normal - general.normal).magnitude() < 1e-9
+
+    def test_boxes_can_not_rotate(self):
+        box = (
+            AABox(Vector(0, 0), 1, 1, angular_vel=1)
+            if False
+            else AABox(Vector(0, 0), 1, 1)
+        )
+        with pytest.raises(ValueError):
+            box.angle = 1
+
+    def test_subclasses_can_register_tests(self):
+        class Sensor(Ball):
+            __slots__ = ()
+
+        register_collision_test(Sensor, Ball, lambda sensor, ball: "sensed")
+
+        sensor = Sensor(Vector(0, 0), 1)
+        ball = Ball(Vector(0.5, 0), 1)
+        assert sensor.collides_with(ball) == "sensed"
+        assert ball.collides_with(sensor) == "sensed"
+        # the most specific registered test is used, other pairs fall back to balls
+        assert sensor.collides_with(Sensor(Vector(1, 0), 1)) == "sensed"
+        box = AABox(Vector(1.5, 0), 2, 2)
+        assert sensor.collides_with(box).depth == pytest.approx(0.5)
+
+
+class TestCapsule:
+    def test_capsule_ball(self):
+        capsule = Capsule(Vector(0, 0), 1, 0.5)
+        ball = Ball(Vector(0.5, 0.8), 0.5)
+
+        collision = collide(capsule, ball)
+
+        assert collision.normal == Vector(0, 1)
+        assert collision.depth == pytest.approx(0.2)
+        assert collide(capsule, Ball(Vector(2.1, 0), 0.5)) is None
+
+    def test_capsule_capsule(self):
+        horizontal = Capsule(Vector(0, 0), 1, 0.5)
+        vertical = Capsule(Vector(0.5, 1.7), 1, 0.5, angle=math.pi / 2)
+        crossing = Capsule(Vector(0.1, 0), 1, 0.25, angle=math.pi / 2)
+
+        # the lower end of the vertical capsule is closest to the horizontal axis
+        collision = collide(horizontal, vertical)
+        assert collision.normal == Vector(0, 1)
+        assert collision.depth == pytest.approx(0.3)
+        # crossing axes are separated along the normal of one of the axes
+        collision = collide(horizontal, crossing)
+        assert (collision.normal - Vector(1, 0)).magnitude() < 1e-9
+        assert collision.depth == pytest.approx(0.5)
+
+    def test_capsule_polygon(self):
+        capsule = Capsule(Vector(0, 1), 1, 0.5, angle=0.1)
+        floor = ConvexPolygon.create_rectangle(Vector(0, 0), 4, 1)
+
+        collision = collide(capsule, floor)
+
+        # the lower end of the capsule reaches down to 0.5 - sin(0.1), the floor ends at 0.5
+        assert collision.normal == Vector(0, -1)
+        assert collision.depth == pytest.approx(math.sin(0.1))
+
+    def test_capsule_comes_to_rest_on_box(self):
+        floor = AABox(Vector(0, 0), 10, 1, fixed=True, mass=float("inf"))
+        capsule = Capsule(Vector(0, 2), 1, 0.5, acc=Vector(0, -9.81), bounciness=0)
+        world = World([floor, capsule])
+
+        for _ in range(200):
+            world.update(0.01)
+
+        assert capsule.pos.y == pytest.approx(1, abs=1e-3)
+        distances, _, hits = world.raycast([[0.5, 5]], [[0, -1]], 10)
+        assert hits[0] == 1
+        assert distances[0] == pytest.approx(5 - 1.5, abs=1e-3)
+
+
+class TestContactManifold:
+    def test_polygon_contacts_are_clipped(self):
+        floor = AABox(Vector(0, 0), 10, 1)
+        box = ConvexPolygon.create_rectangle(Vector(0, 0.9), 1, 1)
+        tilted = ConvexPolygon.create_rectangle(Vector(0, 1.1), 1, 1, angle=0.3)
+
+        # the bottom corners of the box and the top of the floor below them
+        assert collide(box, floor).contact_points == (
+            Vector(-0.5, 0.4),
+            Vector(0.5, 0.4),
+        )
+        assert collide(floor, box).contact_points == (
+            Vector(-0.5, 0.5),
+            Vector(0.5, 0.5),
+        )
+        (corner,) = collide(tilted, floor).contact_points
+        assert corner == min(tilted.vertices, key=lambda v: v.y)
+
+    def test_contact_points_of_all_shapes(self):
+        floor = AABox(Vector(0, 0), 10, 1)
+        ball = collide(Ball(Vector(0, 0.9), 0.5), floor)
+        capsule = collide(Capsule(Vector(0, 0.9), 1, 0.5), floor)
+        balls = collide(Ball(Vector(0, 0), 1), Ball(Vector(1.5, 0), 1))
+
+        assert ball.contact_point_1 == Vector(0, 0.4)
+        assert ball.contact_point_2 == Vector(0, 0.5)
+        assert capsule.contact_points == (Vector(-1, 0.4), Vector(1, 0.4))
+        assert balls.contact_point_1 == Vector(1, 0)
+        assert balls.contact_point_2 == Vector(0.5, 0)
+
+    def test_contact_points_are_computed_where_the_collision_was_detected(self):
+        floor = AABox(Vector(0, 0), 10, 1, fixed=True, mass=float("inf"))
+        box = ConvexPolygon.create_rectangle(Vector(0, 0.9), 1, 1)
+        world = World([floor, box])
+
+        world.update(0.01)
+
+        # the box has already been pushed out of the floor by the collision resolution
+        assert box.pos.y == pytest.approx(1)
+        (collision,) = world.collisions
+        # the points are on the surface of obj1, i.e. the bottom of the box or the top of the floor
+        y = 0.4 if collision.obj1 is box else 0.5
+        points = sorted(p.to_tuple() for p in collision.contact_points)
+        assert points == pytest.approx([(-0.5, y), (0.5, y)])
+
+    def test_contact_points_of_rotating_objects(self):
+        def detect():
+            floor = AABox(Vector(0, 0), 10, 1, fixed=True, mass=float("inf"))
+            box = ConvexPolygon.create_rectangle(Vector(0, 0.9), 1, 1, angular_vel=2)
+            world = World([floor, box])
+            world.update(0.01)
+            (collision,) = world.collisions
+            return world, collision
+
+        _, collision = detect()
+        expected = collision.contact_points
+        world, collision = detect()
+        # the box rotates further before the points are read
+        world.update(0.01)
+
+        assert len(collision.contact_points) == len(expected) == 2
+        for point, expected_point in zip(collision.contact_points, expected):
+            assert point.to_tuple() == pytest.approx(expected_point.to_tuple())
+
+    def test_contact_points_as_keyword_arguments(self):
+        ball1, ball2 = Ball(Vector(0, 0), 1), Ball(Vector(1.5, 0), 1)
+
+        collision = Collision(
+            ball1, ball2, Vector(1, 0), 0.5, contact_point_1=Vector(1, 0)
+        )
+
+        assert collision.contact_point_1 == Vector(1, 0)
+        assert collision.contact_point_2 == Vector(0.5, 0)
@@ -0,0 +1,100 @@
+import random
+
+import pytest
+
+from ppe.event_driven import EventDrivenWorld
+from ppe.objects import Ball
+from ppe.vector import Vector
+
+BOX = (Vector(0, 0), Vector(10, 10))
+
+
+def _kinetic_energy(balls):
+    return sum(0.5 * ball.mass * ball.vel.dot(ball.vel) for ball in balls)
+
+
+class TestEventDrivenWorld:
+    def test_head_on_collision(self):
+        ball1 = Ball(Vector(0, 0), 0.5, vel=Vector(1, 0))
+        ball2 = Ball(Vector(3, 0), 0.5, vel=Vector(-1, 0))
+        world = EventDrivenWorld([ball1, ball2])
+
+        world.update(2)
+
+        # the balls touch after 1 second and swap their velocities
+        assert world.events == ((1, ball1, ball2),)
+        assert ball1.vel == Vector(-1, 0)
+        assert ball2.vel == Vector(1, 0)
+        assert ball1.pos == Vector(0, 0)
+        assert ball2.pos == Vector(3, 0)
+
+    def test_collision_after_crossing_cells(self):
+        # the grid cells are as large as the largest ball, the balls start 7 cells apart
+        ball1 = Ball(Vector(0, 0), 0.1, vel=Vector(1, 0.1))
+        ball2 = Ball(Vector(1.5, 0.15), 0.1, vel=Vector(-1, 0))
+        far_away = Ball(Vector(100, 100), 0.1)
+        world = EventDrivenWorld([ball1, ball2, far_away])
+
+        world.update(1)
+
+        assert [(ball, other) for _, ball, other in world.events] == [(ball1, ball2)]
+        assert world.events[0][0] == pytest.approx(0.659265, abs=1e-6)
+        assert world.n_events == 1
+        assert far_away.pos == Vector(100, 100)
+
+    def test_walls_and_bounciness(self):
+        ball = Ball(Vector(5, 5), 1, vel=Vector(2, 0), bounciness=0.5)
+        world = EventDrivenWorld([ball], BOX, wall_bounciness=0.5)
+
+        world.update(3)
+
+        # the ball hits the right wall after 2 seconds and comes back with half the speed
+        assert [(time, wall) for time, _, wall in world.events] == [(2, "right")]
+        assert ball.vel == Vector(-1, 0)
+        assert ball.pos == Vector(8, 5)
+
+    def test_fixed_balls_and_filters(self):
+        obstacle = Ball(Vector(2, 0), 0.5, fixed=True)
+        ghost = Ball(Vector(1, 0), 0.2, collision_mask=0)
+        ball = Ball(Vector(0, 0), 0.5, vel=Vector(1, 0))
+        world = EventDrivenWorld([obstacle, ghost, ball])
+
+        world.update(2)
+
+        assert [other for _, _, other in world.events] == [ball]
+        assert obstacle.pos == Vector(2, 0)
+        assert ball.vel == Vector(-1, 0)
+
+    def test_energy_is_conserved_without_overlaps(self):
+        random.seed(0)
+        balls = []
+        while len(balls) < 60:
+            ball = Ball.create_random(
+                (Vector(0.5, 0.5), Vector(9.5, 9.5)),
+                (0.1, 0.4),
+                vel=Vector(random.uniform(-2, 2), random.uniform(-2, 2)),
+                mass=random.uniform(1, 3),
+            )
+            if all(
+                (ball.pos - other.pos).magnitude() > ball.radius + other.radius
+                for other in balls
+            ):
+                balls.append(ball)
+        energy = _kinetic_energy(balls)
+        world = EventDrivenWorld(balls, BOX)
+
+        for _ in range(5):
+            world.update(1)
+
+        assert world.n_events > 100
+        assert abs(_kinetic_energy(balls) - energy) < 1e-9 * energy
+        for i, ball in enumerate(balls):
+            assert BOX[0].x - 1e-9 <= ball.pos.x - ball.radius
+            assert ball.pos.x + ball.radius <= BOX[1].x + 1e-9
+            for other in balls[i + 1 :]:
+                distance = (ball.pos - other.pos).magnitude()
+                assert distance >= ball.radius + other.radius - 1e-9
+
+    def test_accelerating_balls_are_rejected(self):
+        with pytest.raises(ValueError):
+            EventDrivenWorld([Ball(Vector(0, 0), 1, acc=Vector(0, -9.81))])
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from ppe.forces import BarnesHutTree, MutualGravity, RadialField, UniformField
+from ppe.objects import Ball
+from ppe.vector import Vector
+from ppe.world import World
+
+
+def _direct_sum(pos, mass, softening):
+    delta = pos[None] - pos[:, None]
+    distance2 = np.einsum("ijd,ijd->ij", delta, delta) + softening**2
+    return np.einsum("ijd,ij->id", delta, mass[None] / distance2**1.5)
+
+
+class TestBarnesHutTree:
+    def test_matches_direct_sum(self):
+        rng = np.random.default_rng(0)
+        pos = rng.uniform(0, 10, (300, 2))
+        mass = rng.uniform(1, 2, 300)
+        expected = _direct_sum(pos, mass, 1e-3)
+        tree = BarnesHutTree(pos, mass)
+
+        exact = tree.accelerations(opening_angle=0)
+        approximated = tree.accelerations(opening_angle=0.5)
+
+        assert np.allclose(exact, expected)
+        error = np.linalg.norm(approximated - expected, axis=1)
+        assert np.median(error / np.linalg.norm(expected, axis=1)) < 0.01
+
+    def test_coincident_points(self):
+        pos = np.array([(0, 0), (0, 0), (1, 0)], dtype=np.float64)
+
+        acc = BarnesHutTree(pos, np.ones(3), max_depth=4).accelerations(softening=0)
+
+        assert np.allclose(acc, [(1, 0), (1, 0), (-2, 0)])
+
+
+class TestForceFields:
+    def test_mutual_gravity_in_world(self):
+        ball1 = Ball(Vector(0, 0), 0.1, mass=1)
+        ball2 = Ball(Vector(2, 0), 0.1, mass=3)
+        world = World([ball1, ball2], force_fields=[MutualGravity(opening_angle=0)])
+
+        world.update(0.1)
+
+        # both balls are pulled towards each other and the momentum is conserved
+        assert ball1.vel.x == pytest.approx(0.75 * 0.1, rel=1e-5)
+        assert ball2.vel.x == pytest.approx(-0.25 * 0.1, rel=1e-5)
+        assert ball1.acc == Vector(0, 0)
+
+    def test_uniform_and_radial_fields(self):
+        ball = Ball(Vector(2, 0), 0.1)
+        fixed = Ball(Vector(5, 5), 0.1, fixed=True)
+        world = World(
+            [ball, fixed],
+            force_fields=[
+                UniformField(Vector(0, -1)),
+                RadialField(Vector(0, 0), 8, softening=0),
+            ],
+        )
+
+        world.update(1)
+
+        assert ball.vel == Vector(-2, -1)
+        assert fixed.vel == Vector(0, 0)
+
+    def test_prediction_and_step_many_include_fields(self):
+        def create_world():
+            ball = Ball(Vector(0, 10), 0.5)
+            planet = Ball(Vector(5, 0), 1, mass=1000, fixed=True)
+            fields = [UniformField(Vector(0, -10)), MutualGravity(softening=0.1)]
+            return World([ball, planet], force_fields=fields), ball
+
+        world, ball = create_world()
+        prediction = world.predict(ball, 1, 0.01)
+        trajectory = world.step_many(100, 0.01, record=("positions",))
+
+        reference, reference_ball = create_world()
+        for _ in range(100):
+            reference.update(0.01)
+        assert reference_ball.pos.y == pytest.approx(5, abs=0.3)
+        assert prediction.positions[-1].tolist() == list(reference_ball.pos.to_tuple())
+        assert trajectory["positions"][-1, 0].tolist() == list(
+            reference_ball.pos.to_tuple()
+        )
@@ -0,0 +1,104 @@
+import pytest
+
+from ppe.governor import FrameGovernor, QualityLevel
+from ppe.objects import Ball
+from ppe.vector import Vector
+from ppe.world import World
+
+LEVELS = (
+    QualityLevel(substeps=4, solver_iterations=10, query_interval=1),
+    QualityLevel(
+        substeps=2, solver_iterations=5, query_interval=2, full_fidelity_radius=5
+    ),
+)
+
+
+def _create_governor(levels=LEVELS):
+    near = Ball(Vector(1, 0), 0.5, vel=Vector(1, 0))
+    far = Ball(Vector(20, 0), 0.5, vel=Vector(1, 0))
+    world = World([near, far])
+    # only the reported times are measured
+    governor = FrameGovernor(world, 1 / 60, levels, window=3, clock=lambda: 0)
+    governor.set_focus("player", Vector(0, 0))
+    return governor
+
+
+class TestFrameGovernor:
+    def test_degrade_and_recover(self):
+        governor = _create_governor()
+
+        for _ in range(3):
+            governor.step(1 / 60)
+            governor.report(0.02)
+        governor.step(1 / 60)
+
+        assert governor.level == 1
+        assert governor.world.solver_iterations == 5
+        [decision] = governor.decisions
+        assert (decision.frame, decision.previous_level, decision.level) == (3, 0, 1)
+        assert decision.degraded
+
+        for _ in range(3):
+            governor.step(1 / 60)
+        governor.step(1 / 60)
+
+        assert governor.level == 0
+        assert [d.degraded for d in governor.decisions] == [True, False]
+        # the far ball was stepped coarsely and caught up when returning to full fidelity
+        near, far = governor.world.objects
+        assert governor.coarse_objects == set()
+        assert far.pos.x == pytest.approx(20 + governor.frame / 60)
+        assert near.pos.x == pytest.approx(1 + governor.frame / 60)
+
+    def test_full_fidelity_radius_and_query_interval(self):
+        governor = _create_governor(LEVELS[1:])
+        near, far = governor.world.objects
+
+        governor.step(1)
+        assert governor.queries_due
+        governor.step(1)
+        assert not governor.queries_due
+
+        # the far ball is stepped every 4 world updates with the accumulated time
+        assert near.pos == Vector(3, 0)
+        assert far.pos == Vector(20.5, 0)
+        assert governor.coarse_objects == {far}
+        assert governor.world.frozen_objects == set()
+
+    def test_levels_set_the_solver(self):
+        levels = (
+            QualityLevel(
+                substeps=1, solver_iterations=10, query_interval=1, solver="sequential"
+            ),
+            QualityLevel(
+                substeps=1, solver_iterations=3, query_interval=1, solver="batch"
+            ),
+        )
+        governor = _create_governor(levels)
+
+        governor.step(1 / 60)
+        assert governor.world.solver == "sequential"
+        for _ in range(3):
+            governor.report(0.02)
+            governor.step(1 / 60)
+        assert (governor.world.solver, governor.world.solver_iterations) == ("batch", 3)
+        with pytest.raises(ValueError):
+            FrameGovernor(
+                governor.world,
+                1 / 60,
+                [QualityLevel(1, 1, 1, solver="unknown")],
+            )
+
+    def test_frozen_objects_are_immovable(self):
+        for solver in ("sequential", "batch", "parallel"):
+            ball = Ball(Vector(0, 0), 0.5, vel=Vector(1, 0), bounciness=1)
+            frozen = Ball(Vector(0.9, 0), 0.5, vel=Vector(-1, 0))
+            with World([ball, frozen], solver=solver) as world:
+                world.frozen_objects = {frozen}
+                world.update(0.1)
+
+            # the ball bounces off like from a fixed object at rest
+            assert frozen.pos == Vector(0.9, 0)
+            assert frozen.vel == Vector(-1, 0)
+            assert ball.pos.x == pytest.approx(-0.1)
+            assert ball.vel.x == pytest.approx(-1)
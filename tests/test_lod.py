@@ -0,0 +1,85 @@
+import logging
+
+import pytest
+
+from ppe.forces import UniformField
+from ppe.lod import LodController
+from ppe.objects import Ball, ConvexPolygon
+from ppe.vector import Vector
+from ppe.world import World
+
+GRAVITY = Vector(0, -9.81)
+
+
+class TestLodController:
+    def test_distant_objects_collide_coarsely_without_callbacks(self):
+        floor = ConvexPolygon.create_rectangle(
+            Vector(50, 0), 10, 1, fixed=True, mass=float("inf"), bounciness=0
+        )
+        ball = Ball(Vector(50, 2), 0.5, acc=GRAVITY, bounciness=0)
+        calls = []
+        ball.collision_callbacks.append(lambda obj, coll: calls.append(coll))
+        world = World([floor, ball])
+        lod = LodController(world, 10, interval=4)
+        lod.set_focus("player", Vector(0, 0))
+
+        for _ in range(100):
+            lod.update(0.01)
+
+        assert lod.distant_objects == {floor, ball}
+        assert ball.pos.y == pytest.approx(1)
+        assert calls == []
+
+    def test_near_objects_pass_through_distant_objects(self):
+        near = Ball(Vector(5.2, 0), 0.5)
+        distant = Ball(Vector(6, 0), 0.5)
+        calls = []
+        for ball in (near, distant):
+            ball.collision_callbacks.append(lambda obj, coll: calls.append(coll))
+        lod = LodController(World([near, distant]), 5)
+        lod.set_focus("player", Vector(0, 0))
+
+        lod.update(0.01)
+
+        assert lod.distant_objects == {distant}
+        assert calls == []
+        assert lod.world.collisions == ()
+        assert near.pos == Vector(5.2, 0)
+        assert distant.pos == Vector(6, 0)
+
+    def test_return_to_full_fidelity(self):
+        ball = Ball(Vector(20, 0), 0.5, vel=Vector(-5, 1), acc=Vector(0.2, -0.1))
+        reference = Ball(Vector(20, 0), 0.5, vel=Vector(-5, 1), acc=Vector(0.2, -0.1))
+        lod = LodController(World([ball]), 5, margin=1, interval=3)
+        lod.set_focus("player", Vector(0, 0))
+        reference_world = World([reference])
+
+        distant = []
+        for _ in range(40):
+            lod.update(0.1)
+            reference_world.update(0.1)
+            distant.append(ball in lod.distant_objects)
+
+        # the ball is distant until it comes within the radius and keeps its trajectory
+        assert distant[:25] == [True] * 25 and distant[-5:] == [False] * 5
+        assert ball.pos.x == pytest.approx(reference.pos.x)
+        assert ball.pos.y == pytest.approx(reference.pos.y)
+        assert ball.vel.x == pytest.approx(reference.vel.x)
+
+    def test_distant_objects_follow_force_fields_in_small_steps(self, caplog):
+        ball = Ball(Vector(50, 0), 0.5, vel=Vector(3, 0))
+        world = World([ball], force_fields=[UniformField(Vector(0, -2))])
+        lod = LodController(world, 10, interval=4)
+        lod.set_focus("player", Vector(0, 0))
+
+        with caplog.at_level(logging.WARNING):
+            for _ in range(8):
+                lod.update(0.01)
+
+        # stepped after the first and the fifth frame with 0.01 s and 0.04 s, the 0.12 m of the
+        # second step are split into steps below the warning threshold
+        assert lod.distant_objects == {ball}
+        assert caplog.records == []
+        assert ball.pos.x == pytest.approx(50 + 3 * 0.05)
+        assert ball.pos.y == pytest.approx(-0.5 * 2 * 0.05**2)
+        assert ball.vel.y == pytest.approx(-2 * 0.05)
@@ -0,0 +1,75 @@
+import numpy as np
+
+from ppe.objects import Ball, ConvexPolygon
+import ppe.particles
+from ppe.particles import ParticleSystem
+from ppe.raycast import pack_shapes
+from ppe.vector import Vector
+from ppe.world import World
+
+
+def _create_world():
+    floor = ConvexPolygon.create_rectangle(
+        Vector(5, 0), 10, 1, fixed=True, mass=float("inf")
+    )
+    ball = Ball(Vector(5, 2), 1, mass=1)
+    return World([floor, ball], world_bbox=(Vector(0, -5), Vector(10, 10)))
+
+
+class TestParticleSystem:
+    def test_particles_collide_with_objects(self):
+        world = _create_world()
+        particles = ParticleSystem(world, acc=Vector(0, -9.81), bounciness=0)
+        rng = np.random.default_rng(0)
+        particles.emit(rng.uniform((1, 1), (9, 5), (1000, 2)), (0, 0), 10, 0.05)
+
+        for _ in range(100):
+            particles.update(0.01)
+
+        pos = particles.positions
+        assert len(particles) == 1000
+        assert pos[:, 1].min() >= 0.55 - 1e-9
+        distance = np.linalg.norm(pos - (5, 2), axis=1)
+        assert distance.min() >= 1.05 - 1e-9
+        # the particles do not affect the objects
+        assert world.objects[1].pos == Vector(5, 2)
+        assert world.objects[1].vel == Vector(0, 0)
+
+    def test_only_objects_near_the_particles_are_packed(self, monkeypatch):
+        world = _create_world()
+        world.add_objects([Ball(Vector(x, 8), 0.5) for x in range(10)])
+        particles = ParticleSystem(world)
+        particles.emit([[5, 3.1], [2, 0.6]], (0, 0), 10, 0.2)
+        packed = []
+        monkeypatch.setattr(
+            ppe.particles,
+            "pack_shapes",
+            lambda objects: packed.append(objects) or pack_shapes(objects),
+        )
+
+        particles.update(0.01)
+
+        assert packed == [world.objects[:2]]
+        assert particles.positions[:, 1].tolist() == [3.2, 0.7]
+
+    def test_expiration(self):
+        particles = ParticleSystem(_create_world())
+        particles.emit(
+            [(1, 8), (2, 8), (3, 8)], [(0, 0), (0, 0), (0, 30)], [1, 3, 3], 0.1
+        )
+
+        particles.update(2)
+
+        assert particles.positions.tolist() == [[2, 8]]
+        assert particles.lifetimes.tolist() == [1]
+
+    def test_particle_collisions(self):
+        particles = ParticleSystem(
+            World([]), bounciness=1, collide_particles=True, cell_size=0.1
+        )
+        particles.emit([(0, 0), (0.35, 0)], [(1, 0), (-1, 0)], 10, 0.2)
+
+        particles.update(0.1)
+
+        assert np.allclose(particles.velocities, [(-1, 0), (1, 0)])
+        assert np.allclose(particles.positions, [(-0.025, 0), (0.375, 0)])
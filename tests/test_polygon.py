@@ -1,7 +1,10 @@
+import math
+
 import pytest
 
 from ppe.objects import ConvexPolygon
 from ppe.vector import Vector
+from ppe.shapes import PolygonShape
 
 VERTICES_CLOCKWISE = [
     Vector(0, 0),
@@ -58,3 +61,45 @@ class TestPolygon:
     def test_bounding_box(self):
         polygon = ConvexPolygon(VERTICES_CLOCKWISE)
         assert polygon.bbox == (Vector(0, 0), Vector(1, 1))
+
+
+class TestPolygonShape:
+    def test_shape_is_relative_to_center_of_mass(self):
+        shape = PolygonShape(VERTICES_CLOCKWISE)
+
+        assert shape.centroid == Vector(1 / 3, 1 / 3)
+        assert list(shape.vertices) == [
+            v - Vector(1 / 3, 1 / 3) for v in VERTICES_ANTICLOCKWISE
+        ]
+        assert shape.area == 0.5
+        assert shape.bounding_radius == Vector(2 / 3, -1 / 3).magnitude()
+
+    def test_shared_shape(self):
+        shape = PolygonShape(VERTICES_CLOCKWISE)
+
+        polygon1 = ConvexPolygon(shape, pos=Vector(1, 1))
+        polygon2 = ConvexPolygon(shape, pos=Vector(3, 1), angle=math.pi)
+
+        assert polygon1.shape is polygon2.shape
+        assert polygon1.vertices == [
+            v + Vector(1 - 1 / 3, 1 - 1 / 3) for v in VERTICES_ANTICLOCKWISE
+        ]
+        assert polygon2.vertices == [
+            Vector(3 + 1 / 3 - v.x, 1 + 1 / 3 - v.y) for v in VERTICES_ANTICLOCKWISE
+        ]
+        assert polygon2.bbox == (Vector(3 + 1 / 3 - 1, 1 / 3), Vector(3 + 1 / 3, 4 / 3))
+        assert polygon2.area == 0.5
+
+    def test_vertices_follow_transform(self):
+        polygon = ConvexPolygon.create_rectangle(Vector(0, 0), 2, 1)
+
+        polygon.pos = Vector(1, 1)
+        polygon.angle = math.pi / 2
+
+        assert polygon.vertices == [
+            Vector(1.5, 2),
+            Vector(0.5, 2),
+            Vector(0.5, 0),
+            Vector(1.5, 0),
+        ]
+        assert polygon.bbox == (Vector(0.5, 0), Vector(1.5, 2))
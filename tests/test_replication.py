@@ -0,0 +1,179 @@
+import pytest
+
+from ppe.objects import AABox, Ball, Capsule, ConvexPolygon
+from ppe.replication import StateDecoder, StateEncoder
+from ppe.vector import Vector
+from ppe.world import World
+
+
+def _scene():
+    floor = AABox(Vector(0, 0), 20, 1, fixed=True, mass=float("inf"))
+    resting = [Ball(Vector(x, 1), 0.5) for x in range(-8, 9, 2)]
+    moving = Ball(Vector(0, 5), 0.5, vel=Vector(1, 0))
+    return World([floor, *resting, moving]), moving
+
+
+def _max_error(encoder, decoder):
+    return max(
+        (decoder.objects[encoder.network_id(obj)].pos - obj.pos).magnitude()
+        for obj in encoder.world.objects
+    )
+
+
+class TestReplication:
+    def test_deltas_only_contain_changed_objects(self):
+        world, moving = _scene()
+        encoder = StateEncoder(world, sleep_frames=2)
+        decoder = StateDecoder(World([]))
+
+        keyframe = encoder.step(0.01)
+        assert decoder.apply(keyframe)
+        encoder.acknowledge(decoder.sequence)
+        sizes = []
+        for _ in range(5):
+            frame = encoder.step(0.01)
+            assert decoder.apply(frame)
+            encoder.acknowledge(decoder.sequence)
+            sizes.append(len(frame))
+
+        # the resting balls fall asleep, only the moving ball is sent
+        assert encoder.awake_objects == {moving}
+        assert sizes[-1] < len(keyframe) / 10
+        assert len(decoder.world.objects) == len(world.objects)
+        assert _max_error(encoder, decoder) <= 1e-3
+
+    def test_deltas_are_based_on_the_acknowledged_frame(self):
+        world, moving = _scene()
+        encoder = StateEncoder(world)
+        decoder = StateDecoder(World([]))
+        decoder.apply(encoder.step(0.01))
+        encoder.acknowledge(1)
+
+        # the client misses frames, the next delta still contains all changes since frame 1
+        encoder.step(0.01)
+        encoder.step(0.01)
+        older = encoder.step(0.01)
+        newer = encoder.step(0.01)
+
+        assert decoder.apply(newer)
+        assert not decoder.apply(older)
+        assert decoder.sequence == 5
+        assert _max_error(encoder, decoder) <= 1e-3
+
+    def test_spawned_and_removed_objects(self):
+        world, moving = _scene()
+        encoder = StateEncoder(world)
+        decoder = StateDecoder(World([]))
+        decoder.apply(encoder.step(0.01))
+        encoder.acknowledge(decoder.sequence)
+
+        spawned = Ball(Vector(5, 5), 0.25, collision_callbacks=[lambda obj, coll: None])
+        encoder.add_object(spawned)
+        encoder.remove_object(moving)
+        decoder.apply(encoder.step(0.01))
+
+        mirrored = decoder.objects[encoder.network_id(spawned)]
+        assert len(decoder.world.objects) == len(world.objects)
+        assert mirrored.radius == 0.25
+        assert mirrored.collision_callbacks == []
+        assert spawned.collision_callbacks != []
+
+    def test_spawn_records(self):
+        objects = [
+            Ball(Vector(0, 0), 0.5, style_attributes={"color": (255, 0, 0)}),
+            AABox(Vector(0, -2), 4, 1, fixed=True, bounciness=0.5),
+            ConvexPolygon(
+                [Vector(1, 1), Vector(2, 1), Vector(1.5, 2)],
+                angle=1,
+                collision_category=2,
+                collision_mask=5,
+                collision_group=-1,
+            ),
+            Capsule(Vector(3, 0), 0.5, 0.25, angle=0.5, mass=2),
+        ]
+        encoder = StateEncoder(World(objects))
+        decoder = StateDecoder(World([]))
+
+        decoder.apply(encoder.encode())
+
+        for obj in objects:
+            mirrored = decoder.objects[encoder.network_id(obj)]
+            assert type(mirrored) is type(obj)
+            assert mirrored.style_attributes == obj.style_attributes
+            assert (mirrored.mass, mirrored.fixed, mirrored.bounciness) == (
+                obj.mass,
+                obj.fixed,
+                obj.bounciness,
+            )
+            assert (
+                mirrored.collision_category,
+                mirrored.collision_mask,
+                mirrored.collision_group,
+            ) == (obj.collision_category, obj.collision_mask, obj.collision_group)
+            assert mirrored.bbox[0].x == pytest.approx(obj.bbox[0].x, abs=1e-3)
+            assert mirrored.bbox[1].y == pytest.approx(obj.bbox[1].y, abs=1e-3)
+
+    def test_unserializable_style_attributes(self):
+        ball = Ball(Vector(0, 0), 0.5, style_attributes={"sprite": object()})
+
+        with pytest.raises(ValueError):
+            StateEncoder(World([ball])).encode()
+
+    def test_removing_an_object_wakes_the_objects_resting_on_it(self):
+        platform = AABox(
+            Vector(0, 0), 4, 1, fixed=True, mass=float("inf"), bounciness=0
+        )
+        ball = Ball(Vector(0, 1), 0.5, acc=Vector(0, -10), bounciness=0)
+        encoder = StateEncoder(World([platform, ball]), sleep_frames=2)
+        decoder = StateDecoder(World([]))
+        for _ in range(5):
+            decoder.apply(encoder.step(0.01))
+            encoder.acknowledge(decoder.sequence)
+        assert encoder.awake_objects == set()
+
+        encoder.remove_object(platform)
+        for _ in range(3):
+            decoder.apply(encoder.step(0.01))
+            encoder.acknowledge(decoder.sequence)
+
+        mirrored = decoder.objects[encoder.network_id(ball)]
+        assert encoder.awake_objects == {ball}
+        assert mirrored.pos.y < 1 - 1e-3
+        assert mirrored.pos.y == pytest.approx(ball.pos.y, abs=1e-3)
+
+    def test_keyframes_reuse_the_mirrored_objects(self):
+        world, moving = _scene()
+        encoder = StateEncoder(world, keyframe_interval=2)
+        decoder = StateDecoder(World([]))
+        decoder.apply(encoder.step(0.01))
+        encoder.acknowledge(decoder.sequence)
+        mirrored = decoder.objects
+        removed = world.objects[1]
+        world.remove_object(removed)
+
+        decoder.apply(encoder.step(0.01))
+        decoder.apply(encoder.step(0.01))
+
+        assert decoder.sequence == 3
+        assert len(decoder.world.objects) == len(world.objects)
+        for i, obj in decoder.objects.items():
+            assert mirrored[i] is obj
+        assert len(mirrored) == len(decoder.objects) + 1
+
+    def test_keyframes(self):
+        world, moving = _scene()
+        encoder = StateEncoder(world, keyframe_interval=10, max_unacked=3)
+        decoder = StateDecoder(World([]))
+        decoder.apply(encoder.step(0.01))
+        encoder.acknowledge(1)
+        # objects added to the world directly are picked up by the next keyframe
+        world.add_object(Ball(Vector(-5, 5), 0.5))
+
+        frames = [encoder.step(0.01) for _ in range(4)]
+
+        # the baseline is older than the kept history, so the last frame is a keyframe
+        assert len(frames[-1]) > 5 * len(frames[-2])
+        assert decoder.apply(frames[-1])
+        assert len(decoder.world.objects) == len(world.objects)
+        with pytest.raises(ValueError):
+            StateDecoder(World([])).apply(frames[-2])
@@ -0,0 +1,45 @@
+import random
+
+from ppe.objects import Ball, ConvexPolygon
+from ppe.validation import validate
+from ppe.vector import Vector
+
+BOUNDS = (Vector(0, 0), Vector(5, 5))
+
+
+def _create_scene():
+    random.seed(0)
+    return [
+        Ball.create_random(BOUNDS, (0.2, 0.5), acc=Vector(0, -9.81)) for _ in range(10)
+    ] + [ConvexPolygon.create_random(BOUNDS, (0.3, 0.6), (3, 5)) for _ in range(10)]
+
+
+class TestValidation:
+    def test_world_matches_reference(self):
+        scene = _create_scene()
+        positions = [obj.pos for obj in scene]
+
+        report = validate(
+            scene, 20, 0.01, (Vector(-1, -1), Vector(6, 6)), narrow_phase="sat"
+        )
+
+        assert report.ok
+        assert report.n_steps == 20
+        assert report.max_errors["position"] == 0
+        assert [obj.pos for obj in scene] == positions
+
+    def test_first_divergence_is_reported(self):
+        # a ball hitting two touching balls is resolved differently by the batch solver
+        scene = [
+            Ball(Vector(0, 0), 0.5, vel=Vector(1, 0)),
+            Ball(Vector(0.9, 0.3), 0.5),
+            Ball(Vector(0.9, -0.3), 0.5),
+        ]
+
+        report = validate(scene, 5, 0.01, solver="batch")
+
+        assert not report.ok
+        assert report.n_steps == 0
+        assert report.divergence.step == 1
+        assert report.divergence.kind in ("position", "velocity")
+        assert "Step 1" in str(report.divergence)
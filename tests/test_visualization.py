@@ -0,0 +1,90 @@
+import numpy as np
+
+from ppe.world import World
+from ppe.objects import Ball, Capsule, ConvexPolygon
+from ppe.vector import Vector
+from ppe.visualization import NumpyVisualizer, Visualizer
+
+BACKGROUND_COLOR = (0, 0, 0)
+OBJECT_COLOR = (255, 0, 0)
+
+
+def _simulate(world, n_steps, dt):
+    for _ in range(n_steps):
+        world.update(dt)
+        yield world
+
+
+class TestNumpyVisualizer:
+    def test_draw_ball(self):
+        ball = Ball(Vector(0.5, 0.5), 0.25, style_attributes={"color": OBJECT_COLOR})
+        visualizer = NumpyVisualizer(
+            10, 10, scale=10, background_color=BACKGROUND_COLOR
+        )
+
+        image = visualizer.render(World([ball]))
+
+        assert tuple(image[5, 5]) == OBJECT_COLOR
+        assert tuple(image[0, 0]) == BACKGROUND_COLOR
+        # pixel centers within 2.5 pixels of the center, i.e. a 4x4 block
+        assert (image[..., 0] == 255).sum() == 16
+
+    def test_draw_polygon(self):
+        polygon = ConvexPolygon.create_rectangle(
+            Vector(0.5, 0.3), 0.4, 0.2, style_attributes={"color": "#ff0000"}
+        )
+        visualizer = NumpyVisualizer(
+            10, 10, scale=10, background_color=BACKGROUND_COLOR
+        )
+
+        image = visualizer.render(World([polygon]))
+
+        # rows are flipped, world y in [0.2, 0.4] maps to rows 6 and 7
+        assert (image[..., 0] == 255).sum() == 4 * 2
+        assert np.all(image[6:8, 3:7, 0] == 255)
+
+    def test_draw_capsule(self):
+        capsule = Capsule(
+            Vector(1, 0.5), 0.5, 0.2, style_attributes={"color": OBJECT_COLOR}
+        )
+        visualizer = NumpyVisualizer(
+            20, 10, scale=10, background_color=BACKGROUND_COLOR
+        )
+
+        image = visualizer.render(World([capsule]))
+
+        # the ends of the axis are at x = 0.5 and x = 1.5 and the caps reach 0.2 further
+        assert np.all(image[4:6, 3:17, 0] == 255)
+        assert np.all(image[:, :2, 0] == 0) and np.all(image[:, 18:, 0] == 0)
+        assert np.all(image[:2, :, 0] == 0) and np.all(image[8:, :, 0] == 0)
+
+    def test_capsule_fallback_draws_primitives(self):
+        class PrimitivesVisualizer(NumpyVisualizer):
+            draw_capsule = Visualizer.draw_capsule
+
+        capsule = Capsule(
+            Vector(1, 0.5), 0.5, 0.2, style_attributes={"color": OBJECT_COLOR}
+        )
+        images = [
+            visualizer_type(20, 10, scale=10).render(World([capsule]))
+            for visualizer_type in (NumpyVisualizer, PrimitivesVisualizer)
+        ]
+
+        assert np.array_equal(*images)
+
+    def test_render_to_memmap(self, tmp_path):
+        ball = Ball(
+            Vector(0.5, 0.5),
+            0.1,
+            vel=Vector(0.1, 0),
+            style_attributes={"color": OBJECT_COLOR},
+        )
+        visualizer = NumpyVisualizer(20, 10, scale=10)
+
+        frames = visualizer.render_to_memmap(
+            _simulate(World([ball]), 3, 1), tmp_path / "frames.npy", 3
+        )
+
+        assert frames.shape == (3, 10, 20, 3)
+        assert not np.array_equal(frames[0], frames[2])
+        assert np.array_equal(np.load(tmp_path / "frames.npy"), frames)
@@ -0,0 +1,296 @@
+import random
+
+import numpy as np
+import pytest
+
+from ppe.world import World
+from ppe.objects import Ball, ConvexPolygon
+from ppe.vector import Vector
+from ppe.scene import random_balls, random_polygons
+
+WORLD_BOUNDS = (Vector(0, 0), Vector(20, 20))
+
+
+def _create_world():
+    random.seed(0)
+    objects = [Ball.create_random(WORLD_BOUNDS, (0.1, 0.5)) for _ in range(50)] + [
+        ConvexPolygon.create_random(WORLD_BOUNDS, (0.2, 1), (3, 8)) for _ in range(50)
+    ]
+    return World(objects, cell_size=0.5)
+
+
+class TestSpatialQueries:
+    def test_query_point(self):
+        world = _create_world()
+        points = [
+            Vector(random.uniform(0, 20), random.uniform(0, 20)) for _ in range(50)
+        ]
+        points += [obj.pos for obj in world.objects]
+
+        for point in points:
+            expected = [obj for obj in world.objects if obj.contains_point(point)]
+            assert world.query_point(point) == expected
+
+    def test_query_aabb(self):
+        world = _create_world()
+        box = (Vector(5, 5), Vector(9, 12))
+
+        expected = [obj for obj in world.objects if obj.intersects_box(box)]
+
+        assert len(expected) > 0
+        assert world.query_aabb(box) == expected
+
+    def test_query_radius(self):
+        world = _create_world()
+        center = Vector(10, 10)
+
+        expected = [obj for obj in world.objects if obj.distance_to_point(center) <= 3]
+
+        assert len(expected) > 0
+        assert world.query_radius(center, 3) == expected
+
+    def test_nearest(self):
+        world = _create_world()
+        point = Vector(3, 17)
+
+        expected = sorted(world.objects, key=lambda obj: obj.distance_to_point(point))
+
+        assert world.nearest(point, k=5) == expected[:5]
+        assert world.nearest(point, k=1000) == expected
+        assert world.nearest(point, k=0) == []
+
+    def test_index_follows_moving_objects(self):
+        world = _create_world()
+        ball = Ball(Vector(1, 1), 0.2)
+        world.objects.append(ball)
+
+        assert world.query_point(Vector(1, 1)) == [ball]
+
+        ball.pos = Vector(15, 3)
+
+        assert ball not in world.query_point(Vector(1, 1))
+        assert ball in world.query_point(Vector(15, 3))
+
+    def test_index_follows_replaced_objects(self):
+        world = _create_world()
+        ball = Ball(Vector(1, 1), 0.2)
+        replaced = world.objects[0]
+        world.objects[0] = ball
+
+        assert world.query_point(Vector(1, 1)) == [ball]
+        assert world.query_point(replaced.pos) == [
+            obj for obj in world.objects if obj.contains_point(replaced.pos)
+        ]
+
+
+class TestCasts:
+    def test_raycast(self):
+        ball = Ball(Vector(5, 0), 1)
+        box = ConvexPolygon.create_rectangle(Vector(0, 5), 2, 2)
+        world = World([ball, box])
+
+        distances, normals, indices = world.raycast(
+            [[0, 0], [0, 0], [0, 0], [5, 0]], [[1, 0], [0, 2], [-1, 0], [1, 0]], 10
+        )
+
+        np.testing.assert_allclose(distances, [4, 4, np.inf, np.inf])
+        np.testing.assert_allclose(normals, [[-1, 0], [0, -1], [0, 0], [0, 0]])
+        np.testing.assert_array_equal(indices, [0, 1, -1, -1])
+
+    def test_raycast_max_distance(self):
+        world = World([Ball(Vector(5, 0), 1)])
+
+        distances, _, indices = world.raycast(
+            [[0, 0], [0, 0]], [[1, 0], [1, 0]], [3, 5]
+        )
+
+        np.testing.assert_allclose(distances, [np.inf, 4])
+        np.testing.assert_array_equal(indices, [-1, 0])
+
+    def test_raycast_infinite_distance(self):
+        world = World([Ball(Vector(5, 0), 1), Ball(Vector(0, -50), 1)])
+
+        distances, _, indices = world.raycast(
+            [[0, 0], [0, 0], [0, 0]], [[1, 0], [0, -1], [-1, 1]], np.inf
+        )
+
+        np.testing.assert_allclose(distances, [4, 49, np.inf])
+        np.testing.assert_array_equal(indices, [0, 1, -1])
+        assert world.query_aabb((Vector(-np.inf, -1), Vector(0, np.inf))) == []
+
+    def test_circle_cast(self):
+        ball = Ball(Vector(5, 0), 1)
+        box = ConvexPolygon.create_rectangle(Vector(0, 5), 2, 2)
+        world = World([ball, box])
+
+        # the last circle passes the corner of the box and hits it with its rounded front
+        distances, normals, indices = world.circle_cast(
+            [[0, 0], [0, 0], [-1.2, 0]], [[1, 0], [0, 1], [0, 1]], 0.5, 10
+        )
+
+        corner_offset = np.sqrt(0.5**2 - 0.2**2)
+        np.testing.assert_allclose(distances, [3.5, 3.5, 4 - corner_offset])
+        np.testing.assert_allclose(
+            normals, [[-1, 0], [0, -1], [-0.2 / 0.5, -corner_offset / 0.5]]
+        )
+        np.testing.assert_array_equal(indices, [0, 1, 1])
+
+
+class TestWorldBounds:
+    def test_removed_objects(self):
+        leaving = Ball(Vector(9.5, 5), 0.1, vel=Vector(1, 0), name="leaving")
+        staying = Ball(Vector(5, 5), 0.1, vel=Vector(1, 0), name="staying")
+        world = World([leaving, staying], world_bbox=(Vector(0, 0), Vector(10, 10)))
+
+        world.update(0.4)
+
+        assert world.removed_objects == ()
+        assert world.objects == [leaving, staying]
+
+        world.update(0.4)
+
+        assert world.removed_objects == (leaving,)
+        assert world.objects == [staying]
+        assert world.query_point(leaving.pos) == []
+
+        world.update(0.4)
+
+        assert world.removed_objects == ()
+
+
+def _create_pinball(ball):
+    obstacles = [
+        ConvexPolygon.create_rectangle(
+            Vector(5, 0), 10, 1, fixed=True, mass=float("inf"), bounciness=0.8
+        ),
+        ConvexPolygon.create_rectangle(
+            Vector(2, 3), 3, 0.5, 0.4, fixed=True, mass=float("inf")
+        ),
+        Ball(Vector(7, 2), 0.5, fixed=True),
+    ]
+    other = Ball(Vector(4, 6), 0.3, vel=Vector(0, 1))
+    return World([ball] + obstacles + [other], cell_size=0.5)
+
+
+class TestPrediction:
+    def test_matches_simulation(self):
+        ball = Ball(Vector(1, 5), 0.2, vel=Vector(2, 0), acc=Vector(0, -9.81))
+        world = _create_pinball(ball)
+
+        prediction = world.predict(ball, 2, 0.01)
+
+        assert prediction.positions.shape == (201, 2)
+        assert ball.pos == Vector(1, 5)
+        assert len(prediction.contact_steps) > 0
+        assert set(prediction.contact_objects.tolist()) <= {1, 2, 3}
+
+        # the other ball is not on the path of the ball
+        for step in range(1, 201):
+            world.update(0.01)
+            assert np.allclose(prediction.positions[step], ball.pos.to_tuple())
+            assert np.allclose(prediction.velocities[step], ball.vel.to_tuple())
+
+    def test_include_dynamic(self):
+        ball = Ball(Vector(4, 4), 0.2, vel=Vector(0, 2))
+        world = _create_pinball(ball)
+
+        static = world.predict(ball, 1, 0.01)
+        dynamic = world.predict(ball, 1, 0.01, include_dynamic=True)
+
+        assert len(static.contact_steps) == 0
+        assert dynamic.contact_objects.tolist() == [4]
+        assert dynamic.contact_normals[0].tolist() == [0, -1]
+        assert world.objects[4].pos == Vector(4, 6)
+
+
+class TestStepMany:
+    def test_matches_update(self):
+        world = _create_pinball(Ball(Vector(1, 5), 0.2, acc=Vector(0, -9.81)))
+        reference = _create_pinball(Ball(Vector(1, 5), 0.2, acc=Vector(0, -9.81)))
+
+        trajectory = world.step_many(
+            150, 0.01, record=("positions", "velocities", "contact_counts"), every=3
+        )
+
+        assert trajectory["positions"].shape == (50, 5, 2)
+        assert trajectory["contact_counts"][:, 0].sum() > 0
+        for row in range(50):
+            for _ in range(3):
+                reference.update(0.01)
+            positions = [obj.pos.to_tuple() for obj in reference.objects]
+            velocities = [obj.vel.to_tuple() for obj in reference.objects]
+            assert np.allclose(trajectory["positions"][row], positions)
+            assert np.allclose(trajectory["velocities"][row], velocities)
+            contacts = sum(
+                reference.objects[0] in (c.obj1, c.obj2) for c in reference.collisions
+            )
+            assert trajectory["contact_counts"][row, 0] == contacts
+
+    def test_removed_objects_and_out(self):
+        leaving = Ball(Vector(9.5, 5), 0.1, vel=Vector(1, 0))
+        staying = Ball(Vector(5, 5), 0.1, vel=Vector(1, 0))
+        world = World([leaving, staying], world_bbox=(Vector(0, 0), Vector(10, 10)))
+        out = {"positions": np.zeros((3, 2, 2))}
+
+        trajectory = world.step_many(3, 0.4, out=out)
+
+        assert trajectory["positions"] is out["positions"]
+        assert np.isnan(out["positions"][1:, 0]).all()
+        assert np.allclose(out["positions"][:, 1], [(5.4, 5), (5.8, 5), (6.2, 5)])
+
+        with pytest.raises(ValueError):
+            world.step_many(3, 0.4, record=("colors",))
+
+
+class TestBulkCreation:
+    def test_add_balls(self):
+        world = World([])
+
+        balls = world.add_balls(
+            [[1, 2], [3, 4]], [0.5, 1], masses=[2, 3], fixed=[False, True]
+        )
+
+        expected = [Ball(Vector(1, 2), 0.5, mass=2), Ball(Vector(3, 4), 1, fixed=True)]
+        assert world.objects == balls
+        for ball, expected_ball in zip(balls, expected):
+            assert ball.pos == expected_ball.pos
+            assert ball.bbox == expected_ball.bbox
+            assert ball.area == expected_ball.area
+            assert ball.mass == expected_ball.mass
+            assert ball.fixed == expected_ball.fixed
+        assert world.query_point(Vector(3, 4.9)) == [balls[1]]
+
+    def test_add_polygons(self):
+        world = World([])
+        vertices, offsets = random_polygons(20, WORLD_BOUNDS, (0.2, 1), (3, 8), seed=0)
+        # mix in a clockwise polygon
+        vertices[offsets[3] : offsets[4]] = vertices[offsets[3] : offsets[4]][::-1]
+
+        polygons = world.add_polygons(vertices, offsets)
+
+        assert world.objects == polygons
+        for i, polygon in enumerate(polygons):
+            expected = ConvexPolygon(
+                [Vector(*v) for v in vertices[offsets[i] : offsets[i + 1]]]
+            )
+            assert polygon.vertices == expected.vertices
+            assert polygon.pos == expected.pos
+            assert polygon.bbox == expected.bbox
+            assert abs(polygon.area - expected.area) < 1e-9
+
+    def test_add_polygons_concave(self):
+        vertices = [[0, 0], [1, 0], [0, 1], [0, 0], [0, 1], [0.5, 0.5], [1, 1], [1, 0]]
+
+        with pytest.raises(ValueError):
+            World([]).add_polygons(vertices, [0, 3, 8])
+
+    def test_random_scene_is_seeded(self):
+        first = random_polygons(10, WORLD_BOUNDS, (0.2, 1), (3, 8), seed=1)
+        second = random_polygons(10, WORLD_BOUNDS, (0.2, 1), (3, 8), seed=1)
+
+        np.testing.assert_array_equal(first[0], second[0])
+        np.testing.assert_array_equal(first[1], second[1])
+        np.testing.assert_array_equal(
+            random_balls(10, WORLD_BOUNDS, (0.1, 0.5), seed=1)[0],
+            random_balls(10, WORLD_BOUNDS, (0.1, 0.5), seed=1)[0],
+        )